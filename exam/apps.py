@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ExamConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exam'
+
+    def ready(self):
+        from django.core import checks
+
+        from exam import signals  # noqa: F401
+        from examPortal.caching import check_shared_cache
+
+        checks.register(check_shared_cache, checks.Tags.caches)
@@ -0,0 +1,172 @@
+"""
+Autosave for exam sittings in progress.
+
+The exam page posts small batches of changes every few seconds: for each
+question that changed since the last batch, its full current state (answer,
+cumulative seconds spent, marked for review). A batch costs one session
+lookup, one conditional sequence bump and a single upsert of the changed
+rows, so its cost grows with the size of the change and never with the size
+of the paper or the answers saved so far. ExamView reads the rows back to
+resume a sitting after a reload or a crashed tab.
+"""
+import json
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from exam.grading import get_answer_key
+from student.models import ExamSession, ExamSubmission, SessionAnswer
+
+# Largest batch accepted in one request; a client sends at most one row per question
+AUTOSAVE_MAX_CHANGES = 500
+
+# A sitting can still be resumed this long after its time has run out, so
+# the final autosave and the submit request can land
+RESUME_GRACE = timedelta(minutes=5)
+
+
+class AutosaveError(ValueError):
+    """An autosave batch that cannot be applied"""
+
+
+class SessionConflict(AutosaveError):
+    """The batch belongs to a different sitting than the one in progress"""
+
+
+class SittingSubmitted(SessionConflict):
+    """The batch belongs to a sitting that has already been submitted"""
+
+
+def _answer(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, (list, tuple)):
+        value = ','.join(str(option) for option in value)
+    return str(value)
+
+
+def _seconds(value):
+    try:
+        return max(int(value or 0), 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _expired(session, exam):
+    return timezone.now() > session.started_at + exam.duration + RESUME_GRACE
+
+
+def get_resumable_session(student_profile, exam, test_paper):
+    """
+    The student's sitting in progress for this exam, or None. Sittings that
+    have run out of time or were started on another test paper are dropped.
+    """
+    session = ExamSession.objects.filter(student=student_profile, exam=exam).first()
+    if session is None:
+        return None
+    if session.test_paper_id != test_paper.id or _expired(session, exam):
+        session.delete()
+        return None
+    return session
+
+
+def session_state(session):
+    """Saved answers, time spent and review marks of a sitting, keyed by question uid"""
+    answers = {}
+    time_spent = {}
+    marked = []
+    rows = session.answers.values_list('question_uid', 'answer', 'time_spent_seconds', 'marked_for_review')
+    for uid, answer, seconds, is_marked in rows:
+        if answer is not None:
+            answers[uid] = answer
+        if seconds:
+            time_spent[uid] = seconds
+        if is_marked:
+            marked.append(uid)
+    return {
+        'answers': answers,
+        'time_spent': time_spent,
+        'marked': marked,
+        'started_at': int(session.started_at.timestamp() * 1000),
+        'seq': session.last_seq,
+    }
+
+
+def session_state_json(session):
+    return json.dumps(session_state(session) if session is not None else None)
+
+
+def apply_autosave(student_profile, exam, test_paper, idempotency_key, seq, changes, elapsed=0):
+    """
+    Apply one autosave batch. Returns ``(session, applied)``.
+
+    ``changes`` maps question uids to ``{'answer', 'time_spent', 'marked'}``.
+    ``seq`` increases with every batch the page sends; a batch that arrives
+    after a later one (a slow retry) is ignored. ``elapsed`` is the number of
+    seconds the sitting has been running, used when the first batch creates
+    the session.
+    """
+    if not isinstance(changes, dict):
+        raise AutosaveError('changes must be an object')
+    if len(changes) > AUTOSAVE_MAX_CHANGES:
+        raise AutosaveError(f'At most {AUTOSAVE_MAX_CHANGES} changes per batch')
+    if not isinstance(seq, int) or isinstance(seq, bool) or seq < 1:
+        raise AutosaveError('seq must be a positive integer')
+
+    answer_key = get_answer_key(test_paper)
+    rows = {}
+    for raw_uid, state in changes.items():
+        index = answer_key.resolve(raw_uid)
+        if index is None or not isinstance(state, dict):
+            continue
+        rows[answer_key.uid(index)] = state
+
+    elapsed = min(_seconds(elapsed), int(exam.duration.total_seconds()))
+    session, created = ExamSession.objects.get_or_create(
+        student=student_profile,
+        exam=exam,
+        defaults={
+            'test_paper': test_paper,
+            'idempotency_key': idempotency_key,
+            'started_at': timezone.now() - timedelta(seconds=elapsed),
+        },
+    )
+    if created and ExamSubmission.objects.filter(
+        student=student_profile, exam=exam, idempotency_key=idempotency_key
+    ).exists():
+        # A late batch (a keepalive flush as the page unloads) landed after
+        # the submit discarded the sitting; recreating it would make the next
+        # sitting resume under the submitted token
+        session.delete()
+        raise SittingSubmitted('This sitting has already been submitted')
+    if session.idempotency_key != idempotency_key:
+        raise SessionConflict('This exam is already in progress in another window')
+
+    with transaction.atomic():
+        # Claim the sequence number; an older or repeated batch updates nothing
+        if not ExamSession.objects.filter(id=session.id, last_seq__lt=seq).update(
+            last_seq=seq, updated_at=timezone.now()
+        ):
+            return session, False
+        SessionAnswer.objects.bulk_create(
+            [
+                SessionAnswer(
+                    session=session,
+                    question_uid=uid,
+                    answer=_answer(state.get('answer')),
+                    time_spent_seconds=_seconds(state.get('time_spent')),
+                    marked_for_review=bool(state.get('marked')),
+                )
+                for uid, state in rows.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['session', 'question_uid'],
+            update_fields=['answer', 'time_spent_seconds', 'marked_for_review'],
+        )
+    return session, True
+
+
+def discard_session(student_profile, exam):
+    """Forget the sitting in progress once it has been submitted"""
+    ExamSession.objects.filter(student=student_profile, exam=exam).delete()
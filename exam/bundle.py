@@ -0,0 +1,103 @@
+"""
+Compiled "paper bundles" for the exam page.
+
+A bundle is everything ExamView needs to render a TestPaper: the combined,
+ordered question list (with topics) and its pre-serialized JSON. It is built
+once per paper and kept in the shared cache under the paper's revision,
+which every question change bumps in its own transaction, so opening an exam
+costs no question queries and an edited paper is rebuilt on its next view.
+"""
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from exam.models import Question_type_mcq, Question_type_msq, Question_type_numerical
+from examPortal.caching import Namespace
+
+# Bump when the bundle layout changes so stale entries are never read back.
+BUNDLE_FORMAT_VERSION = 1
+
+BUNDLES = Namespace('exam:paper_bundle')
+
+
+def _image_url(question):
+    return question.question_image.url if question.question_image else None
+
+
+def _options(question):
+    return {
+        'A': question.option_a,
+        'B': question.option_b,
+        'C': question.option_c,
+        'D': question.option_d
+    }
+
+
+def build_paper_bundle(test_paper):
+    """Assemble the question list for a test paper straight from the database"""
+    questions = []
+
+    for q in Question_type_mcq.objects.filter(test_paper=test_paper):
+        questions.append({
+            'id': q.id,
+            'uid': f"mcq-{q.id}",
+            'type': 'mcq',
+            'number': q.question_number,
+            'text': q.question_text,
+            'image': _image_url(q),
+            'options': _options(q),
+            'correct_option': q.correct_option,
+            'marks': q.marks,
+            'negative_marks': q.negative_marks,
+            'topic': q.topic or 'General'
+        })
+
+    for q in Question_type_msq.objects.filter(test_paper=test_paper):
+        questions.append({
+            'id': q.id,
+            'uid': f"msq-{q.id}",
+            'type': 'msq',
+            'number': q.question_number,
+            'text': q.question_text,
+            'image': _image_url(q),
+            'options': _options(q),
+            'correct_options': q.correct_options,
+            'marks': q.marks,
+            'negative_marks': q.negative_marks,
+            'topic': q.topic or 'General'
+        })
+
+    for q in Question_type_numerical.objects.filter(test_paper=test_paper):
+        questions.append({
+            'id': q.id,
+            'uid': f"numerical-{q.id}",
+            'type': 'numerical',
+            'number': q.question_number,
+            'text': q.question_text,
+            'image': _image_url(q),
+            'correct_answer': q.correct_answer,
+            'marks': q.marks,
+            'negative_marks': q.negative_marks,
+            'topic': q.topic or 'General'
+        })
+
+    # Stable sort keeps the mcq/msq/numerical order for equal question numbers
+    questions.sort(key=lambda x: x['number'])
+
+    return {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'test_paper_id': test_paper.id,
+        'built_at': timezone.now().isoformat(),
+        'questions': questions,
+        'questions_json': json.dumps(questions),
+    }
+
+
+def get_paper_bundle(test_paper):
+    """Return the cached bundle for a test paper, compiling it on a miss"""
+    return BUNDLES.get_or_compute(
+        (f'v{BUNDLE_FORMAT_VERSION}', test_paper.id, test_paper.revision),
+        lambda: build_paper_bundle(test_paper),
+        getattr(settings, 'PAPER_BUNDLE_CACHE_TIMEOUT', 60 * 60 * 24),
+    )
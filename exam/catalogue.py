@@ -0,0 +1,68 @@
+"""
+Cached public catalogue pages (the landing page and the course list).
+
+Both pages only show exams, so their rendered HTML is cached whole, keyed by
+a catalogue version: the time, in microseconds, of the last Exam or TestPaper
+change, bumped by ``exam.signals`` once the change commits. A bump makes
+every cached page unreachable at once (old entries simply expire), and the
+same version is the pages' ETag and Last-Modified, so browsers and a reverse
+proxy revalidate with a 304 and no rendering at all.
+"""
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+
+from examPortal.caching import Namespace
+
+# Versioned: its version is the catalogue version
+CATALOGUE = Namespace('exam:catalogue', versioned=True)
+
+
+def catalogue_version():
+    return CATALOGUE.version()
+
+
+def bump_catalogue_version():
+    CATALOGUE.bump()
+
+
+class CataloguePageMixin:
+    """
+    For TemplateViews whose page depends only on the exam catalogue and
+    ``page_variant()``: serves the cached render, or a 304 when the client's
+    copy is current.
+    """
+    catalogue_page = None
+
+    def page_variant(self):
+        return 'all'
+
+    def is_private(self):
+        return False
+
+    def get(self, request, *args, **kwargs):
+        version = catalogue_version()
+        variant = self.page_variant()
+        etag = f'"{self.catalogue_page}-{variant}-{version}"'
+        last_modified = version // 1_000_000
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            render_page = super().get
+            content = CATALOGUE.get_or_compute(
+                ('page', self.catalogue_page, variant),
+                lambda: render_page(request, *args, **kwargs).render().content,
+                getattr(settings, 'CATALOGUE_PAGE_CACHE_TIMEOUT', 60 * 60 * 24),
+                version=version,
+            )
+            response = HttpResponse(content)
+
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        # Stored, but revalidated on every use
+        if self.is_private():
+            patch_cache_control(response, no_cache=True, private=True)
+        else:
+            patch_cache_control(response, no_cache=True, public=True)
+        return response
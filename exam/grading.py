@@ -0,0 +1,320 @@
+"""
+Grading for exam submissions.
+
+An AnswerKey holds everything needed to mark one test paper in compact
+parallel arrays. Keys are built once per paper and kept both in-process and
+in the shared cache, so grading a submission needs no question queries; it
+is a single pass over the key, and the resulting ExamAttempt, all of its
+QuestionAnswer rows (in a single bulk insert) and its result summary are
+written in one transaction.
+"""
+import threading
+from array import array
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max
+
+from exam.models import Question_type_mcq, Question_type_msq, Question_type_numerical
+from exam.results import build_summary, topic_rows_from_graded
+from examPortal.caching import Namespace
+from student.models import AttemptCounter, ExamAttempt, QuestionAnswer
+
+# Numerical answers within this distance of the key are correct
+NUMERICAL_TOLERANCE = 0.01
+
+QUESTION_TYPES = ('mcq', 'msq', 'numerical')
+MCQ, MSQ, NUMERICAL = range(3)
+
+# Each option is one bit, so an MSQ key such as "AC" is the mask 0b0101
+OPTION_BITS = {'A': 1, 'B': 2, 'C': 4, 'D': 8}
+
+# Bump when the AnswerKey layout changes so stale cache entries are ignored
+ANSWER_KEY_FORMAT_VERSION = 1
+
+
+def option_mask(options):
+    """Bitmask for an iterable of option letters, or -1 if any letter is invalid"""
+    mask = 0
+    for option in options:
+        bit = OPTION_BITS.get(option)
+        if bit is None:
+            return -1
+        mask |= bit
+    return mask
+
+
+class AnswerKey:
+    """
+    Correct answers, marks and topics for every question of a test paper.
+
+    Question ``i`` is described by ``ids[i]``, ``types[i]`` (MCQ/MSQ/NUMERICAL),
+    ``masks[i]`` (option bitmask for MCQ/MSQ), ``targets[i]`` (numerical
+    answer), ``marks[i]``, ``negative_marks[i]`` and ``topics[topic_index[i]]``.
+    """
+
+    def __init__(self, test_paper_id, ids, types, masks, targets, marks, negative_marks, topic_index, topics):
+        self.test_paper_id = test_paper_id
+        self.ids = ids
+        self.types = types
+        self.masks = masks
+        self.targets = targets
+        self.marks = marks
+        self.negative_marks = negative_marks
+        self.topic_index = topic_index
+        self.topics = topics
+        self._build_lookups()
+
+    def _build_lookups(self):
+        self.index_by_uid = {f"{QUESTION_TYPES[t]}-{q_id}": i for i, (q_id, t) in enumerate(zip(self.ids, self.types))}
+        # Legacy clients post plain numeric ids; the first match wins, in type order
+        self.index_by_id = {}
+        for i, q_id in enumerate(self.ids):
+            self.index_by_id.setdefault(q_id, i)
+
+    def __getstate__(self):
+        # Only the arrays are cached; lookups are rebuilt on load
+        state = self.__dict__.copy()
+        del state['index_by_uid']
+        del state['index_by_id']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._build_lookups()
+
+    @classmethod
+    def for_test_paper(cls, test_paper):
+        test_paper_id = getattr(test_paper, 'id', test_paper)
+        ids = array('q')
+        types = bytearray()
+        masks = array('b')
+        targets = array('d')
+        marks = array('d')
+        negative_marks = array('d')
+        topic_index = array('l')
+        topics = []
+        topic_lookup = {}
+
+        def add(q_type, q_id, mask, target, q_marks, q_negative, topic):
+            topic = topic or 'General'
+            if topic not in topic_lookup:
+                topic_lookup[topic] = len(topics)
+                topics.append(topic)
+            ids.append(q_id)
+            types.append(q_type)
+            masks.append(mask)
+            targets.append(target)
+            marks.append(q_marks)
+            negative_marks.append(q_negative)
+            topic_index.append(topic_lookup[topic])
+
+        fields = ('marks', 'negative_marks', 'topic')
+        for q_id, correct, *rest in Question_type_mcq.objects.filter(test_paper_id=test_paper_id).values_list('id', 'correct_option', *fields):
+            add(MCQ, q_id, option_mask(correct or ''), 0.0, *rest)
+        for q_id, correct, *rest in Question_type_msq.objects.filter(test_paper_id=test_paper_id).values_list('id', 'correct_options', *fields):
+            add(MSQ, q_id, option_mask(correct or ''), 0.0, *rest)
+        for q_id, correct, *rest in Question_type_numerical.objects.filter(test_paper_id=test_paper_id).values_list('id', 'correct_answer', *fields):
+            add(NUMERICAL, q_id, 0, correct, *rest)
+
+        return cls(test_paper_id, ids, bytes(types), masks, targets, marks, negative_marks, topic_index, topics)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def uid(self, index):
+        return f"{QUESTION_TYPES[self.types[index]]}-{self.ids[index]}"
+
+    def topic(self, index):
+        return self.topics[self.topic_index[index]]
+
+    def resolve(self, raw_key):
+        """Index of the question a submitted answer key refers to, or None"""
+        uid = str(raw_key)
+        if '-' in uid:
+            q_type, _, q_id = uid.partition('-')
+            if q_type in QUESTION_TYPES:
+                return self.index_by_uid.get(uid)
+            try:
+                q_id = int(q_id)
+            except ValueError:
+                return None
+            return self.index_by_id.get(q_id)
+        try:
+            return self.index_by_id.get(int(uid))
+        except ValueError:
+            return None
+
+    def is_correct(self, index, answer):
+        q_type = self.types[index]
+        if q_type == MCQ:
+            # Exactly one (upper-case) letter
+            return isinstance(answer, str) and len(answer) == 1 and OPTION_BITS.get(answer) == self.masks[index]
+        if q_type == MSQ:
+            # Comma-separated letters, e.g. "A,C"
+            if not answer:
+                return False
+            return option_mask(str(answer).split(',')) == self.masks[index]
+        if answer is None or answer == '':
+            return False
+        try:
+            value = float(answer)
+        except (TypeError, ValueError):
+            return False
+        # A bare 0 (JSON number) is an answer too
+        return abs(value - self.targets[index]) < NUMERICAL_TOLERANCE
+
+
+_local_keys = OrderedDict()
+_local_keys_lock = threading.Lock()
+
+
+ANSWER_KEYS = Namespace('exam:answer_key')
+
+
+def get_answer_key(test_paper):
+    """
+    Answer key for a test paper, from the in-process cache, then the shared
+    cache, then the database.
+
+    Both caches are keyed by the paper's revision, which changes in the same
+    transaction as its questions, so an edited paper is never graded against
+    an old key and no process has to be told to forget one.
+    """
+    test_paper_id = test_paper.id
+    revision = test_paper.revision
+
+    with _local_keys_lock:
+        local = _local_keys.get(test_paper_id)
+        if local is not None and local[0] == revision:
+            _local_keys.move_to_end(test_paper_id)
+            return local[1]
+
+    answer_key = ANSWER_KEYS.get_or_compute(
+        (f'v{ANSWER_KEY_FORMAT_VERSION}', test_paper_id, revision),
+        lambda: AnswerKey.for_test_paper(test_paper_id),
+        getattr(settings, 'ANSWER_KEY_CACHE_TIMEOUT', 60 * 60 * 24),
+    )
+
+    with _local_keys_lock:
+        _local_keys[test_paper_id] = (revision, answer_key)
+        _local_keys.move_to_end(test_paper_id)
+        while len(_local_keys) > getattr(settings, 'ANSWER_KEY_LOCAL_CACHE_SIZE', 256):
+            _local_keys.popitem(last=False)
+    return answer_key
+
+
+def _seconds(time_spent, uid, q_id):
+    value = time_spent.get(uid, time_spent.get(str(q_id), 0))
+    try:
+        return int(value or 0)
+    except (TypeError, ValueError):
+        return 0
+
+
+class GradedSubmission:
+    """Outcome of grading one submission against an AnswerKey"""
+
+    def __init__(self, score, total_marks, rows):
+        self.score = score
+        self.total_marks = total_marks
+        self.rows = rows
+
+    @property
+    def percentage(self):
+        return (self.score / self.total_marks * 100) if self.total_marks > 0 else 0
+
+
+def grade_submission(answer_key, answers, time_spent):
+    """
+    Grade ``answers`` (question uid -> answer) in one pass over the key.
+
+    Every question of the paper gets a row: answered ones earn their marks or
+    lose the negative marks, unanswered ones score zero.
+    """
+    submitted = {}
+    for raw_key, answer in answers.items():
+        index = answer_key.resolve(raw_key)
+        if index is not None:
+            submitted.setdefault(index, answer)
+
+    score = 0
+    total_marks = 0
+    rows = []
+    for index in range(len(answer_key)):
+        q_id = answer_key.ids[index]
+        marks = answer_key.marks[index]
+        total_marks += marks
+        if index in submitted:
+            answer = submitted[index]
+            if isinstance(answer, (list, tuple)):
+                answer = ','.join(str(option) for option in answer)
+            is_correct = answer_key.is_correct(index, answer)
+            marks_obtained = marks if is_correct else -answer_key.negative_marks[index]
+        else:
+            answer = None
+            is_correct = False
+            marks_obtained = 0
+        score += marks_obtained
+        rows.append({
+            'question_id': q_id,
+            'question_type': QUESTION_TYPES[answer_key.types[index]],
+            'user_answer': answer,
+            'is_correct': is_correct,
+            'marks_obtained': marks_obtained,
+            'time_spent_seconds': _seconds(time_spent, answer_key.uid(index), q_id),
+            'topic': answer_key.topic(index),
+        })
+
+    return GradedSubmission(score, total_marks, rows)
+
+
+def next_attempt_number(student_profile, exam):
+    """
+    Reserve the next attempt number for a student and exam.
+
+    Must run inside a transaction: the UPDATE ... SET n = n + 1 locks the
+    counter row until commit, so concurrent submissions are serialized on
+    that one row and never reuse a number.
+    """
+    counter = AttemptCounter.objects.filter(student=student_profile, exam=exam)
+    if not counter.update(last_attempt_number=F('last_attempt_number') + 1):
+        # First attempt since counters exist: start from any earlier attempts
+        latest = ExamAttempt.objects.filter(student=student_profile, exam=exam).aggregate(
+            Max('attempt_number')
+        )['attempt_number__max'] or 0
+        try:
+            with transaction.atomic():
+                AttemptCounter.objects.create(student=student_profile, exam=exam, last_attempt_number=latest + 1)
+        except IntegrityError:
+            # A concurrent submission created the counter first
+            counter.update(last_attempt_number=F('last_attempt_number') + 1)
+    return counter.values_list('last_attempt_number', flat=True).get()
+
+
+def record_attempt(student_profile, exam, graded, answers, time_spent, total_time):
+    """
+    Persist a graded submission: one ExamAttempt, one bulk insert of its
+    answers and its AttemptSummary, in one transaction.
+    """
+    with transaction.atomic():
+        attempt_number = next_attempt_number(student_profile, exam)
+        attempt = ExamAttempt.objects.create(
+            student=student_profile,
+            exam=exam,
+            attempt_number=attempt_number,
+            score=graded.score,
+            total_marks=graded.total_marks,
+            percentage=graded.percentage,
+            time_taken=timedelta(seconds=total_time),
+            answers=answers,
+            time_spent=time_spent,
+        )
+        QuestionAnswer.objects.bulk_create([
+            QuestionAnswer(attempt=attempt, **row) for row in graded.rows
+        ])
+        # The results page reads this instead of re-aggregating the answers
+        build_summary(attempt, topic_rows_from_graded(graded.rows), exam.total_marks).save(force_insert=True)
+    return attempt
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from exam.results import SUMMARY_FORMAT_VERSION, summarize_attempt
+from student.models import ExamAttempt
+
+
+class Command(BaseCommand):
+    help = 'Store result summaries (AttemptSummary) for attempts graded before summaries existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Attempts loaded per query')
+        parser.add_argument('--rebuild', action='store_true', help='Recompute every summary, not only missing ones')
+
+    def handle(self, *args, **options):
+        attempts = ExamAttempt.objects.select_related('exam').order_by('id')
+        if not options['rebuild']:
+            attempts = attempts.filter(
+                Q(summary__isnull=True) | ~Q(summary__format_version=SUMMARY_FORMAT_VERSION)
+            )
+
+        started = time.perf_counter()
+        done = 0
+        last_id = 0
+        while True:
+            # Keyset batches: the filter above shrinks as summaries are written
+            batch = list(attempts.filter(id__gt=last_id)[:options['batch_size']])
+            if not batch:
+                break
+            for attempt in batch:
+                summarize_attempt(attempt)
+            done += len(batch)
+            last_id = batch[-1].id
+            self.stdout.write(f'Summarized {done} attempt(s)')
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {done} attempt summaries in {elapsed:.2f}s'))
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from exam.submissions import claim_submissions, grade_submissions
+from student.models import ExamSubmission
+
+
+class Command(BaseCommand):
+    help = 'Grade queued exam submissions (ExamSubmission rows) in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Submissions graded per transaction')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between queue checks when idle')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--requeue-grading', action='store_true',
+                            help='Put submissions left in grading by a crashed worker back in the queue first')
+
+    def handle(self, *args, **options):
+        if options['requeue_grading']:
+            requeued = ExamSubmission.objects.filter(status=ExamSubmission.STATUS_GRADING).update(
+                status=ExamSubmission.STATUS_PENDING, claimed_by=None, claimed_at=None
+            )
+            self.stdout.write(f'Requeued {requeued} submission(s)')
+
+        try:
+            while True:
+                batch = claim_submissions(options['batch_size'])
+                if not batch:
+                    if options['once']:
+                        break
+                    close_old_connections()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                started = time.perf_counter()
+                grade_submissions(batch)
+                failed = sum(1 for s in batch if s.status == ExamSubmission.STATUS_FAILED)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'Graded {len(batch) - failed} submission(s), {failed} failed in {elapsed:.2f}s')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping grading worker')
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testpaper',
+            name='revision',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
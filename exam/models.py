@@ -18,6 +18,9 @@ class TestPaper(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True)
     total_questions = models.IntegerField(default=0)
+    # Bumped with every change to the paper's questions; cached bundles and
+    # answer keys are keyed by it
+    revision = models.PositiveIntegerField(default=0)
     
     class Meta:
         ordering = ['-created_at']
@@ -25,6 +28,11 @@ class TestPaper(models.Model):
     def __str__(self):
         return f"{self.exam.name} - Paper {self.paper_code}"
 
+    @classmethod
+    def bump_revision(cls, test_paper_id):
+        """Mark the paper's questions as changed, in the caller's transaction"""
+        cls.objects.filter(id=test_paper_id).update(revision=models.F('revision') + 1)
+
 class Question_type_mcq(models.Model):
     test_paper = models.ForeignKey(TestPaper, on_delete=models.CASCADE, related_name='mcq_questions')
     question_number = models.IntegerField()  # to maintain order of questions
@@ -0,0 +1,174 @@
+"""
+Results page statistics for one exam attempt.
+
+An attempt never changes once graded, so its statistics (topic breakdown,
+answered/correct/incorrect counts, weak and missed topics) are computed once
+and stored as an AttemptSummary. Grading builds the summary from the rows it
+has just graded, in memory; attempts graded before summaries existed are
+aggregated by the database in a single GROUP BY over their QuestionAnswer
+rows (see ``manage.py backfill_attempt_summaries``).
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+
+from student.models import AttemptSummary, QuestionAnswer
+
+# Bump when the summary layout changes; older summaries are rebuilt on read
+SUMMARY_FORMAT_VERSION = 1
+
+# Topics answered correctly less often than this (in percent) are "weak"
+WEAK_TOPIC_ACCURACY = 50
+
+ANSWERED = Q(user_answer__isnull=False) & ~Q(user_answer='')
+
+
+def topic_rows(attempt_id):
+    """One aggregated row per topic, in order of each topic's first question"""
+    rows = (
+        QuestionAnswer.objects.filter(attempt_id=attempt_id)
+        # Blank and missing topics are reported together as "General"
+        .annotate(topic_name=Coalesce(NullIf('topic', Value('')), Value('General')))
+        .values('topic_name')
+        .annotate(
+            total=Count('id'),
+            correct=Count('id', filter=ANSWERED & Q(is_correct=True)),
+            incorrect=Count('id', filter=ANSWERED & Q(is_correct=False)),
+            unanswered=Count('id', filter=~ANSWERED),
+            marks_obtained=Coalesce(Sum('marks_obtained'), 0.0),
+            time_spent=Coalesce(Sum('time_spent_seconds'), 0),
+            first_question=Min('question_id'),
+            # Question ids repeat across question types; ties keep grading order
+            first_row=Min('id'),
+        )
+        .order_by('first_question', 'first_row')
+    )
+    return [{'topic': row.pop('topic_name'), **row} for row in rows]
+
+
+def topic_rows_from_graded(rows):
+    """The same rows as ``topic_rows``, from the answer rows of a GradedSubmission"""
+    topics = {}
+    for index, row in enumerate(rows):
+        topic = row['topic'] or 'General'
+        stats = topics.get(topic)
+        if stats is None:
+            stats = topics[topic] = {
+                'topic': topic,
+                'total': 0,
+                'correct': 0,
+                'incorrect': 0,
+                'unanswered': 0,
+                'marks_obtained': 0.0,
+                'time_spent': 0,
+                'first_question': row['question_id'],
+                'first_row': index,
+            }
+        stats['total'] += 1
+        # As ANSWERED: a numerical answer of 0 is still an answer
+        if row['user_answer'] is not None and row['user_answer'] != '':
+            stats['correct' if row['is_correct'] else 'incorrect'] += 1
+        else:
+            stats['unanswered'] += 1
+        stats['marks_obtained'] += row['marks_obtained']
+        stats['time_spent'] += row['time_spent_seconds']
+        stats['first_question'] = min(stats['first_question'], row['question_id'])
+    return sorted(topics.values(), key=lambda stats: (stats['first_question'], stats['first_row']))
+
+
+def build_summary(attempt, rows, exam_total_marks):
+    """Unsaved AttemptSummary for ``attempt`` from per-topic ``rows``"""
+    total_questions = sum(row['total'] for row in rows)
+    marks_per_question = exam_total_marks / total_questions if total_questions else 0
+
+    topic_stats = []
+    weak_topics = []
+    missed_topics = []
+    for row in rows:
+        topic = row['topic']
+        topic_stats.append({
+            'topic': topic,
+            'total': row['total'],
+            'correct': row['correct'],
+            'incorrect': row['incorrect'],
+            'unanswered': row['unanswered'],
+            'marks_obtained': row['marks_obtained'],
+            'total_marks': marks_per_question * row['total'],
+            'time_spent': row['time_spent'],
+        })
+        accuracy = row['correct'] / row['total'] * 100
+        if accuracy < WEAK_TOPIC_ACCURACY:
+            weak_topics.append({
+                'topic': topic,
+                'accuracy': round(accuracy, 1),
+                'correct': row['correct'],
+                'total': row['total'],
+            })
+        if row['unanswered'] > 0:
+            missed_topics.append({
+                'topic': topic,
+                'unanswered': row['unanswered'],
+                'total': row['total'],
+            })
+    weak_topics.sort(key=lambda x: x['accuracy'])
+
+    total_time = sum(row['time_spent'] for row in rows)
+    correct_count = sum(row['correct'] for row in rows)
+    incorrect_count = sum(row['incorrect'] for row in rows)
+    return AttemptSummary(
+        attempt=attempt,
+        format_version=SUMMARY_FORMAT_VERSION,
+        total_questions=total_questions,
+        answered_count=correct_count + incorrect_count,
+        correct_count=correct_count,
+        incorrect_count=incorrect_count,
+        unanswered_count=total_questions - correct_count - incorrect_count,
+        avg_time_per_question=round(total_time / total_questions, 1) if total_questions else 0,
+        topic_stats=topic_stats,
+        weak_topics=weak_topics,
+        missed_topics=missed_topics,
+    )
+
+
+def summarize_attempt(attempt):
+    """Build and store the summary of an already graded attempt from its answer rows"""
+    summary = build_summary(attempt, topic_rows(attempt.id), attempt.exam.total_marks)
+    try:
+        with transaction.atomic():
+            # Keyed by the attempt: replaces an outdated summary in place
+            summary.save()
+    except IntegrityError:
+        # A concurrent request stored the same summary first
+        pass
+    return summary
+
+
+def summary_context(summary):
+    """Template context of the results page, as read from a stored summary"""
+    return {
+        'topic_stats': {
+            stats['topic']: {key: value for key, value in stats.items() if key != 'topic'}
+            for stats in summary.topic_stats
+        },
+        'weak_topics': summary.weak_topics,
+        'missed_topics': summary.missed_topics,
+        'avg_time_per_question': summary.avg_time_per_question,
+        'total_questions': summary.total_questions,
+        'answered_count': summary.answered_count,
+        'correct_count': summary.correct_count,
+        'incorrect_count': summary.incorrect_count,
+    }
+
+
+def attempt_statistics(attempt):
+    """
+    Results page statistics of an attempt, from its stored summary. A missing
+    or outdated summary is rebuilt and stored on the way.
+    """
+    try:
+        summary = attempt.summary
+    except AttemptSummary.DoesNotExist:
+        summary = None
+    if summary is None or summary.format_version != SUMMARY_FORMAT_VERSION:
+        summary = summarize_attempt(attempt)
+    return summary_context(summary)
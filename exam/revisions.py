@@ -0,0 +1,46 @@
+"""
+TestPaper revisions.
+
+A paper's revision is bumped in the same transaction as any change to its
+questions, and cached bundles and answer keys are keyed by it. A single
+question save or delete bumps it through ``exam.signals``; code that changes
+questions in bulk (the importer, cascading deletes) wraps its work in
+``batched()`` so every touched paper is bumped once, not once per row.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+
+from exam.models import TestPaper
+
+_pending = threading.local()
+
+
+def questions_changed(test_paper_id):
+    """Bump the paper's revision now, or when the enclosing ``batched()`` block ends"""
+    pending = getattr(_pending, 'papers', None)
+    if pending is not None:
+        pending.add(test_paper_id)
+    else:
+        TestPaper.bump_revision(test_paper_id)
+
+
+@contextmanager
+def batched():
+    """
+    Collect revision bumps and write them in one UPDATE on exit. Use inside
+    the transaction that changes the questions; nested blocks merge into the
+    outermost one.
+    """
+    if getattr(_pending, 'papers', None) is not None:
+        yield
+        return
+    _pending.papers = set()
+    try:
+        yield
+        papers = _pending.papers
+    finally:
+        _pending.papers = None
+    if papers:
+        TestPaper.objects.filter(id__in=papers).update(revision=F('revision') + 1)
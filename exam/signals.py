@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from exam.catalogue import bump_catalogue_version
+from exam.models import Exam, TestPaper, Question_type_mcq, Question_type_msq, Question_type_numerical
+from exam.revisions import questions_changed
+
+
+@receiver(post_save, sender=Exam)
+@receiver(post_save, sender=TestPaper)
+@receiver(post_delete, sender=Exam)
+@receiver(post_delete, sender=TestPaper)
+def bump_catalogue(sender, instance, **kwargs):
+    # After commit, so a page rendered meanwhile is not cached under the new version
+    transaction.on_commit(bump_catalogue_version)
+
+
+@receiver(post_save, sender=Question_type_mcq)
+@receiver(post_save, sender=Question_type_msq)
+@receiver(post_save, sender=Question_type_numerical)
+@receiver(post_delete, sender=Question_type_mcq)
+@receiver(post_delete, sender=Question_type_msq)
+@receiver(post_delete, sender=Question_type_numerical)
+def bump_test_paper_revision(sender, instance, **kwargs):
+    # In the same transaction as the change: the paper's cached bundle and
+    # answer key are keyed by its revision, so every process moves on to
+    # fresh ones exactly when the change commits
+    questions_changed(instance.test_paper_id)
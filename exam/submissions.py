@@ -0,0 +1,221 @@
+"""
+Queue for exam submissions.
+
+submit_exam only validates a submission and appends it to the ExamSubmission
+table; the grading worker (``manage.py run_grading_worker``) drains the queue
+in batches. A batch is written in one transaction with a savepoint per
+submission, so an end-of-exam burst costs a handful of commits instead of one
+grading transaction per student, and one bad submission cannot sink the rest.
+A claim expires after ``SUBMISSION_CLAIM_TIMEOUT`` seconds, so submissions
+claimed by a worker that died are picked up again instead of staying in
+grading forever.
+
+ExamView hands every sitting a signed submission token. Retries of the
+submit request carry the same token and get back the submission (and, once
+graded, the result) of the first request instead of being graded again.
+"""
+import hashlib
+import json
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from exam.grading import get_answer_key, grade_submission, record_attempt
+from student.models import ExamSubmission
+
+
+def payload_digest(payload):
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+SUBMISSION_TOKEN_SALT = 'exam.submission-token'
+
+
+def issue_submission_token(student_profile, exam, nonce=None):
+    """
+    Signed, single-sitting token bound to one student and one exam. Pass the
+    ``nonce`` of an existing sitting to re-issue its token when resuming it.
+    """
+    return signing.dumps(
+        {'student': student_profile.id, 'exam': exam.id, 'nonce': nonce or uuid.uuid4().hex},
+        salt=SUBMISSION_TOKEN_SALT,
+        compress=True,
+    )
+
+
+def read_submission_token(token, student_profile, exam):
+    """
+    Return the nonce of a submission token, or raise ``signing.BadSignature``
+    when the token is forged, expired or was issued to another student or exam.
+    """
+    max_age = getattr(settings, 'SUBMISSION_TOKEN_MAX_AGE', 60 * 60 * 24)
+    data = signing.loads(token, salt=SUBMISSION_TOKEN_SALT, max_age=max_age)
+    if data.get('student') != student_profile.id or data.get('exam') != exam.id:
+        raise signing.BadSignature('Submission token does not match this exam')
+    return data['nonce']
+
+
+def enqueue_submission(student_profile, exam, test_paper, payload, idempotency_key=None):
+    """
+    Append a raw submission to the queue; grading happens later.
+    Returns ``(submission, created)``.
+
+    A repeat of an earlier submission - same ``idempotency_key``, or without
+    one an identical payload - returns the submission already queued instead
+    of adding another. Two sittings with different tokens are always two
+    submissions, even with identical answers.
+    """
+    digest = payload_digest(payload)
+    duplicates = ExamSubmission.objects.filter(student=student_profile, exam=exam)
+    if idempotency_key is not None:
+        duplicates = duplicates.filter(idempotency_key=idempotency_key)
+    else:
+        duplicates = duplicates.filter(idempotency_key__isnull=True, payload_digest=digest)
+
+    existing = duplicates.first()
+    if existing is not None:
+        return existing, False
+    try:
+        with transaction.atomic():
+            return ExamSubmission.objects.create(
+                student=student_profile,
+                exam=exam,
+                test_paper=test_paper,
+                payload=payload,
+                payload_digest=digest,
+                idempotency_key=idempotency_key,
+            ), True
+    except IntegrityError:
+        # Lost a race with a concurrent retry of the same request
+        existing = duplicates.first()
+        if existing is None:
+            raise
+        return existing, False
+
+
+def _claim_expiry():
+    """Claims made before this belong to a worker that died"""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SUBMISSION_CLAIM_TIMEOUT', 60 * 5))
+
+
+def _claimable():
+    expired = Q(claimed_at__lt=_claim_expiry()) | Q(claimed_at__isnull=True)
+    return Q(status=ExamSubmission.STATUS_PENDING) | (Q(status=ExamSubmission.STATUS_GRADING) & expired)
+
+
+def claim_submissions(limit, ids=None):
+    """
+    Move up to ``limit`` pending submissions, or ones whose claim expired, to
+    grading and return them. A random claim token makes this safe with
+    several workers polling.
+    """
+    claimable = _claimable()
+    pending = ExamSubmission.objects.filter(claimable)
+    if ids is not None:
+        pending = pending.filter(id__in=ids)
+    batch_ids = list(pending.values_list('id', flat=True)[:limit])
+    if not batch_ids:
+        return []
+
+    token = uuid.uuid4().hex
+    ExamSubmission.objects.filter(claimable, id__in=batch_ids).update(
+        status=ExamSubmission.STATUS_GRADING,
+        claimed_by=token,
+        claimed_at=timezone.now(),
+    )
+    return list(
+        ExamSubmission.objects.filter(claimed_by=token, status=ExamSubmission.STATUS_GRADING)
+        .select_related('student', 'exam', 'test_paper')
+    )
+
+
+def _grade(submission):
+    if submission.test_paper_id is None:
+        raise ValueError('The test paper for this submission no longer exists')
+    payload = submission.payload
+    answers = payload.get('answers', {})
+    time_spent = payload.get('time_spent', {})
+    graded = grade_submission(get_answer_key(submission.test_paper), answers, time_spent)
+    return record_attempt(
+        submission.student,
+        submission.exam,
+        graded,
+        answers,
+        time_spent,
+        payload.get('total_time', 0),
+    )
+
+
+def grade_submissions(submissions):
+    """
+    Grade claimed submissions in a single transaction, one savepoint each.
+    Submissions whose claim expired and was taken over meanwhile are left to
+    their new owner. If the batch fails as a whole it goes back to the queue.
+    """
+    claims = {submission.id: submission.claimed_by for submission in submissions}
+    try:
+        with transaction.atomic():
+            # Locked until commit, so an expiring claim cannot be taken over mid-batch
+            owned = {
+                row_id
+                for row_id, claimed_by in ExamSubmission.objects.select_for_update()
+                .filter(id__in=claims, status=ExamSubmission.STATUS_GRADING)
+                .values_list('id', 'claimed_by')
+                if claimed_by == claims[row_id]
+            }
+            for submission in submissions:
+                if submission.id not in owned:
+                    continue
+                try:
+                    with transaction.atomic():
+                        submission.attempt = _grade(submission)
+                    submission.status = ExamSubmission.STATUS_GRADED
+                except Exception as e:
+                    submission.status = ExamSubmission.STATUS_FAILED
+                    submission.failure_reason = str(e)
+                submission.graded_at = timezone.now()
+                submission.save(update_fields=['status', 'attempt', 'failure_reason', 'graded_at'])
+    except Exception:
+        ExamSubmission.objects.filter(
+            id__in=claims, claimed_by__in=set(claims.values()), status=ExamSubmission.STATUS_GRADING,
+        ).update(status=ExamSubmission.STATUS_PENDING, claimed_by=None, claimed_at=None)
+        raise
+    return submissions
+
+
+def grade_if_overdue(submission):
+    """
+    Grade a submission inline when no worker has picked it up in time, or
+    the worker that claimed it died, so a stopped worker delays results
+    instead of losing them.
+    """
+    if submission.status == ExamSubmission.STATUS_PENDING:
+        wait = getattr(settings, 'SUBMISSION_GRADE_INLINE_AFTER', 10)
+        if (timezone.now() - submission.submitted_at).total_seconds() < wait:
+            return submission
+    elif submission.status != ExamSubmission.STATUS_GRADING:
+        return submission
+    elif submission.claimed_at is not None and submission.claimed_at >= _claim_expiry():
+        return submission
+    grade_submissions(claim_submissions(1, ids=[submission.id]))
+    submission.refresh_from_db()
+    return submission
+
+
+def submission_status(submission):
+    status = {
+        'submission_id': submission.id,
+        'status': submission.status,
+        'attempt_id': submission.attempt_id,
+        'redirect_url': None,
+        'error': submission.failure_reason,
+    }
+    if submission.status == ExamSubmission.STATUS_GRADED and submission.attempt_id:
+        status['redirect_url'] = f'/exam/{submission.exam_id}/results/{submission.attempt_id}/'
+    return status
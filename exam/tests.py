@@ -1,3 +1,719 @@
-from django.test import TestCase
+import importlib
+import io
+import json
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+
+from exam.autosave import SittingSubmitted, apply_autosave
+from exam.bundle import get_paper_bundle
+from exam.grading import AnswerKey, get_answer_key, grade_submission, next_attempt_number, record_attempt
+from exam.models import Exam, Question_type_mcq, Question_type_msq, Question_type_numerical, TestPaper
+from exam.results import summarize_attempt
+from exam.submissions import claim_submissions, enqueue_submission, grade_if_overdue, grade_submissions
+from examPortal.caching import Namespace, check_shared_cache
+from student.models import (
+    AttemptCounter,
+    AttemptSummary,
+    ExamAttempt,
+    ExamSession,
+    ExamSubmission,
+    QuestionAnswer,
+    StudentProfile,
+)
+
+
+def make_paper(exam, paper_code='P1'):
+    """A paper with one MCQ (A), one MSQ (A and C) and one numerical (2.5) question, 4 marks each"""
+    test_paper = TestPaper.objects.create(exam=exam, paper_code=paper_code, total_questions=3)
+    options = {'option_a': '1', 'option_b': '2', 'option_c': '3', 'option_d': '4'}
+    mcq = Question_type_mcq.objects.create(
+        test_paper=test_paper, question_number=1, question_text='MCQ', correct_option='A',
+        marks=4, negative_marks=1, topic='Optics', **options,
+    )
+    msq = Question_type_msq.objects.create(
+        test_paper=test_paper, question_number=2, question_text='MSQ', correct_options='AC',
+        marks=4, negative_marks=2, topic='Optics', **options,
+    )
+    numerical = Question_type_numerical.objects.create(
+        test_paper=test_paper, question_number=3, question_text='Numerical', correct_answer=2.5,
+        marks=4, negative_marks=0, topic='Waves',
+    )
+    return test_paper, mcq, msq, numerical
+
+
+class ExamResultsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        self.client.force_login(self.user)
+
+    def make_attempt(self, answers):
+        """``answers`` is a list of (topic, user_answer, is_correct, marks_obtained, seconds)"""
+        attempt = ExamAttempt.objects.create(
+            student=self.profile,
+            exam=self.exam,
+            attempt_number=ExamAttempt.objects.filter(student=self.profile, exam=self.exam).count() + 1,
+            score=sum(row[3] for row in answers),
+            total_marks=self.exam.total_marks,
+            time_taken=timedelta(minutes=30),
+        )
+        QuestionAnswer.objects.bulk_create([
+            QuestionAnswer(
+                attempt=attempt,
+                question_id=i + 1,
+                question_type='mcq',
+                topic=topic,
+                user_answer=user_answer,
+                is_correct=is_correct,
+                marks_obtained=marks,
+                time_spent_seconds=seconds,
+            )
+            for i, (topic, user_answer, is_correct, marks, seconds) in enumerate(answers)
+        ])
+        return attempt
+
+    def results_url(self, attempt):
+        return f'/exam/{self.exam.id}/results/{attempt.id}/'
+
+    def test_statistics(self):
+        attempt = self.make_attempt([
+            ('Optics', 'A', True, 4, 30),
+            (None, 'B', False, -1, 20),
+            ('Optics', None, False, 0, 5),
+            ('Optics', 'C', False, -1, 10),
+            ('', 'D', True, 4, 15),
+            ('Waves', '', False, 0, 0),
+        ])
+
+        context = self.client.get(self.results_url(attempt)).context
+
+        self.assertEqual(list(context['topic_stats']), ['Optics', 'General', 'Waves'])
+        self.assertEqual(context['topic_stats']['Optics'], {
+            'total': 3,
+            'correct': 1,
+            'incorrect': 1,
+            'unanswered': 1,
+            'marks_obtained': 3,
+            'total_marks': 20,
+            'time_spent': 45,
+        })
+        self.assertEqual(context['topic_stats']['General']['correct'], 1)
+        self.assertEqual(context['topic_stats']['General']['incorrect'], 1)
+        self.assertEqual(context['total_questions'], 6)
+        self.assertEqual(context['answered_count'], 4)
+        self.assertEqual(context['correct_count'], 2)
+        self.assertEqual(context['incorrect_count'], 2)
+        self.assertEqual(context['avg_time_per_question'], 13.3)
+        self.assertEqual([t['topic'] for t in context['weak_topics']], ['Waves', 'Optics'])
+        self.assertEqual(context['weak_topics'][1]['accuracy'], 33.3)
+        self.assertEqual(
+            context['missed_topics'],
+            [{'topic': 'Optics', 'unanswered': 1, 'total': 3}, {'topic': 'Waves', 'unanswered': 1, 'total': 1}],
+        )
+
+    def test_statistics_are_stored_once(self):
+        attempt = self.make_attempt([('Optics', 'A', True, 4, 30), ('Waves', None, False, 0, 0)])
+
+        first = self.client.get(self.results_url(attempt)).context
+        summary = AttemptSummary.objects.get(attempt=attempt)
+        second = self.client.get(self.results_url(attempt)).context
+
+        self.assertEqual(summary.correct_count, 1)
+        self.assertEqual(summary.unanswered_count, 1)
+        for key in ('topic_stats', 'weak_topics', 'missed_topics', 'avg_time_per_question', 'correct_count'):
+            self.assertEqual(first[key], second[key])
+
+    def test_query_count_does_not_grow_with_questions(self):
+        small = self.make_attempt([('Optics', 'A', True, 4, 30)] * 3)
+        large = self.make_attempt([('Optics', 'A', True, 4, 30), ('Waves', None, False, 0, 0)] * 50)
+        for attempt in (small, large):
+            summarize_attempt(attempt)
+
+        with CaptureQueriesContext(connection) as small_queries:
+            self.client.get(self.results_url(small))
+        with self.assertNumQueries(len(small_queries)):
+            response = self.client.get(self.results_url(large))
+
+        self.assertEqual(response.status_code, 200)
+        # session, user, attempt with exam, student and summary, question table,
+        # best percentage, bucket totals, ties in the bucket, leaderboard
+        self.assertEqual(len(small_queries), 8)
+
+    def test_rank_and_leaderboard(self):
+        def candidate(name, percentages):
+            user = User.objects.create_user(name, f'{name}@example.com', 'password')
+            profile = StudentProfile.objects.create(user=user, first_name=name.title(), last_name='Smith', email=f'{name}@example.com')
+            for number, percentage in enumerate(percentages, start=1):
+                ExamAttempt.objects.create(
+                    student=profile, exam=self.exam, attempt_number=number, score=percentage * 0.4,
+                    total_marks=40, percentage=percentage, time_taken=timedelta(minutes=30),
+                )
+
+        candidate('ann', [90])
+        candidate('bob', [40, 72.55])
+        candidate('cat', [72.51])
+        candidate('dan', [10])
+        attempt = self.make_attempt([('Optics', 'A', True, 4, 30)])
+        ExamAttempt.objects.filter(id=attempt.id).update(percentage=20)
+        # Only the best attempt counts: a later, better attempt moves the student up
+        better = ExamAttempt.objects.create(
+            student=self.profile, exam=self.exam, attempt_number=2, score=29,
+            total_marks=40, percentage=72.55, time_taken=timedelta(minutes=30),
+        )
+
+        context = self.client.get(self.results_url(better)).context
+
+        # Tied with bob for second, ahead of cat in the same 0.1% bucket
+        self.assertEqual(context['ranking'], {'rank': 2, 'total': 5, 'percentile': 75.0})
+        self.assertEqual(
+            [(entry['rank'], entry['name']) for entry in context['leaderboard']],
+            [(1, 'Ann S'), (2, 'Test S'), (2, 'Bob S'), (4, 'Cat S'), (5, 'Dan S')],
+        )
+
+        better.delete()
+        context = self.client.get(self.results_url(attempt)).context
+        self.assertEqual(context['ranking']['rank'], 4)
+
+    def test_other_students_attempt_is_forbidden(self):
+        attempt = self.make_attempt([('Optics', 'A', True, 4, 30)])
+        other = User.objects.create_user('other', 'other@example.com', 'password')
+        self.client.force_login(other)
+
+        self.assertEqual(self.client.get(self.results_url(attempt)).status_code, 403)
+
+
+class CataloguePageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+
+    def test_pages_are_cached_until_the_catalogue_changes(self):
+        first = self.client.get('/courses/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/courses/')
+        self.assertEqual(second.content, first.content)
+
+        not_modified = self.client.get('/courses/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Exam.objects.create(name='Chemistry', total_marks=40, duration=timedelta(minutes=60))
+
+        changed = self.client.get('/courses/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertContains(changed, 'Chemistry')
+
+    def test_logged_in_visitors_get_their_own_copy(self):
+        guest = self.client.get('/courses/')
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.client.force_login(user)
+
+        member = self.client.get('/courses/')
+
+        self.assertNotEqual(member['ETag'], guest['ETag'])
+        self.assertContains(member, 'Start Exam')
+        self.assertIn('private', member['Cache-Control'])
+
+
+class CacheNamespaceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_value_is_served_while_another_request_recomputes(self):
+        namespace = Namespace('test:values')
+        self.assertEqual(namespace.get_or_compute(('a',), lambda: 1, 60, stamp=1), 1)
+
+        def fail():
+            raise AssertionError('recomputed while locked')
+
+        cache.add(namespace.key('a') + ':lock', 1)
+        self.assertEqual(namespace.get_or_compute(('a',), fail, 60, stamp=2), 1)
+
+        cache.delete(namespace.key('a') + ':lock')
+        self.assertEqual(namespace.get_or_compute(('a',), lambda: 2, 60, stamp=2), 2)
+        self.assertEqual(namespace.get_or_compute(('a',), fail, 60, stamp=2), 2)
+
+    def test_bump_orphans_every_key(self):
+        namespace = Namespace('test:versioned', versioned=True)
+        namespace.set('a', value=1, timeout=60)
+        version = namespace.version()
+
+        namespace.bump()
+
+        self.assertIsNone(namespace.get('a'))
+        self.assertGreater(namespace.version(), version)
+
+    def test_process_local_cache_is_reported(self):
+        self.assertEqual([error.id for error in check_shared_cache(None)], ['examPortal.W001'])
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/tmp'}}
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class AutosaveTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, _, _ = make_paper(self.exam)
+
+    def autosave(self, key, seq):
+        changes = {f'mcq-{self.mcq.id}': {'answer': 'A', 'time_spent': seq}}
+        return apply_autosave(self.profile, self.exam, self.test_paper, key, seq, changes)
+
+    def test_batches_apply_in_order(self):
+        _, applied = self.autosave('sitting', 2)
+        self.assertTrue(applied)
+        _, applied = self.autosave('sitting', 1)
+        self.assertFalse(applied)
+
+    def test_late_batch_after_submit_does_not_recreate_the_sitting(self):
+        self.autosave('sitting', 1)
+        enqueue_submission(self.profile, self.exam, self.test_paper, {'answers': {}}, idempotency_key='sitting')
+        ExamSession.objects.filter(student=self.profile, exam=self.exam).delete()
+
+        with self.assertRaises(SittingSubmitted):
+            self.autosave('sitting', 2)
+
+        self.assertFalse(ExamSession.objects.filter(student=self.profile, exam=self.exam).exists())
+
+
+class PaperCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, _, _ = make_paper(self.exam)
+
+    def test_bundle_follows_the_paper_revision(self):
+        self.assertEqual(get_paper_bundle(self.test_paper)['questions'][0]['text'], 'MCQ')
+
+        self.mcq.question_text = 'Changed'
+        self.mcq.save()
+        # A reader that loaded the paper before the change keeps its bundle
+        self.assertEqual(get_paper_bundle(self.test_paper)['questions'][0]['text'], 'MCQ')
+
+        self.test_paper.refresh_from_db()
+        self.assertEqual(get_paper_bundle(self.test_paper)['questions'][0]['text'], 'Changed')
+
+    def test_answer_key_follows_the_paper_revision(self):
+        mcq = get_answer_key(self.test_paper).resolve(f'mcq-{self.mcq.id}')
+        self.assertTrue(get_answer_key(self.test_paper).is_correct(mcq, 'A'))
+
+        with transaction.atomic():
+            self.mcq.correct_option = 'B'
+            self.mcq.save()
+            transaction.set_rollback(True)
+
+        # A rolled back change leaves the revision, and so the cached key, alone
+        self.test_paper.refresh_from_db()
+        self.assertTrue(get_answer_key(self.test_paper).is_correct(mcq, 'A'))
+
+        self.mcq.correct_option = 'B'
+        self.mcq.save()
+        self.test_paper.refresh_from_db()
+        self.assertTrue(get_answer_key(self.test_paper).is_correct(mcq, 'B'))
+
+
+class GradingTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, self.msq, self.numerical = make_paper(self.exam)
+
+    def grade(self, answers, time_spent=None):
+        return grade_submission(AnswerKey.for_test_paper(self.test_paper), answers, time_spent or {})
+
+    def rows_by_type(self, graded):
+        return {row['question_type']: row for row in graded.rows}
+
+    def test_correct_answers_earn_their_marks(self):
+        graded = self.grade({
+            f'mcq-{self.mcq.id}': 'A',
+            f'msq-{self.msq.id}': 'A,C',
+            f'numerical-{self.numerical.id}': '2.505',
+        }, {f'mcq-{self.mcq.id}': 30})
+
+        self.assertEqual((graded.score, graded.total_marks, graded.percentage), (12, 12, 100))
+        rows = self.rows_by_type(graded)
+        self.assertTrue(all(row['is_correct'] for row in graded.rows))
+        self.assertEqual(rows['mcq']['time_spent_seconds'], 30)
+        self.assertEqual(rows['numerical']['topic'], 'Waves')
+
+    def test_wrong_answers_lose_the_negative_marks(self):
+        graded = self.grade({
+            f'mcq-{self.mcq.id}': 'B',
+            f'msq-{self.msq.id}': 'A',
+            f'numerical-{self.numerical.id}': '2.6',
+        })
+
+        rows = self.rows_by_type(graded)
+        self.assertEqual([rows[t]['marks_obtained'] for t in ('mcq', 'msq', 'numerical')], [-1, -2, 0])
+        self.assertEqual(graded.score, -3)
+        self.assertFalse(any(row['is_correct'] for row in graded.rows))
+
+    def test_unanswered_questions_score_zero(self):
+        graded = self.grade({f'mcq-{self.mcq.id}': 'A', 'mcq-999999': 'A', 'bogus': 'A'})
+
+        self.assertEqual(len(graded.rows), 3)
+        rows = self.rows_by_type(graded)
+        for q_type in ('msq', 'numerical'):
+            self.assertEqual(
+                (rows[q_type]['user_answer'], rows[q_type]['is_correct'], rows[q_type]['marks_obtained']),
+                (None, False, 0),
+            )
+        self.assertEqual(graded.score, 4)
+
+    def test_legacy_plain_ids_match_in_type_order(self):
+        # Each question type has its own table, so a plain id can name several questions
+        Question_type_msq.objects.filter(id=self.msq.id).update(id=self.mcq.id)
+
+        graded = self.grade({str(self.mcq.id): 'A'})
+
+        rows = self.rows_by_type(graded)
+        self.assertTrue(rows['mcq']['is_correct'])
+        self.assertIsNone(rows['msq']['user_answer'])
+
+    def test_msq_options_in_any_order(self):
+        for answer in ('C,A', ['C', 'A'], 'A,C'):
+            with self.subTest(answer=answer):
+                graded = self.grade({f'msq-{self.msq.id}': answer})
+                self.assertTrue(self.rows_by_type(graded)['msq']['is_correct'])
+        graded = self.grade({f'msq-{self.msq.id}': 'A,C,D'})
+        self.assertFalse(self.rows_by_type(graded)['msq']['is_correct'])
+
+    def test_numerical_zero_is_an_answer(self):
+        Question_type_numerical.objects.filter(id=self.numerical.id).update(correct_answer=0)
+
+        for answer in (0, '0', '0.0', -0.001):
+            with self.subTest(answer=answer):
+                graded = self.grade({f'numerical-{self.numerical.id}': answer})
+                self.assertTrue(self.rows_by_type(graded)['numerical']['is_correct'])
+        graded = self.grade({f'numerical-{self.numerical.id}': ''})
+        self.assertFalse(self.rows_by_type(graded)['numerical']['is_correct'])
+
+
+class SubmissionQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, _, _ = make_paper(self.exam)
+
+    def enqueue(self, answer='A', total_time=600, **kwargs):
+        payload = {'answers': {f'mcq-{self.mcq.id}': answer}, 'time_spent': {}, 'total_time': total_time}
+        return enqueue_submission(self.profile, self.exam, self.test_paper, payload, **kwargs)[0]
+
+    def run_worker(self):
+        call_command('run_grading_worker', '--once', stdout=io.StringIO())
+
+    def test_submit_is_queued_and_acknowledged(self):
+        self.client.force_login(self.user)
+
+        response = self.client.post(
+            f'/exam/{self.exam.id}/submit/',
+            json.dumps({'answers': {f'mcq-{self.mcq.id}': 'A'}, 'time_spent': {}, 'total_time': 600}),
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 202)
+        submission = ExamSubmission.objects.get(id=response.json()['submission_id'])
+        self.assertEqual(submission.status, ExamSubmission.STATUS_PENDING)
+        self.assertFalse(ExamAttempt.objects.exists())
+
+    def test_worker_grades_the_submission(self):
+        submission = self.enqueue()
+
+        self.run_worker()
+
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, ExamSubmission.STATUS_GRADED)
+        attempt = submission.attempt
+        self.assertEqual((attempt.attempt_number, attempt.score, attempt.total_marks), (1, 4, 12))
+        self.assertEqual(attempt.question_answers.count(), 3)
+        self.assertTrue(AttemptSummary.objects.filter(attempt=attempt).exists())
+
+    def test_a_failing_submission_does_not_sink_the_batch(self):
+        # Fails after the attempt number was taken: the savepoint must undo that too
+        broken = self.enqueue(total_time='a while')
+        graded = self.enqueue(answer='B')
+
+        self.run_worker()
+
+        broken.refresh_from_db()
+        graded.refresh_from_db()
+        self.assertEqual(broken.status, ExamSubmission.STATUS_FAILED)
+        self.assertIsNone(broken.attempt)
+        self.assertTrue(broken.failure_reason)
+        self.assertEqual(graded.status, ExamSubmission.STATUS_GRADED)
+        self.assertEqual((graded.attempt.attempt_number, graded.attempt.score), (1, -1))
+
+    def test_overdue_submissions_are_graded_inline(self):
+        submission = self.enqueue()
+        with override_settings(SUBMISSION_GRADE_INLINE_AFTER=60):
+            self.assertEqual(grade_if_overdue(submission).status, ExamSubmission.STATUS_PENDING)
+
+            ExamSubmission.objects.filter(id=submission.id).update(
+                submitted_at=timezone.now() - timedelta(minutes=2)
+            )
+            submission.refresh_from_db()
+            submission = grade_if_overdue(submission)
+
+        self.assertEqual(submission.status, ExamSubmission.STATUS_GRADED)
+        self.assertEqual(submission.attempt.score, 4)
+
+    def expire_claims(self):
+        ExamSubmission.objects.update(claimed_at=timezone.now() - timedelta(minutes=10))
+
+    def test_stale_claims_are_graded_again(self):
+        worker_died = self.enqueue()
+        poll_waits = self.enqueue(answer='B')
+        claim_submissions(10)
+        poll_waits.refresh_from_db()
+
+        with override_settings(SUBMISSION_CLAIM_TIMEOUT=300):
+            # Still within the claim: the worker may just be slow
+            self.assertEqual(grade_if_overdue(poll_waits).status, ExamSubmission.STATUS_GRADING)
+            self.assertEqual(claim_submissions(10), [])
+
+            self.expire_claims()
+            poll_waits.refresh_from_db()
+            self.assertEqual(grade_if_overdue(poll_waits).status, ExamSubmission.STATUS_GRADED)
+            self.run_worker()
+
+        worker_died.refresh_from_db()
+        self.assertEqual(worker_died.status, ExamSubmission.STATUS_GRADED)
+        self.assertEqual(ExamAttempt.objects.count(), 2)
+
+    def test_a_claim_taken_over_is_not_graded_twice(self):
+        self.enqueue()
+        slow = claim_submissions(10)
+        self.expire_claims()
+        taken_over = claim_submissions(10)
+
+        grade_submissions(taken_over)
+        grade_submissions(slow)
+
+        self.assertEqual(ExamAttempt.objects.count(), 1)
+        self.assertEqual(ExamSubmission.objects.get().attempt_id, taken_over[0].attempt_id)
+
+    def test_a_failing_batch_goes_back_to_the_queue(self):
+        submission = self.enqueue()
+        batch = claim_submissions(10)
+
+        with mock.patch.object(ExamSubmission, 'save', side_effect=DatabaseError('disk I/O error')):
+            with self.assertRaises(DatabaseError):
+                grade_submissions(batch)
+
+        submission.refresh_from_db()
+        self.assertEqual((submission.status, submission.claimed_by), (ExamSubmission.STATUS_PENDING, None))
+        self.assertFalse(ExamAttempt.objects.exists())
+
+
+class IdempotentSubmissionTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, _, _, _ = make_paper(self.exam)
+        self.payload = {'answers': {}, 'time_spent': {}, 'total_time': 60}
+
+    def enqueue(self, idempotency_key=None):
+        return enqueue_submission(self.profile, self.exam, self.test_paper, self.payload, idempotency_key=idempotency_key)
+
+    def test_retries_with_the_same_token_are_one_submission(self):
+        first, created = self.enqueue('sitting-1')
+        retry, retried = self.enqueue('sitting-1')
+
+        self.assertTrue(created)
+        self.assertFalse(retried)
+        self.assertEqual(retry, first)
+
+    def test_sittings_with_identical_answers_are_separate_submissions(self):
+        first, _ = self.enqueue('sitting-1')
+        second, created = self.enqueue('sitting-2')
+
+        self.assertTrue(created)
+        self.assertNotEqual(second, first)
+
+    def test_identical_payloads_without_a_token_are_one_submission(self):
+        first, _ = self.enqueue()
+        second, created = self.enqueue()
+
+        self.assertFalse(created)
+        self.assertEqual(second, first)
+        # A sitting with a token is not mistaken for the tokenless one
+        self.assertTrue(self.enqueue('sitting-1')[1])
+
+    def test_a_concurrent_retry_returns_the_winner(self):
+        winner, _ = self.enqueue('sitting-1')
+        real_first = QuerySet.first
+        lookups = []
+
+        def first_misses_once(queryset):
+            # The retry looked before the winner committed
+            lookups.append(queryset)
+            return None if len(lookups) == 1 else real_first(queryset)
+
+        with mock.patch.object(QuerySet, 'first', first_misses_once):
+            submission, created = self.enqueue('sitting-1')
+
+        self.assertFalse(created)
+        self.assertEqual(submission, winner)
+
+    def test_other_integrity_errors_are_raised(self):
+        with mock.patch.object(ExamSubmission.objects, 'create', side_effect=IntegrityError('boom')):
+            with self.assertRaises(IntegrityError):
+                self.enqueue('sitting-1')
+
+
+class AttemptNumberTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.profiles = [
+            StudentProfile.objects.create(
+                user=User.objects.create_user(name, f'{name}@example.com', 'password'),
+                first_name=name, last_name='Student', email=f'{name}@example.com',
+            )
+            for name in ('first', 'second')
+        ]
+
+    def add_attempts(self, profile, numbers):
+        for number in numbers:
+            ExamAttempt.objects.create(
+                student=profile, exam=self.exam, attempt_number=number,
+                score=0, total_marks=12, time_taken=timedelta(minutes=1),
+            )
+
+    def test_first_and_later_attempts(self):
+        profile = self.profiles[0]
+        with transaction.atomic():
+            self.assertEqual(next_attempt_number(profile, self.exam), 1)
+        with transaction.atomic():
+            self.assertEqual(next_attempt_number(profile, self.exam), 2)
+        with transaction.atomic():
+            self.assertEqual(next_attempt_number(profile, self.exam), 3)
+
+        self.assertEqual(AttemptCounter.objects.get(student=profile, exam=self.exam).last_attempt_number, 3)
+        # Counters are per student
+        with transaction.atomic():
+            self.assertEqual(next_attempt_number(self.profiles[1], self.exam), 1)
+
+    def test_counter_agrees_with_the_migration_backfill(self):
+        self.add_attempts(self.profiles[0], [1, 2, 5])
+        self.add_attempts(self.profiles[1], [1])
+
+        # Without a counter, numbering continues from the attempts already there
+        with transaction.atomic():
+            fallback = [next_attempt_number(profile, self.exam) for profile in self.profiles]
+        AttemptCounter.objects.all().delete()
+
+        migration = importlib.import_module('student.migrations.0005_attemptcounter')
+        migration.seed_attempt_counters(apps, None)
+        seeded = {
+            counter.student_id: counter.last_attempt_number
+            for counter in AttemptCounter.objects.filter(exam=self.exam)
+        }
+        self.assertEqual(seeded, {self.profiles[0].id: 5, self.profiles[1].id: 1})
+
+        with transaction.atomic():
+            after_backfill = [next_attempt_number(profile, self.exam) for profile in self.profiles]
+        self.assertEqual(after_backfill, fallback)
+        self.assertEqual(after_backfill, [6, 2])
+
+
+class AttemptSummaryTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, self.msq, self.numerical = make_paper(self.exam)
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+
+    def test_summary_at_grading_matches_the_database_summary(self):
+        self.numerical.correct_answer = 0
+        self.numerical.save()
+        self.test_paper.refresh_from_db()
+        answers = {f'mcq-{self.mcq.id}': 'B', f'numerical-{self.numerical.id}': 0}
+        graded = grade_submission(get_answer_key(self.test_paper), answers, {})
+
+        attempt = record_attempt(self.profile, self.exam, graded, answers, {}, total_time=60)
+
+        stored = AttemptSummary.objects.get(attempt=attempt)
+        rebuilt = summarize_attempt(attempt)
+        self.assertEqual(
+            (stored.answered_count, stored.correct_count, stored.incorrect_count, stored.unanswered_count),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual(
+            (rebuilt.answered_count, rebuilt.correct_count, rebuilt.incorrect_count, rebuilt.unanswered_count),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual(stored.topic_stats, rebuilt.topic_stats)
+        waves = next(stats for stats in stored.topic_stats if stats['topic'] == 'Waves')
+        self.assertEqual((waves['correct'], waves['unanswered'], waves['marks_obtained']), (1, 0, 4))
+
+
+class AttemptAnswersTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, self.mcq, self.msq, self.numerical = make_paper(self.exam)
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+
+    def test_recorded_answers_round_trip_as_dicts(self):
+        answers = {f'mcq-{self.mcq.id}': 'A', f'msq-{self.msq.id}': 'A,C', f'numerical-{self.numerical.id}': '2.5'}
+        time_spent = {f'mcq-{self.mcq.id}': 30, f'msq-{self.msq.id}': 45}
+        graded = grade_submission(AnswerKey.for_test_paper(self.test_paper), answers, time_spent)
+
+        attempt = record_attempt(self.profile, self.exam, graded, answers, time_spent, total_time=75)
+
+        attempt = ExamAttempt.objects.get(id=attempt.id)
+        self.assertEqual(attempt.get_answers(), answers)
+        self.assertEqual(attempt.get_time_spent(), time_spent)
+        self.assertIsInstance(attempt.time_spent[f'mcq-{self.mcq.id}'], int)
+        # The columns hold JSON, not text: keys can be queried in SQL
+        attempts = ExamAttempt.objects.filter(exam=self.exam)
+        self.assertTrue(attempts.filter(answers__has_key=f'msq-{self.msq.id}').exists())
+        self.assertFalse(attempts.filter(time_spent__has_key=f'numerical-{self.numerical.id}').exists())
+
+    def test_non_dict_values_read_as_empty(self):
+        attempt = ExamAttempt.objects.create(
+            student=self.profile, exam=self.exam, attempt_number=1, score=0,
+            time_taken=timedelta(minutes=1), answers=['A'], time_spent=30,
+        )
+
+        attempt = ExamAttempt.objects.get(id=attempt.id)
+        self.assertEqual((attempt.get_answers(), attempt.get_time_spent()), ({}, {}))
+        self.assertEqual(ExamAttempt(student=self.profile, exam=self.exam).get_answers(), {})
+
+    def test_migration_parses_the_old_text_columns(self):
+        migration = importlib.import_module('student.migrations.0011_examattempt_answers_time_spent_jsonfield')
+
+        self.assertEqual(migration._load('{"mcq-1": "A", "numerical-2": "2.5"}'), {'mcq-1': 'A', 'numerical-2': '2.5'})
+        for raw in ('', None, 'not json', '["A"]', 'null'):
+            self.assertEqual(migration._load(raw), {}, raw)
@@ -16,6 +16,9 @@ urlpatterns = [
     path('instructions/<int:exam_id>/', views.InstructionView.as_view(), name='instructions'),
     path('exam/<int:exam_id>/', views.ExamView.as_view(), name='exam'),
     path('exam/<int:exam_id>/submit/', views.submit_exam, name='submit-exam'),
+    path('exam/<int:exam_id>/autosave/', views.autosave_exam, name='autosave-exam'),
+    path('exam/<int:exam_id>/submission/<int:submission_id>/', views.SubmissionStatusView.as_view(), name='submission-status'),
+    path('exam/<int:exam_id>/submission/<int:submission_id>/status/', views.submission_status_api, name='submission-status-api'),
     path('exam/<int:exam_id>/results/<int:attempt_id>/', views.ExamResultsView.as_view(), name='exam-results'),
     # Courses and course exams pages
     path('courses/', views.CoursesView.as_view(), name='courses'),
@@ -0,0 +1,142 @@
+"""
+Helpers over the shared cache (``CACHES['default']``, see settings).
+
+Each cached family of values is a ``Namespace``, whose keys read
+``<namespace>:<parts>``. A versioned namespace puts its version in every key
+(``<namespace>:<version>:<parts>``); the version lives in the cache itself
+and is the time of the namespace's last ``bump()`` in microseconds, so
+bumping orphans every key of the namespace at once (old entries simply
+expire) and the version doubles as a timestamp for Last-Modified headers.
+
+``get_or_compute`` guards expensive values against stampedes. Entries can
+carry a stamp of the data they were computed from; once it is out of date,
+one caller takes a short lock and recomputes while the others keep getting
+the stale value. On a cold miss the others wait for the lock holder instead
+of computing the same thing in parallel.
+
+Locks use ``cache.add``, which is atomic on Redis and locmem and best effort
+on the file backend; a lost race only costs a duplicate computation.
+
+The web process and the workers must share the cache; ``check_shared_cache``
+warns at startup when it is process-local.
+"""
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import cache
+
+_MISSING = object()
+
+
+def _now_version():
+    return time.time_ns() // 1000
+
+
+def _lock_timeout():
+    return getattr(settings, 'CACHE_RECOMPUTE_LOCK_TIMEOUT', 30)
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """System check: a locmem cache is not seen by the other processes"""
+    if settings.CACHES['default']['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache':
+        return []
+    return [
+        checks.Warning(
+            'The cache is process-local (CACHE_URL=locmem://): the grading and import '
+            'workers and the web process will not see each other\'s cache entries.',
+            hint='Set CACHE_URL to a file:// or redis:// cache shared by every process.',
+            id='examPortal.W001',
+        )
+    ]
+
+
+class Namespace:
+    def __init__(self, name, versioned=False):
+        self.name = name
+        self.versioned = versioned
+
+    @property
+    def version_key(self):
+        return f'{self.name}:version'
+
+    def version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # Nothing known about the last change (cold cache): start from now
+            cache.add(self.version_key, _now_version(), None)
+            version = cache.get(self.version_key, 0)
+        return version
+
+    def bump(self):
+        """Invalidate every key of the namespace"""
+        cache.set(self.version_key, max(_now_version(), self.version() + 1), None)
+
+    def key(self, *parts, version=None):
+        if not self.versioned:
+            return ':'.join([self.name, *map(str, parts)])
+        if version is None:
+            version = self.version()
+        return ':'.join([self.name, str(version), *map(str, parts)])
+
+    def get(self, *parts, default=None):
+        return cache.get(self.key(*parts), default)
+
+    def add(self, *parts, value, timeout):
+        return cache.add(self.key(*parts), value, timeout)
+
+    def set(self, *parts, value, timeout):
+        cache.set(self.key(*parts), value, timeout)
+
+    def delete(self, *parts):
+        cache.delete(self.key(*parts))
+
+    def get_or_compute(self, parts, compute, timeout, stamp=None, version=None):
+        """
+        The value cached under ``parts`` for ``timeout`` seconds, computing
+        and storing it on a miss. It is recomputed, by one caller at a time,
+        when ``stamp`` differs from the one it was computed with.
+        """
+        key = self.key(*parts, version=version)
+        entry = cache.get(key)
+        if entry is not None:
+            value, entry_stamp = entry
+            if entry_stamp == stamp:
+                return value
+            if not cache.add(f'{key}:lock', 1, _lock_timeout()):
+                # Someone else is recomputing; the stale value will do meanwhile
+                return value
+            return self._compute_and_release(key, compute, timeout, stamp)
+
+        if not cache.add(f'{key}:lock', 1, _lock_timeout()):
+            value = self._wait_for(key)
+            if value is not _MISSING:
+                return value
+            # The lock holder died or is slow; compute without waiting longer
+            value = compute()
+            cache.set(key, (value, stamp), timeout)
+            return value
+        return self._compute_and_release(key, compute, timeout, stamp)
+
+    @staticmethod
+    def _compute_and_release(key, compute, timeout, stamp):
+        try:
+            value = compute()
+            cache.set(key, (value, stamp), timeout)
+            return value
+        finally:
+            cache.delete(f'{key}:lock')
+
+    @staticmethod
+    def _wait_for(key):
+        deadline = time.monotonic() + _lock_timeout()
+        delay = 0.01
+        while time.monotonic() < deadline:
+            time.sleep(delay)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+            if cache.get(f'{key}:lock') is None:
+                break
+            delay = min(delay * 2, 0.5)
+        return _MISSING
@@ -44,6 +44,9 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
+    # Access tokens carry the student profile id, premium and teacher flags
+    'TOKEN_OBTAIN_SERIALIZER': 'student.tokens.PortalTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'student.tokens.PortalTokenRefreshSerializer',
 }
 
 # Application definition
@@ -70,6 +73,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'student.middleware.JWTCookieAuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,6 +91,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'django.template.context_processors.static',
+                'student.context_processors.ads',
             ],
         },
     },
@@ -106,6 +111,46 @@ DATABASES = {
 }
 
 
+# Cache
+# CACHE_URL picks the cache backend shared by the web process and the workers:
+#   file:///var/tmp/examportal     shared by the processes of one host
+#                                  (default: .cache in the project directory)
+#   redis://127.0.0.1:6379/1       any Redis-protocol server (Redis, Valkey, KeyDB);
+#                                  needs the redis package
+#   locmem://                      per process; only correct when a single process
+#                                  serves everything (startup warns, see examPortal.W001)
+# Tests use locmem (examPortal/test_settings.py).
+CACHE_URL = os.getenv('CACHE_URL', f"file://{BASE_DIR / '.cache'}")
+
+_cache_scheme, _, _cache_location = CACHE_URL.partition('://')
+if _cache_scheme == 'file':
+    _cache_backend = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': _cache_location,
+    }
+elif _cache_scheme in ('redis', 'rediss'):
+    _cache_backend = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_URL,
+    }
+else:
+    _cache_backend = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'examportal',
+    }
+
+CACHES = {
+    'default': {
+        **_cache_backend,
+        'KEY_PREFIX': 'examportal',
+    }
+}
+
+# How long one request may hold the lock to recompute a cached value before
+# others stop waiting for it (seconds)
+CACHE_RECOMPUTE_LOCK_TIMEOUT = 30
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -157,6 +202,33 @@ ADSENSE_CLIENT = os.getenv('ADSENSE_CLIENT', '')
 ADSENSE_SLOT_EXAM = os.getenv('ADSENSE_SLOT_EXAM', '')
 ADSENSE_SLOT_RESULTS = os.getenv('ADSENSE_SLOT_RESULTS', '')
 
+# Compiled exam paper bundles stay cached until the paper changes (seconds)
+PAPER_BUNDLE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Rendered landing and course list pages, per catalogue version (seconds)
+CATALOGUE_PAGE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Grading answer keys: shared-cache lifetime (seconds) and per-process LRU size
+ANSWER_KEY_CACHE_TIMEOUT = 60 * 60 * 24
+ANSWER_KEY_LOCAL_CACHE_SIZE = 256
+
+# Submissions are graded by `manage.py run_grading_worker`; if none has picked a
+# submission up after this many seconds, the status page grades it inline
+SUBMISSION_GRADE_INLINE_AFTER = 10
+
+# A submission claimed this many seconds ago and still not graded belongs to a
+# worker that died; it is claimed again by the next worker or status poll
+SUBMISSION_CLAIM_TIMEOUT = 60 * 5
+
+# How long the submission token handed out with an exam page stays valid
+SUBMISSION_TOKEN_MAX_AGE = 60 * 60 * 24
+
+# Cached student profile flags (profile id, premium) per user (seconds); profile saves drop them
+STUDENT_PROFILE_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Verified `jwt` cookies remembered per process until they expire (entries)
+JWT_COOKIE_CACHE_SIZE = 1024
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
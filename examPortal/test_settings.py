@@ -0,0 +1,17 @@
+"""
+Settings for the test suite: ``python manage.py test --settings=examPortal.test_settings``
+(pytest picks them up from pyproject.toml).
+"""
+from examPortal.settings import *  # noqa: F401,F403
+
+# Every test starts from cache.clear(); keep that away from the shared cache
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'examportal-tests',
+        'KEY_PREFIX': 'examportal',
+    }
+}
+
+# A process-local cache is what the tests want
+SILENCED_SYSTEM_CHECKS = ['examPortal.W001']
@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'examPortal.settings')
+    # `manage.py test` runs on the test settings unless told otherwise
+    default_settings = 'examPortal.test_settings' if sys.argv[1:2] == ['test'] else 'examPortal.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', default_settings)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
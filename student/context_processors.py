@@ -0,0 +1,13 @@
+from django.conf import settings
+
+
+def ads(request):
+    """AdSense settings, and whether to show ads: to everyone but premium students"""
+    user = getattr(request, 'user', None)
+    return {
+        # Called by the template, so pages that never test it cost nothing
+        'show_ads': lambda: not getattr(user, 'is_premium', False),
+        'adsense_client': getattr(settings, 'ADSENSE_CLIENT', ''),
+        'adsense_slot_exam': getattr(settings, 'ADSENSE_SLOT_EXAM', ''),
+        'adsense_slot_results': getattr(settings, 'ADSENSE_SLOT_RESULTS', ''),
+    }
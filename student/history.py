@@ -0,0 +1,118 @@
+"""
+A student's results history, one group per exam, newest first.
+
+Groups are ordered by each exam's latest attempt and paged with a keyset
+cursor on (latest attempt date, exam id) rather than an offset, so every
+page costs the same two queries however far the student scrolls: one
+indexed read of the page's StudentExamStats rows (attempt count, best
+score, latest date) and one for their most recent attempts. A group lists
+its latest attempts; older ones are paged the same way, on (date taken,
+attempt id), with ``exam_attempts_page``.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from student.models import ExamAttempt, StudentExamStats
+
+# Exam groups per page
+RESULTS_PAGE_SIZE = 10
+
+# Attempts listed under each exam at a time; the group shows the full count
+ATTEMPTS_PER_GROUP = 20
+
+
+def encode_cursor(date, row_id):
+    raw = json.dumps([date.isoformat(), row_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """``(date, row_id)`` of a cursor, or ValueError if it is malformed"""
+    try:
+        date, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.fromisoformat(date), int(row_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def _attempts_cursor(attempts, attempt_count):
+    """Cursor for the attempts after ``attempts``, None if they are the last"""
+    if len(attempts) >= attempt_count:
+        return None
+    last = attempts[-1]
+    return encode_cursor(last.date_taken, last.id)
+
+
+def results_page(student_id, cursor=None, page_size=RESULTS_PAGE_SIZE):
+    """
+    One page of exam groups after ``cursor``. Returns ``(groups, next_cursor)``;
+    ``next_cursor`` is None on the last page.
+    """
+    groups = (
+        StudentExamStats.objects.filter(student_id=student_id)
+        .values('exam_id', 'attempt_count', 'best_score', latest_date=F('latest_date_taken'))
+        .order_by('-latest_date_taken', '-exam_id')
+    )
+    if cursor:
+        latest_date, exam_id = decode_cursor(cursor)
+        groups = groups.filter(
+            Q(latest_date_taken__lt=latest_date) | Q(latest_date_taken=latest_date, exam_id__lt=exam_id)
+        )
+    groups = list(groups[:page_size + 1])
+    has_more = len(groups) > page_size
+    groups = groups[:page_size]
+    if not groups:
+        return [], None
+
+    attempts = (
+        ExamAttempt.objects.filter(student_id=student_id, exam_id__in=[group['exam_id'] for group in groups])
+        .select_related('exam', 'summary')
+        .annotate(recency=Window(
+            RowNumber(), partition_by=F('exam_id'), order_by=[F('date_taken').desc(), F('id').desc()]
+        ))
+        .filter(recency__lte=ATTEMPTS_PER_GROUP)
+        .order_by('-date_taken', '-id')
+    )
+    attempts_by_exam = {}
+    for attempt in attempts:
+        attempts_by_exam.setdefault(attempt.exam_id, []).append(attempt)
+
+    page = []
+    for group in groups:
+        exam_attempts = attempts_by_exam.get(group['exam_id'], [])
+        if not exam_attempts:
+            continue
+        page.append({
+            'exam': exam_attempts[0].exam,
+            'attempts': exam_attempts,
+            'attempt_count': group['attempt_count'],
+            'best_score': group['best_score'],
+            'latest_attempt': exam_attempts[0],
+            'next_attempts_cursor': _attempts_cursor(exam_attempts, group['attempt_count']),
+        })
+
+    last = groups[-1]
+    next_cursor = encode_cursor(last['latest_date'], last['exam_id']) if has_more else None
+    return page, next_cursor
+
+
+def exam_attempts_page(student_id, exam_id, cursor, page_size=ATTEMPTS_PER_GROUP):
+    """
+    The student's attempts at one exam after ``cursor`` (from a group or an
+    earlier page), newest first. Returns ``(attempts, next_cursor)``.
+    """
+    date_taken, attempt_id = decode_cursor(cursor)
+    attempts = list(
+        ExamAttempt.objects.filter(student_id=student_id, exam_id=exam_id)
+        .filter(Q(date_taken__lt=date_taken) | Q(date_taken=date_taken, id__lt=attempt_id))
+        .select_related('summary')
+        .order_by('-date_taken', '-id')[:page_size + 1]
+    )
+    has_more = len(attempts) > page_size
+    attempts = attempts[:page_size]
+    next_cursor = encode_cursor(attempts[-1].date_taken, attempts[-1].id) if has_more else None
+    return attempts, next_cursor
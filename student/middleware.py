@@ -0,0 +1,236 @@
+"""
+Authentication from the ``jwt`` cookie set by the login page.
+
+``JWTCookieAuthenticationMiddleware`` runs after Django's
+AuthenticationMiddleware. A session login (teachers and staff use the admin
+and the teacher pages with one) always wins; otherwise, when the request
+carries a valid access token in the ``jwt`` cookie, its user becomes
+``request.user``. Views then only test ``request.user.is_authenticated``.
+
+Verifying a token costs an HMAC check and a User query, so each verified
+token is remembered in a bounded in-process LRU keyed by the token's SHA-256
+until the token expires. The entry holds the decoded claims and the user's
+field values; every request gets a fresh User built from them, so nothing
+cached on one request's user leaks into another's. Saving or deleting a User
+drops that user's entries here and, once the change commits, replaces the
+user's revocation stamp in the shared cache; an entry is only used while the
+stamp it was verified under is current, so the change reaches every process
+on its next request.
+
+``request.user`` is always a ``RequestUser``: a lazy proxy that answers
+``id``, ``student_profile_id`` and ``is_teacher`` from the token's portal
+claims (see ``student.tokens``), ``is_premium`` from the cached profile flags
+(see ``student.profiles``), and only builds the User, or queries the
+profile, when a view needs the model itself. Session users and tokens issued
+without the claims get the same attributes from the cache or the database.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.middleware import get_user
+from django.db import transaction
+from django.utils.functional import SimpleLazyObject, empty
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from examPortal.caching import Namespace
+from student.models import StudentProfile
+from student.profiles import profile_flags
+from student.tokens import PORTAL_CLAIMS
+
+JWT_COOKIE = 'jwt'
+
+_verified = OrderedDict()
+_verified_lock = threading.Lock()
+
+# Per-user revocation stamps; absent until the user first changes
+USER_STAMPS = Namespace('student:user_stamp')
+
+
+def _cache_size():
+    return getattr(settings, 'JWT_COOKIE_CACHE_SIZE', 1024)
+
+
+def _token_key(raw_token):
+    return hashlib.sha256(raw_token.encode('utf-8')).hexdigest()
+
+
+def _user_values(user):
+    return {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields}
+
+
+def _build_user(values, db):
+    user = get_user_model()(**values)
+    user._state.adding = False
+    user._state.db = db
+    return user
+
+
+class RequestUser(SimpleLazyObject):
+    """
+    ``request.user``, loaded on first use of anything the claims do not
+    answer. ``claims`` are the portal claims of the request's token, if any.
+    """
+
+    def __init__(self, func, user_id=None, claims=None):
+        super().__init__(func)
+        self.__dict__['_user_id'] = user_id
+        self.__dict__['_claims'] = claims if claims and all(claim in claims for claim in PORTAL_CLAIMS) else None
+
+    def _user(self):
+        if self._wrapped is empty:
+            self._setup()
+        return self._wrapped
+
+    @property
+    def id(self):
+        return self._user_id if self._user_id is not None else self._user().id
+
+    pk = id
+
+    @property
+    def is_authenticated(self):
+        return self._user_id is not None or self._user().is_authenticated
+
+    @property
+    def is_anonymous(self):
+        return not self.is_authenticated
+
+    def _load_profile(self):
+        try:
+            return self.studentprofile
+        except (StudentProfile.DoesNotExist, AttributeError):
+            return None
+
+    def _profile_flags(self):
+        if '_flags' not in self.__dict__:
+            self.__dict__['_flags'] = profile_flags(self.id, self._load_profile)
+        return self.__dict__['_flags']
+
+    @property
+    def student_profile_id(self):
+        """Id of the user's StudentProfile, None if they are not a student"""
+        if self._claims is not None:
+            return self._claims['student_profile_id']
+        return self._profile_flags()['student_profile_id']
+
+    @property
+    def is_premium(self):
+        # From the shared cache, which profile saves invalidate; the token's
+        # claim can lag by up to an access-token lifetime
+        return self._profile_flags()['is_premium']
+
+    @property
+    def is_teacher(self):
+        if self._claims is not None:
+            return self._claims['is_teacher']
+        return hasattr(self._user(), 'teacherprofile')
+
+    @property
+    def studentprofile(self):
+        if self._claims is None:
+            return self._user().studentprofile
+        if self._claims['student_profile_id'] is None:
+            raise get_user_model().studentprofile.RelatedObjectDoesNotExist('User has no studentprofile.')
+        if '_studentprofile' not in self.__dict__:
+            profile = StudentProfile.objects.get(pk=self._claims['student_profile_id'])
+            # The user is already in hand, no need to join it in
+            profile.user = self._user()
+            self.__dict__['_studentprofile'] = profile
+        return self.__dict__['_studentprofile']
+
+    @property
+    def teacherprofile(self):
+        if self._claims is not None and not self._claims['is_teacher']:
+            raise get_user_model().teacherprofile.RelatedObjectDoesNotExist('User has no teacherprofile.')
+        return self._user().teacherprofile
+
+
+def authenticate_token(raw_token):
+    """
+    ``(user, claims)`` for a raw access token, or None if it is invalid,
+    expired or its user is gone or inactive.
+    """
+    key = _token_key(raw_token)
+    now = time.time()
+    with _verified_lock:
+        entry = _verified.get(key)
+    if entry is not None:
+        if entry['expires_at'] > now and entry['stamp'] == USER_STAMPS.get(entry['user']['id']):
+            with _verified_lock:
+                if key in _verified:
+                    _verified.move_to_end(key)
+            values, db, claims = entry['user'], entry['db'], entry['claims']
+            return RequestUser(lambda: _build_user(values, db), values['id'], claims), claims
+        with _verified_lock:
+            _verified.pop(key, None)
+
+    jwt_auth = JWTAuthentication()
+    try:
+        validated_token = jwt_auth.get_validated_token(raw_token)
+        # Read before the user, so a change committed in between invalidates the entry
+        stamp = USER_STAMPS.get(validated_token.get(api_settings.USER_ID_CLAIM))
+        user = jwt_auth.get_user(validated_token)
+    except Exception:
+        return None
+
+    claims = dict(validated_token.payload)
+    with _verified_lock:
+        _verified[key] = {
+            'user': _user_values(user),
+            'db': user._state.db,
+            'claims': claims,
+            'stamp': stamp,
+            'expires_at': claims.get('exp', now),
+        }
+        _verified.move_to_end(key)
+        while len(_verified) > _cache_size():
+            _verified.popitem(last=False)
+    return RequestUser(lambda: user, user.id, claims), claims
+
+
+def revoke_cached_tokens(user_id):
+    """Invalidate a user's verified tokens in every process"""
+    # Outlives any entry verified under the old stamp
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()) + 60
+    USER_STAMPS.set(user_id, value=uuid.uuid4().hex, timeout=timeout)
+
+
+def forget_user(user_id):
+    """
+    Drop every cached token of a user, e.g. after the user row changed: at
+    once in this process, and everywhere once the current transaction commits.
+    """
+    with _verified_lock:
+        for key in [key for key, entry in _verified.items() if entry['user']['id'] == user_id]:
+            del _verified[key]
+    transaction.on_commit(lambda: revoke_cached_tokens(user_id))
+
+
+def clear_token_cache():
+    with _verified_lock:
+        _verified.clear()
+
+
+class JWTCookieAuthenticationMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.jwt_claims = None
+        authenticated = None
+        raw_token = request.COOKIES.get(JWT_COOKIE)
+        # A session login (a teacher or admin who also holds a student's
+        # cookie, say) keeps its own user; get_user caches it on the request
+        if raw_token and not get_user(request).is_authenticated:
+            authenticated = authenticate_token(raw_token)
+        if authenticated is not None:
+            request.user, request.jwt_claims = authenticated
+        else:
+            request.user = RequestUser(lambda: get_user(request))
+        return self.get_response(request)
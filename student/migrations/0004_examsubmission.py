@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0003_examattempt_answers_json_examattempt_percentage_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSubmission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('payload', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('grading', 'Grading'), ('graded', 'Graded'), ('failed', 'Failed')], db_index=True, default='pending', max_length=20)),
+                ('claimed_by', models.CharField(blank=True, max_length=32, null=True)),
+                ('failure_reason', models.TextField(blank=True, null=True)),
+                ('submitted_at', models.DateTimeField(auto_now_add=True)),
+                ('graded_at', models.DateTimeField(blank=True, null=True)),
+                ('attempt', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submission', to='student.examattempt')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='exam.exam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='submissions', to='student.studentprofile')),
+                ('test_paper', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='submissions', to='exam.testpaper')),
+            ],
+            options={
+                'ordering': ['submitted_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_attempt_counters(apps, schema_editor):
+    ExamAttempt = apps.get_model('student', 'ExamAttempt')
+    AttemptCounter = apps.get_model('student', 'AttemptCounter')
+    latest = (
+        ExamAttempt.objects.values('student_id', 'exam_id')
+        .annotate(last_attempt_number=Max('attempt_number'))
+    )
+    AttemptCounter.objects.bulk_create(
+        [AttemptCounter(**row) for row in latest.iterator()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0004_examsubmission'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_attempt_number', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='attemptcounter',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_counters', to='exam.exam'),
+        ),
+        migrations.AddField(
+            model_name='attemptcounter',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='attempt_counters', to='student.studentprofile'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='attemptcounter',
+            unique_together={('student', 'exam')},
+        ),
+        migrations.RunPython(seed_attempt_counters, migrations.RunPython.noop),
+    ]
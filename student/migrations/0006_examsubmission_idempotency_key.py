@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0005_attemptcounter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsubmission',
+            name='payload_digest',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='examsubmission',
+            name='idempotency_key',
+            field=models.CharField(blank=True, max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='examsubmission',
+            constraint=models.UniqueConstraint(fields=('student', 'exam', 'payload_digest'), name='unique_submission_payload'),
+        ),
+        migrations.AddConstraint(
+            model_name='examsubmission',
+            constraint=models.UniqueConstraint(fields=('student', 'exam', 'idempotency_key'), name='unique_submission_token'),
+        ),
+    ]
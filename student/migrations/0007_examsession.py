@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0006_examsubmission_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamSession',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=32)),
+                ('last_seq', models.PositiveIntegerField(default=0)),
+                ('started_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='exam.exam')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_sessions', to='student.studentprofile')),
+                ('test_paper', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sessions', to='exam.testpaper')),
+            ],
+            options={
+                'unique_together': {('student', 'exam')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SessionAnswer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('question_uid', models.CharField(max_length=32)),
+                ('answer', models.TextField(blank=True, null=True)),
+                ('time_spent_seconds', models.PositiveIntegerField(default=0)),
+                ('marked_for_review', models.BooleanField(default=False)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='student.examsession')),
+            ],
+            options={
+                'unique_together': {('session', 'question_uid')},
+            },
+        ),
+    ]
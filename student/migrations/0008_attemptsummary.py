@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0007_examsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttemptSummary',
+            fields=[
+                ('attempt', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='student.examattempt')),
+                ('format_version', models.PositiveSmallIntegerField(default=1)),
+                ('total_questions', models.PositiveIntegerField(default=0)),
+                ('answered_count', models.PositiveIntegerField(default=0)),
+                ('correct_count', models.PositiveIntegerField(default=0)),
+                ('incorrect_count', models.PositiveIntegerField(default=0)),
+                ('unanswered_count', models.PositiveIntegerField(default=0)),
+                ('avg_time_per_question', models.FloatField(default=0)),
+                ('topic_stats', models.JSONField(default=list)),
+                ('weak_topics', models.JSONField(default=list)),
+                ('missed_topics', models.JSONField(default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
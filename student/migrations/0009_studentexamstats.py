@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_exam_stats(apps, schema_editor):
+    """Replay every attempt in order, as StudentExamStats.add_attempt does"""
+    ExamAttempt = apps.get_model('student', 'ExamAttempt')
+    StudentExamStats = apps.get_model('student', 'StudentExamStats')
+    batch = []
+    stats = None
+    attempts = ExamAttempt.objects.order_by('student_id', 'exam_id', 'attempt_number')
+    for attempt in attempts.iterator():
+        if stats is None or (stats.student_id, stats.exam_id) != (attempt.student_id, attempt.exam_id):
+            stats = StudentExamStats(student_id=attempt.student_id, exam_id=attempt.exam_id)
+            batch.append(stats)
+        stats.attempt_count += 1
+        stats.score_sum += attempt.score
+        if stats.best_score is None or attempt.score > stats.best_score:
+            stats.best_score = attempt.score
+        if stats.best_percentage is None or attempt.percentage > stats.best_percentage:
+            stats.best_percentage = attempt.percentage
+        delta = attempt.percentage - stats.mean_percentage
+        stats.mean_percentage += delta / stats.attempt_count
+        stats.percentage_m2 += delta * (attempt.percentage - stats.mean_percentage)
+        stats.latest_attempt_id = attempt.id
+        stats.latest_attempt_number = attempt.attempt_number
+        stats.latest_date_taken = attempt.date_taken
+    StudentExamStats.objects.bulk_create(batch, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0008_attemptsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StudentExamStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempt_count', models.PositiveIntegerField(default=0)),
+                ('best_score', models.FloatField(blank=True, null=True)),
+                ('best_percentage', models.FloatField(blank=True, null=True)),
+                ('score_sum', models.FloatField(default=0)),
+                ('mean_percentage', models.FloatField(default=0)),
+                ('percentage_m2', models.FloatField(default=0)),
+                ('latest_attempt_number', models.PositiveIntegerField(default=0)),
+                ('latest_date_taken', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_stats', to='exam.exam')),
+                ('latest_attempt', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='student.examattempt')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_stats', to='student.studentprofile')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['student', '-latest_date_taken', '-exam'], name='student_stats_recent_idx')],
+                'unique_together': {('student', 'exam')},
+            },
+        ),
+        migrations.RunPython(backfill_exam_stats, migrations.RunPython.noop),
+    ]
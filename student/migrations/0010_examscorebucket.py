@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_score_buckets(apps, schema_editor):
+    """Histogram every exam's best percentages, as student.ranking.bucket_for does"""
+    StudentExamStats = apps.get_model('student', 'StudentExamStats')
+    ExamScoreBucket = apps.get_model('student', 'ExamScoreBucket')
+    counts = {}
+    best = StudentExamStats.objects.filter(best_percentage__isnull=False).values_list('exam_id', 'best_percentage')
+    for exam_id, percentage in best.iterator():
+        bucket = int(percentage * 10)
+        if percentage < bucket / 10:
+            bucket -= 1
+        elif percentage >= (bucket + 1) / 10:
+            bucket += 1
+        key = (exam_id, min(max(bucket, 0), 1000))
+        counts[key] = counts.get(key, 0) + 1
+    ExamScoreBucket.objects.bulk_create(
+        [ExamScoreBucket(exam_id=exam_id, bucket=bucket, count=count) for (exam_id, bucket), count in counts.items()],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0002_question_type_mcq_topic_question_type_msq_topic_and_more'),
+        ('student', '0009_studentexamstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamScoreBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bucket', models.IntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='studentexamstats',
+            index=models.Index(fields=['exam', '-best_percentage'], name='student_stats_best_idx'),
+        ),
+        migrations.AddField(
+            model_name='examscorebucket',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='score_buckets', to='exam.exam'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='examscorebucket',
+            unique_together={('exam', 'bucket')},
+        ),
+        migrations.RunPython(backfill_score_buckets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+import json
+
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def _load(raw):
+    try:
+        value = json.loads(raw)
+    except (TypeError, ValueError):
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+def copy_json_text(apps, schema_editor):
+    """Parse the old text columns into the JSON fields, in keyset batches"""
+    ExamAttempt = apps.get_model('student', 'ExamAttempt')
+    attempts = ExamAttempt.objects.only('id', 'answers_json', 'time_spent_json').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for attempt in batch:
+            attempt.answers = _load(attempt.answers_json)
+            attempt.time_spent = _load(attempt.time_spent_json)
+        ExamAttempt.objects.bulk_update(batch, ['answers', 'time_spent'])
+        last_id = batch[-1].id
+
+
+def copy_json_back(apps, schema_editor):
+    ExamAttempt = apps.get_model('student', 'ExamAttempt')
+    attempts = ExamAttempt.objects.only('id', 'answers', 'time_spent').order_by('id')
+    last_id = 0
+    while True:
+        batch = list(attempts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for attempt in batch:
+            attempt.answers_json = json.dumps(attempt.answers or {})
+            attempt.time_spent_json = json.dumps(attempt.time_spent or {})
+        ExamAttempt.objects.bulk_update(batch, ['answers_json', 'time_spent_json'])
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0010_examscorebucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examattempt',
+            name='answers',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.AddField(
+            model_name='examattempt',
+            name='time_spent',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(copy_json_text, copy_json_back),
+        migrations.RemoveField(
+            model_name='examattempt',
+            name='answers_json',
+        ),
+        migrations.RemoveField(
+            model_name='examattempt',
+            name='time_spent_json',
+        ),
+    ]
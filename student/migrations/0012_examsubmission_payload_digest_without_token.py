@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exam', '0003_testpaper_revision'),
+        ('student', '0011_examattempt_answers_time_spent_jsonfield'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='examsubmission',
+            name='unique_submission_payload',
+        ),
+        migrations.AddConstraint(
+            model_name='examsubmission',
+            constraint=models.UniqueConstraint(condition=models.Q(('idempotency_key__isnull', True)), fields=('student', 'exam', 'payload_digest'), name='unique_submission_payload'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('student', '0012_examsubmission_payload_digest_without_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsubmission',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
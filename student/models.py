@@ -1,7 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from exam.models import Exam
-import json
+from exam.models import Exam, TestPaper
 
 
 class StudentProfile(models.Model):
@@ -28,8 +27,8 @@ class ExamAttempt(models.Model):
     time_taken = models.DurationField()
     total_marks = models.FloatField(default=0)
     percentage = models.FloatField(default=0)
-    answers_json = models.TextField(default='{}')  # Store all answers as JSON
-    time_spent_json = models.TextField(default='{}')  # Store time spent per question as JSON
+    answers = models.JSONField(default=dict)  # answers as submitted, keyed by question uid
+    time_spent = models.JSONField(default=dict)  # seconds spent per question uid
 
     class Meta:
         unique_together = ['student', 'exam', 'attempt_number']
@@ -40,17 +39,118 @@ class ExamAttempt(models.Model):
     
     def get_answers(self):
         """Return answers as dictionary"""
-        try:
-            return json.loads(self.answers_json)
-        except:
-            return {}
+        return self.answers if isinstance(self.answers, dict) else {}
     
     def get_time_spent(self):
         """Return time spent per question as dictionary"""
-        try:
-            return json.loads(self.time_spent_json)
-        except:
-            return {}
+        return self.time_spent if isinstance(self.time_spent, dict) else {}
+
+
+class AttemptSummary(models.Model):
+    """
+    Results page statistics of an attempt, computed once when it is graded.
+    Attempts never change afterwards, so the summary never goes stale.
+    """
+    attempt = models.OneToOneField(ExamAttempt, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    format_version = models.PositiveSmallIntegerField(default=1)
+    total_questions = models.PositiveIntegerField(default=0)
+    answered_count = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(default=0)
+    incorrect_count = models.PositiveIntegerField(default=0)
+    unanswered_count = models.PositiveIntegerField(default=0)
+    avg_time_per_question = models.FloatField(default=0)
+    topic_stats = models.JSONField(default=list)  # one object per topic, in question order
+    weak_topics = models.JSONField(default=list)
+    missed_topics = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Summary - {self.attempt}"
+
+
+class AttemptCounter(models.Model):
+    """Last attempt number handed out per student and exam, bumped atomically"""
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='attempt_counters')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='attempt_counters')
+    last_attempt_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['student', 'exam']
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.exam.name} - {self.last_attempt_number}"
+
+
+class StudentExamStats(models.Model):
+    """
+    Running totals of one student's attempts at one exam, updated as each
+    attempt is recorded so pages never aggregate the attempt history.
+    The percentage mean and variance use Welford's online algorithm.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='exam_stats')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='student_stats')
+    attempt_count = models.PositiveIntegerField(default=0)
+    best_score = models.FloatField(null=True, blank=True)
+    best_percentage = models.FloatField(null=True, blank=True)
+    score_sum = models.FloatField(default=0)
+    mean_percentage = models.FloatField(default=0)
+    percentage_m2 = models.FloatField(default=0)  # sum of squared deviations from the mean
+    latest_attempt = models.ForeignKey(ExamAttempt, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    latest_attempt_number = models.PositiveIntegerField(default=0)
+    latest_date_taken = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'exam']
+        indexes = [
+            # Results history: a student's exams, most recently attempted first
+            models.Index(fields=['student', '-latest_date_taken', '-exam'], name='student_stats_recent_idx'),
+            # Leaderboards and ranking ties: an exam's students, best first
+            models.Index(fields=['exam', '-best_percentage'], name='student_stats_best_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.exam.name} - {self.attempt_count} attempt(s)"
+
+    def add_attempt(self, attempt):
+        self.attempt_count += 1
+        self.score_sum += attempt.score
+        if self.best_score is None or attempt.score > self.best_score:
+            self.best_score = attempt.score
+        if self.best_percentage is None or attempt.percentage > self.best_percentage:
+            self.best_percentage = attempt.percentage
+        delta = attempt.percentage - self.mean_percentage
+        self.mean_percentage += delta / self.attempt_count
+        self.percentage_m2 += delta * (attempt.percentage - self.mean_percentage)
+        if attempt.attempt_number >= self.latest_attempt_number:
+            self.latest_attempt = attempt
+            self.latest_attempt_number = attempt.attempt_number
+            self.latest_date_taken = attempt.date_taken
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.attempt_count if self.attempt_count else 0
+
+    @property
+    def percentage_variance(self):
+        return self.percentage_m2 / self.attempt_count if self.attempt_count else 0
+
+
+class ExamScoreBucket(models.Model):
+    """
+    How many students' best percentage at an exam falls in one narrow band
+    (see student/ranking.py). The buckets of an exam form a histogram that
+    ranks a student by summing a bounded number of rows.
+    """
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='score_buckets')
+    bucket = models.IntegerField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ['exam', 'bucket']
+
+    def __str__(self):
+        return f"{self.exam.name} - bucket {self.bucket}: {self.count}"
 
 
 class QuestionAnswer(models.Model):
@@ -73,3 +173,83 @@ class QuestionAnswer(models.Model):
     
     def __str__(self):
         return f"Q{self.question_id} - Attempt {self.attempt.attempt_number}"
+
+
+class ExamSubmission(models.Model):
+    """Raw exam submission queued for the grading worker"""
+    STATUS_PENDING = 'pending'
+    STATUS_GRADING = 'grading'
+    STATUS_GRADED = 'graded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_GRADING, 'Grading'),
+        (STATUS_GRADED, 'Graded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='submissions')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='submissions')
+    test_paper = models.ForeignKey(TestPaper, on_delete=models.SET_NULL, null=True, related_name='submissions')
+    payload = models.JSONField(default=dict)  # answers, time_spent and total_time exactly as posted
+    payload_digest = models.CharField(max_length=64, null=True, blank=True)  # SHA-256 of the canonical payload
+    idempotency_key = models.CharField(max_length=32, null=True, blank=True)  # nonce of the token issued with the exam page
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    claimed_by = models.CharField(max_length=32, null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # claims expire after SUBMISSION_CLAIM_TIMEOUT
+    attempt = models.OneToOneField(ExamAttempt, on_delete=models.SET_NULL, null=True, blank=True, related_name='submission')
+    failure_reason = models.TextField(null=True, blank=True)
+    submitted_at = models.DateTimeField(auto_now_add=True)
+    graded_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['submitted_at']
+        constraints = [
+            # Without a token, a resent identical payload is the same submission;
+            # sittings with their own tokens may well post identical answers
+            models.UniqueConstraint(
+                fields=['student', 'exam', 'payload_digest'],
+                condition=models.Q(idempotency_key__isnull=True),
+                name='unique_submission_payload',
+            ),
+            # Every retry of one sitting carries the same token
+            models.UniqueConstraint(fields=['student', 'exam', 'idempotency_key'], name='unique_submission_token'),
+        ]
+
+    def __str__(self):
+        return f"Submission #{self.id} - {self.exam.name} - {self.status}"
+
+
+class ExamSession(models.Model):
+    """
+    An exam sitting in progress, autosaved from the exam page so a reload
+    or a crashed tab can resume it. Removed once the sitting is submitted.
+    """
+    student = models.ForeignKey(StudentProfile, on_delete=models.CASCADE, related_name='exam_sessions')
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name='sessions')
+    test_paper = models.ForeignKey(TestPaper, on_delete=models.CASCADE, related_name='sessions')
+    idempotency_key = models.CharField(max_length=32)  # nonce of the sitting's submission token
+    last_seq = models.PositiveIntegerField(default=0)  # highest autosave batch applied
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['student', 'exam']
+
+    def __str__(self):
+        return f"{self.student.user.username} - {self.exam.name} - in progress"
+
+
+class SessionAnswer(models.Model):
+    """Latest saved state of one question of an in-progress sitting"""
+    session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, related_name='answers')
+    question_uid = models.CharField(max_length=32)  # e.g. "mcq-12"
+    answer = models.TextField(null=True, blank=True)
+    time_spent_seconds = models.PositiveIntegerField(default=0)
+    marked_for_review = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ['session', 'question_uid']
+
+    def __str__(self):
+        return f"{self.question_uid} - {self.session}"
@@ -0,0 +1,39 @@
+"""
+Per-user student profile flags in the shared cache.
+
+Whether a user is a student (their StudentProfile id) and whether that
+profile is premium decide which pages and ads they see on nearly every
+request, so both are cached per user and dropped whenever the user's
+profile is saved or deleted (see ``student.signals``). ``RequestUser``
+reads them through here, at most once per request; on a cache miss the
+profile it loads is the one the view gets from ``request.user.studentprofile``.
+
+Writes that skip ``save()`` (``QuerySet.update``) must call
+``forget_profile_flags`` themselves.
+"""
+from django.conf import settings
+
+from examPortal.caching import Namespace
+
+NO_PROFILE = {'student_profile_id': None, 'is_premium': False}
+
+PROFILE_FLAGS = Namespace('student:profile_flags')
+
+
+def profile_flags(user_id, load_profile):
+    """
+    ``{'student_profile_id', 'is_premium'}`` of a user, from the cache or
+    from ``load_profile()`` (their StudentProfile, or None).
+    """
+    if user_id is None:
+        return NO_PROFILE
+    flags = PROFILE_FLAGS.get(user_id)
+    if flags is None:
+        profile = load_profile()
+        flags = {'student_profile_id': profile.id, 'is_premium': profile.is_premium} if profile else NO_PROFILE
+        PROFILE_FLAGS.set(user_id, value=flags, timeout=getattr(settings, 'STUDENT_PROFILE_CACHE_TIMEOUT', 60 * 60 * 24))
+    return flags
+
+
+def forget_profile_flags(user_id):
+    PROFILE_FLAGS.delete(user_id)
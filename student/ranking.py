@@ -0,0 +1,113 @@
+"""
+Exam rankings by each student's best percentage.
+
+Every exam has a histogram of its students' best percentages in
+ExamScoreBucket rows, one per 0.1 percentage points. Recording an attempt
+that raises a student's best moves them between two buckets (two UPDATEs),
+and ranking a student sums the counts of the buckets above theirs (at most
+``BUCKET_COUNT`` rows) plus an indexed count of the few students sharing
+their bucket with a higher score, so neither grows with the number of
+candidates. The leaderboard is the head of the (exam, -best_percentage)
+index on StudentExamStats.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+
+from student.models import ExamScoreBucket, StudentExamStats
+
+# Buckets per percentage point
+BUCKET_RESOLUTION = 10
+# Bucket 0 also holds negative percentages and the last one exactly 100%
+BUCKET_COUNT = 100 * BUCKET_RESOLUTION + 1
+
+LEADERBOARD_SIZE = 10
+
+
+def bucket_for(percentage):
+    bucket = int(percentage * BUCKET_RESOLUTION)
+    # Agree exactly with the boundaries _bucket_range compares against (0.3 * 10 < 3)
+    if percentage < bucket / BUCKET_RESOLUTION:
+        bucket -= 1
+    elif percentage >= (bucket + 1) / BUCKET_RESOLUTION:
+        bucket += 1
+    return min(max(bucket, 0), BUCKET_COUNT - 1)
+
+
+def _bucket_range(bucket):
+    """Filter for the best percentages that fall in ``bucket``"""
+    bounds = Q()
+    if bucket > 0:
+        bounds &= Q(best_percentage__gte=bucket / BUCKET_RESOLUTION)
+    if bucket < BUCKET_COUNT - 1:
+        bounds &= Q(best_percentage__lt=(bucket + 1) / BUCKET_RESOLUTION)
+    return bounds
+
+
+def _add(exam_id, bucket, delta):
+    buckets = ExamScoreBucket.objects.filter(exam_id=exam_id, bucket=bucket)
+    if buckets.update(count=F('count') + delta) or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ExamScoreBucket.objects.create(exam_id=exam_id, bucket=bucket, count=delta)
+    except IntegrityError:
+        # Created concurrently
+        buckets.update(count=F('count') + delta)
+
+
+def move_best(exam_id, old_percentage, new_percentage):
+    """
+    Move a student between buckets after their best percentage changed from
+    ``old_percentage`` to ``new_percentage`` (None: not ranked). Call in the
+    transaction that saves their StudentExamStats.
+    """
+    old_bucket = None if old_percentage is None else bucket_for(old_percentage)
+    new_bucket = None if new_percentage is None else bucket_for(new_percentage)
+    if old_bucket == new_bucket:
+        return
+    if old_bucket is not None:
+        _add(exam_id, old_bucket, -1)
+    if new_bucket is not None:
+        _add(exam_id, new_bucket, 1)
+
+
+def student_rank(exam_id, best_percentage):
+    """
+    ``{'rank', 'total', 'percentile'}`` of a student whose best at the exam is
+    ``best_percentage``. Equal scores share a rank; the percentile is the
+    share of the other candidates ranked below or level with them.
+    """
+    bucket = bucket_for(best_percentage)
+    totals = ExamScoreBucket.objects.filter(exam_id=exam_id).aggregate(
+        total=Sum('count'),
+        above=Sum('count', filter=Q(bucket__gt=bucket)),
+    )
+    total = totals['total'] or 0
+    if not total:
+        return None
+    level_above = StudentExamStats.objects.filter(
+        _bucket_range(bucket), exam_id=exam_id, best_percentage__gt=best_percentage,
+    ).count()
+    rank = (totals['above'] or 0) + level_above + 1
+    percentile = 100.0 if total == 1 else round((total - rank) / (total - 1) * 100, 1)
+    return {'rank': rank, 'total': total, 'percentile': percentile}
+
+
+def leaderboard(exam_id, size=LEADERBOARD_SIZE):
+    """The top ``size`` students of an exam by best percentage, as template-ready dicts"""
+    top = (
+        StudentExamStats.objects.filter(exam_id=exam_id, best_percentage__isnull=False)
+        .select_related('student')
+        .order_by('-best_percentage', 'student_id')[:size]
+    )
+    entries = []
+    for position, stats in enumerate(top, start=1):
+        tied = entries and entries[-1]['best_percentage'] == stats.best_percentage
+        entries.append({
+            'rank': entries[-1]['rank'] if tied else position,
+            'student_id': stats.student_id,
+            # First name and initial only: the board is shown to every candidate
+            'name': f"{stats.student.first_name} {stats.student.last_name[:1]}".strip(),
+            'best_percentage': stats.best_percentage,
+        })
+    return entries
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from student.middleware import forget_user
+from student.models import ExamAttempt, StudentProfile
+from student.profiles import forget_profile_flags
+from student.stats import rebuild_student_exam_stats, record_attempt_stats
+
+
+@receiver(post_save, sender=ExamAttempt)
+def update_exam_stats(sender, instance, created, **kwargs):
+    if created:
+        record_attempt_stats(instance)
+
+
+@receiver(post_delete, sender=ExamAttempt)
+def rebuild_exam_stats(sender, instance, **kwargs):
+    rebuild_student_exam_stats(instance.student_id, instance.exam_id)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def forget_cached_tokens(sender, instance, **kwargs):
+    forget_user(instance.id)
+
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_delete, sender=StudentProfile)
+def forget_cached_profile_flags(sender, instance, **kwargs):
+    forget_profile_flags(instance.user_id)
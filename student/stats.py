@@ -0,0 +1,43 @@
+"""
+Maintenance of StudentExamStats, the per-student, per-exam running totals.
+
+Recording an attempt folds it into its stats row in O(1) (see
+``StudentExamStats.add_attempt``); only deleting an attempt replays that
+student's history for the exam. Either way, a change to the student's best
+percentage is carried into the exam's ranking buckets (student/ranking.py).
+"""
+from django.db import transaction
+
+from student.models import ExamAttempt, StudentExamStats
+from student.ranking import move_best
+
+
+def record_attempt_stats(attempt):
+    """Fold a newly created attempt into its student's stats for the exam"""
+    with transaction.atomic():
+        stats, _ = StudentExamStats.objects.select_for_update().get_or_create(
+            student_id=attempt.student_id,
+            exam_id=attempt.exam_id,
+        )
+        previous_best = stats.best_percentage
+        stats.add_attempt(attempt)
+        stats.save()
+        move_best(attempt.exam_id, previous_best, stats.best_percentage)
+    return stats
+
+
+def rebuild_student_exam_stats(student_id, exam_id):
+    """Recompute one stats row from the attempt history; None if no attempts remain"""
+    attempts = ExamAttempt.objects.filter(student_id=student_id, exam_id=exam_id).order_by('attempt_number')
+    with transaction.atomic():
+        stats = StudentExamStats(student_id=student_id, exam_id=exam_id)
+        for attempt in attempts:
+            stats.add_attempt(attempt)
+        previous = StudentExamStats.objects.filter(student_id=student_id, exam_id=exam_id)
+        previous_best = previous.values_list('best_percentage', flat=True).first()
+        previous.delete()
+        move_best(exam_id, previous_best, stats.best_percentage if stats.attempt_count else None)
+        if not stats.attempt_count:
+            return None
+        stats.save()
+    return stats
@@ -1,3 +1,363 @@
+import re
+import statistics
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+from exam.models import Exam
+from student.middleware import clear_token_cache, revoke_cached_tokens
+from student.models import ExamAttempt, ExamScoreBucket, StudentExamStats, StudentProfile
+from student.ranking import BUCKET_COUNT, _bucket_range, bucket_for, student_rank
+from student.history import ATTEMPTS_PER_GROUP
+from student.views import MY_EXAMS_PAGE_SIZE
+from teacher.models import TeacherProfile
+
+
+class MyExamsViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.client.force_login(self.user)
+
+    def make_exams(self, count):
+        return Exam.objects.bulk_create([
+            Exam(name=f'Exam {i}', total_marks=100, duration=timedelta(minutes=60)) for i in range(count)
+        ])
+
+    def attempt(self, exam, number, score, student=None):
+        return ExamAttempt.objects.create(
+            student=student or self.profile,
+            exam=exam,
+            attempt_number=number,
+            score=score,
+            total_marks=exam.total_marks,
+            time_taken=timedelta(minutes=30),
+        )
+
+    def test_exam_data(self):
+        attempted, untouched = self.make_exams(2)
+        self.attempt(attempted, 1, 40)
+        self.attempt(attempted, 2, 75)
+        latest = self.attempt(attempted, 3, 60)
+        other_user = User.objects.create_user('other', 'other@example.com', 'password')
+        other = StudentProfile.objects.create(user=other_user, first_name='O', last_name='S', email='other@example.com')
+        self.attempt(untouched, 1, 99, student=other)
+
+        exam_data = self.client.get('/my-exams/').context['exam_data']
+
+        self.assertEqual(exam_data[0]['attempt_count'], 3)
+        self.assertEqual(exam_data[0]['best_score'], 75)
+        self.assertEqual(exam_data[0]['next_attempt'], 4)
+        self.assertEqual(exam_data[0]['latest_attempt']['id'], latest.id)
+        self.assertTrue(exam_data[0]['attempted'])
+        self.assertFalse(exam_data[1]['attempted'])
+        self.assertEqual(exam_data[1]['attempt_count'], 0)
+        self.assertIsNone(exam_data[1]['latest_attempt'])
+        self.assertEqual(exam_data[1]['next_attempt'], 1)
+
+    def test_query_count_does_not_grow_with_exams(self):
+        for exam in self.make_exams(3):
+            self.attempt(exam, 1, 50)
+        self.client.get('/my-exams/')
+        with CaptureQueriesContext(connection) as few_exams:
+            self.client.get('/my-exams/')
+
+        for exam in self.make_exams(MY_EXAMS_PAGE_SIZE * 2):
+            self.attempt(exam, 1, 50)
+            self.attempt(exam, 2, 70)
+        with self.assertNumQueries(len(few_exams)):
+            response = self.client.get('/my-exams/?page=2')
+
+        self.assertEqual(len(response.context['exam_data']), MY_EXAMS_PAGE_SIZE)
+        # session, user, page count, annotated page of exams; the profile id is cached
+        self.assertEqual(len(few_exams), 4)
+
+
+class ResultsHistoryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        self.client.force_login(self.user)
+
+    def test_older_attempts_are_paged_per_group(self):
+        total = ATTEMPTS_PER_GROUP + 5
+        for number in range(1, total + 1):
+            ExamAttempt.objects.create(
+                student=self.profile, exam=self.exam, attempt_number=number,
+                score=number, total_marks=40, time_taken=timedelta(minutes=30),
+            )
+
+        group = self.client.get('/results/').context['exam_results'][0]
+        self.assertEqual(group['attempt_count'], total)
+        shown = [attempt.attempt_number for attempt in group['attempts']]
+        self.assertEqual(shown, list(range(total, 5, -1)))
+
+        response = self.client.get('/results/api/attempts/', {
+            'exam': self.exam.id, 'cursor': group['next_attempts_cursor'],
+        }).json()
+
+        self.assertEqual(response['count'], 5)
+        self.assertIsNone(response['next_cursor'])
+        older = [int(number) for number in re.findall(r'Attempt #(\d+)', response['html'])]
+        self.assertEqual(older, [5, 4, 3, 2, 1])
+
+    def test_groups_without_older_attempts_have_no_cursor(self):
+        ExamAttempt.objects.create(
+            student=self.profile, exam=self.exam, attempt_number=1,
+            score=1, total_marks=40, time_taken=timedelta(minutes=30),
+        )
+
+        group = self.client.get('/results/').context['exam_results'][0]
+
+        self.assertIsNone(group['next_attempts_cursor'])
+        self.assertEqual(self.client.get('/results/api/attempts/', {'exam': self.exam.id, 'cursor': 'x'}).status_code, 400)
+
+
+class StudentExamStatsTests(TestCase):
+    PERCENTAGES = [62.5, 40.0, 87.5, 40.0, 71.25, 12.5]
+
+    def setUp(self):
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        self.attempts = [
+            ExamAttempt.objects.create(
+                student=self.profile, exam=self.exam, attempt_number=number,
+                score=percentage * 40 / 100, total_marks=40, percentage=percentage,
+                time_taken=timedelta(minutes=30),
+            )
+            for number, percentage in enumerate(self.PERCENTAGES, start=1)
+        ]
+
+    def stats(self):
+        return StudentExamStats.objects.get(student=self.profile, exam=self.exam)
+
+    def assertMatchesAttempts(self, stats):
+        attempts = ExamAttempt.objects.filter(student=self.profile, exam=self.exam)
+        percentages = [attempt.percentage for attempt in attempts]
+        scores = [attempt.score for attempt in attempts]
+        latest = max(attempts, key=lambda attempt: attempt.attempt_number)
+        self.assertEqual(stats.attempt_count, len(percentages))
+        self.assertAlmostEqual(stats.mean_percentage, statistics.fmean(percentages))
+        self.assertAlmostEqual(stats.percentage_variance, statistics.pvariance(percentages))
+        self.assertAlmostEqual(stats.average_score, statistics.fmean(scores))
+        self.assertEqual(stats.best_percentage, max(percentages))
+        self.assertEqual(stats.best_score, max(scores))
+        self.assertEqual(stats.latest_attempt_id, latest.id)
+
+    def test_running_totals_match_a_direct_computation(self):
+        self.assertMatchesAttempts(self.stats())
+
+    def test_deleting_attempts_recomputes_the_totals(self):
+        # The best attempt, then the latest one
+        self.attempts[2].delete()
+        self.assertMatchesAttempts(self.stats())
+        self.assertEqual(self.stats().best_percentage, 71.25)
+
+        self.attempts[5].delete()
+        stats = self.stats()
+        self.assertMatchesAttempts(stats)
+        self.assertEqual(stats.latest_attempt_number, 5)
+
+    def test_deleting_the_last_attempt_removes_the_stats(self):
+        for attempt in self.attempts:
+            attempt.delete()
+
+        self.assertFalse(StudentExamStats.objects.filter(student=self.profile, exam=self.exam).exists())
+
+    def test_single_attempt_has_no_variance(self):
+        for attempt in self.attempts[1:]:
+            attempt.delete()
+
+        stats = self.stats()
+        self.assertEqual((stats.mean_percentage, stats.percentage_variance), (62.5, 0))
+
+
+class RankingTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        self.profiles = {}
+
+    def attempt(self, name, percentage):
+        if name not in self.profiles:
+            user = User.objects.create_user(name, f'{name}@example.com', 'password')
+            self.profiles[name] = StudentProfile.objects.create(
+                user=user, first_name=name, last_name='Student', email=f'{name}@example.com'
+            )
+        profile = self.profiles[name]
+        return ExamAttempt.objects.create(
+            student=profile, exam=self.exam, attempt_number=profile.exam_attempts.count() + 1,
+            score=percentage * 40 / 100, total_marks=40, percentage=percentage,
+            time_taken=timedelta(minutes=30),
+        )
+
+    def buckets(self):
+        return dict(ExamScoreBucket.objects.filter(exam=self.exam, count__gt=0).values_list('bucket', 'count'))
+
+    def rank(self, name):
+        best = StudentExamStats.objects.get(student=self.profiles[name], exam=self.exam).best_percentage
+        return student_rank(self.exam.id, best)['rank']
+
+    def test_boundary_percentages_fall_in_the_bucket_their_range_admits(self):
+        expected = {-12.5: 0, 0.0: 0, 0.3: 3, 0.7: 7, 12.3: 123, 29.9: 299, 30.0: 300, 57.3: 573, 99.95: 999, 100.0: 1000}
+        for number, percentage in enumerate(expected):
+            self.attempt(f'student{number}', percentage)
+
+        self.assertEqual({percentage: bucket_for(percentage) for percentage in expected}, expected)
+        self.assertEqual(self.buckets(), {bucket: 2 if bucket == 0 else 1 for bucket in expected.values()})
+        self.assertEqual(max(expected.values()), BUCKET_COUNT - 1)
+        stats = StudentExamStats.objects.filter(exam=self.exam)
+        for percentage, bucket in expected.items():
+            in_bucket = stats.filter(_bucket_range(bucket)).values_list('best_percentage', flat=True)
+            self.assertIn(percentage, list(in_bucket))
+
+    def test_ties_and_neighbours_on_a_bucket_boundary(self):
+        self.attempt('alice', 70.0)
+        self.attempt('bob', 70.0)
+        self.attempt('carol', 69.95)
+        self.attempt('dave', 70.05)
+
+        self.assertEqual(self.buckets(), {699: 1, 700: 3})
+        self.assertEqual(
+            {name: self.rank(name) for name in self.profiles},
+            {'dave': 1, 'alice': 2, 'bob': 2, 'carol': 4},
+        )
+        self.assertEqual(student_rank(self.exam.id, 70.0)['percentile'], round(2 / 3 * 100, 1))
+
+    def test_deleting_attempts_moves_the_student_back(self):
+        first = self.attempt('alice', 50.0)
+        best = self.attempt('alice', 80.0)
+        self.attempt('bob', 65.0)
+        self.assertEqual(self.buckets(), {650: 1, 800: 1})
+        self.assertEqual(self.rank('bob'), 2)
+
+        best.delete()
+        self.assertEqual(self.buckets(), {500: 1, 650: 1})
+        self.assertEqual((self.rank('bob'), self.rank('alice')), (1, 2))
+
+        first.delete()
+        self.assertEqual(self.buckets(), {650: 1})
+        self.assertEqual(student_rank(self.exam.id, 65.0), {'rank': 1, 'total': 1, 'percentile': 100.0})
+
+
+class JWTCookieAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_token_cache()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        StudentProfile.objects.create(user=self.user, first_name='Test', last_name='Student', email='student@example.com')
+
+    def use_token(self, token):
+        self.client.cookies['jwt'] = str(token)
+
+    def test_verified_token_skips_user_lookup(self):
+        self.use_token(AccessToken.for_user(self.user))
+        with CaptureQueriesContext(connection) as first:
+            response = self.client.get('/settings/')
+        with CaptureQueriesContext(connection) as second:
+            self.client.get('/settings/')
+
+        self.assertEqual(response.context['user'], self.user)
+        self.assertEqual(len(second), len(first) - 1)
+        self.assertFalse(any('FROM "auth_user"' in query['sql'] for query in second.captured_queries))
+
+    def test_saving_the_user_forgets_its_tokens(self):
+        self.use_token(AccessToken.for_user(self.user))
+        self.client.get('/settings/')
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/settings/')
+
+        self.assertRedirects(response, '/login/?next=/settings/', fetch_redirect_response=False)
+
+    def test_revoked_tokens_are_verified_again(self):
+        self.use_token(AccessToken.for_user(self.user))
+        self.client.get('/settings/')
+        # Changed by another process: this process's entry is still there
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        revoke_cached_tokens(self.user.id)
+
+        response = self.client.get('/settings/')
+
+        self.assertRedirects(response, '/login/?next=/settings/', fetch_redirect_response=False)
+
+    def test_session_login_wins_over_the_cookie(self):
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        TeacherProfile.objects.create(user=teacher, first_name='Test', last_name='Teacher', email='teacher@example.com')
+        self.client.force_login(teacher)
+        self.use_token(AccessToken.for_user(self.user))
+
+        response = self.client.get('/teacher/dashboard/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user'], teacher)
+
+    def test_invalid_token_is_anonymous(self):
+        self.use_token('not-a-token')
+
+        self.assertRedirects(self.client.get('/settings/'), '/login/?next=/settings/', fetch_redirect_response=False)
+        self.assertEqual(self.client.post('/results/api/').status_code, 401)
+
+    def test_portal_claims_are_served_from_the_token(self):
+        response = self.client.post('/api/token/', {'username': 'student', 'password': 'password'})
+        access = AccessToken(response.json()['access'])
+        self.assertEqual(access['student_profile_id'], self.user.studentprofile.id)
+        self.assertFalse(access['is_premium'])
+        self.assertFalse(access['is_teacher'])
+
+        self.use_token(access)
+        self.client.get('/results/')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/results/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            'FROM "auth_user"' in query['sql'] or 'FROM "student_studentprofile"' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+    def test_refresh_reads_the_claims_again(self):
+        refresh = self.client.post('/api/token/', {'username': 'student', 'password': 'password'}).json()['refresh']
+        StudentProfile.objects.filter(user=self.user).update(is_premium=True)
+
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh})
+
+        self.assertTrue(AccessToken(response.json()['access'])['is_premium'])
+
+
+class ProfileFlagsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=self.user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.client.force_login(self.user)
+
+    def test_premium_flag_is_cached_until_the_profile_changes(self):
+        self.assertTrue(self.client.get('/results/').context['show_ads']())
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/results/')
+
+        self.assertTrue(response.context['show_ads']())
+        self.assertFalse(any('FROM "student_studentprofile"' in query['sql'] for query in queries.captured_queries))
+
+        self.profile.is_premium = True
+        self.profile.save()
 
-# Create your tests here.
+        self.assertFalse(self.client.get('/results/').context['show_ads']())
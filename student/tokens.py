@@ -0,0 +1,53 @@
+"""
+Portal claims carried by the JWT access token.
+
+Besides the user id, access tokens say who the user is to the portal: their
+student profile id, whether that profile is premium and whether they are a
+teacher. ``student.middleware.RequestUser`` serves the profile id and the
+teacher flag from the token, so most pages never look the user or their
+profile up.
+
+Claims are read when a token pair is issued and read again whenever an
+access token is refreshed, so a change (going premium, say) shows within one
+access-token lifetime.
+"""
+from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from student.models import StudentProfile
+
+PORTAL_CLAIMS = ('student_profile_id', 'is_premium', 'is_teacher')
+
+
+def portal_claims(user):
+    profile = StudentProfile.objects.filter(user_id=user.pk).values('id', 'is_premium').first()
+    return {
+        'student_profile_id': profile['id'] if profile else None,
+        'is_premium': bool(profile and profile['is_premium']),
+        'is_teacher': hasattr(user, 'teacherprofile'),
+    }
+
+
+class PortalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        for claim, value in portal_claims(user).items():
+            token[claim] = value
+        return token
+
+
+class PortalTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # The refresh token holds the claims as of login; re-read them
+        access = AccessToken(data['access'], verify=False)
+        user_id = access.payload.get(api_settings.USER_ID_CLAIM)
+        user = get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is not None:
+            for claim, value in portal_claims(user).items():
+                access[claim] = value
+            data['access'] = str(access)
+        return data
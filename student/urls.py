@@ -4,6 +4,8 @@ from . import views
 urlpatterns = [
     path("my-exams/", views.MyExamsView.as_view(), name="my-exams"),
     path("results/", views.ResultsView.as_view(), name="results"),
+    path("results/api/", views.results_api, name="results-api"),
+    path("results/api/attempts/", views.results_attempts_api, name="results-attempts-api"),
     path("settings/", views.SettingsView.as_view(), name="settings"),
     path("update-profile/", views.update_profile, name="update-profile"),
 ]
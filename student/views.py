@@ -1,20 +1,25 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.conf import settings
-from django.db.models import Count, Avg, Max
+from django.core.paginator import Paginator
+from django.db.models import Count, F, FilteredRelation, Q, Sum
+from django.db.models.functions import Coalesce
 from django.contrib.auth import logout
 from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
+from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from .serializers import UserSerializer
 from exam.models import Exam
-from .models import ExamAttempt, StudentProfile
+from .models import ExamAttempt, StudentExamStats
+from .history import exam_attempts_page, results_page
+
+# Exam cards per page on My Exams
+MY_EXAMS_PAGE_SIZE = 24
 
 class UserCreateView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -31,39 +36,19 @@ class UserDetailView(generics.RetrieveAPIView):
         return self.request.user
 
 
-from rest_framework_simplejwt.authentication import JWTAuthentication
 from django.utils.decorators import method_decorator
 from django.contrib.auth.decorators import login_required
 
-class DashboardView(TemplateView):
+class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = 'dashboard.html'
     
-    def dispatch(self, request, *args, **kwargs):
-        # Try JWT authentication first
-        jwt_auth = JWTAuthentication()
-        try:
-            validated_token = jwt_auth.get_validated_token(request.COOKIES.get('jwt', ''))
-            request.user = jwt_auth.get_user(validated_token)
-        except Exception:
-            # If JWT auth fails, fall back to session auth
-            pass
-            
-        # Check if user is authenticated through any means
-        if not request.user.is_authenticated:
-            return self.handle_no_permission()
-        return super().dispatch(request, *args, **kwargs)
-    
-    def handle_no_permission(self):
-        from django.shortcuts import redirect
-        return redirect('/login/')
-
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        student = self.request.user.studentprofile
+        student_id = self.request.user.student_profile_id
         
         # Get upcoming exams (all exams not yet attempted)
-        attempted_exam_ids = ExamAttempt.objects.filter(
-            student=student
+        attempted_exam_ids = StudentExamStats.objects.filter(
+            student_id=student_id
         ).values_list('exam_id', flat=True)
         
         context['upcoming_exams'] = Exam.objects.exclude(
@@ -72,13 +57,17 @@ class DashboardView(TemplateView):
         
         # Get recent attempts
         context['recent_attempts'] = ExamAttempt.objects.filter(
-            student=student
+            student_id=student_id
         ).select_related('exam')[:5]  # Show 5 recent attempts
         
-        # Get performance stats
-        attempts = ExamAttempt.objects.filter(student=student)
-        context['total_exams_taken'] = attempts.values('exam').distinct().count()
-        context['average_score'] = attempts.aggregate(Avg('score'))['score__avg'] or 0
+        # Get performance stats from the per-exam running totals
+        totals = StudentExamStats.objects.filter(student_id=student_id).aggregate(
+            exams=Count('id'),
+            attempts=Sum('attempt_count'),
+            score_sum=Sum('score_sum'),
+        )
+        context['total_exams_taken'] = totals['exams']
+        context['average_score'] = (totals['score_sum'] / totals['attempts']) if totals['attempts'] else 0
         
         return context
 
@@ -105,133 +94,113 @@ def custom_logout_view(request):
     return response
 
 
-class MyExamsView(TemplateView):
+class MyExamsView(LoginRequiredMixin, TemplateView):
     template_name = 'my_exams.html'
     
-    def dispatch(self, request, *args, **kwargs):
-        jwt_auth = JWTAuthentication()
-        try:
-            validated_token = jwt_auth.get_validated_token(request.COOKIES.get('jwt', ''))
-            request.user = jwt_auth.get_user(validated_token)
-        except Exception:
-            pass
-            
-        if not request.user.is_authenticated:
-            return redirect('/login/')
-        return super().dispatch(request, *args, **kwargs)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        student = self.request.user.studentprofile
-        
-        # Get all exams
-        all_exams = Exam.objects.all()
+        student_id = self.request.user.student_profile_id
+        
+        # One query for the page: every exam joined to this student's
+        # running stats for it (no row yet means not attempted)
+        exams = Exam.objects.annotate(
+            own_stats=FilteredRelation('student_stats', condition=Q(student_stats__student_id=student_id)),
+            attempt_count=Coalesce(F('own_stats__attempt_count'), 0),
+            last_attempt_number=F('own_stats__latest_attempt_number'),
+            best_score=F('own_stats__best_score'),
+            latest_attempt_id=F('own_stats__latest_attempt_id'),
+            latest_attempt_date=F('own_stats__latest_date_taken'),
+        ).order_by('id')
+        page = Paginator(exams, MY_EXAMS_PAGE_SIZE).get_page(self.request.GET.get('page'))
         
-        # Get exam attempts for each exam
         exam_data = []
-        for exam in all_exams:
-            attempts = ExamAttempt.objects.filter(student=student, exam=exam).order_by('-attempt_number')
-            latest_attempt = attempts.first() if attempts.exists() else None
-            
-            # Calculate next attempt number
-            next_attempt = (latest_attempt.attempt_number + 1) if latest_attempt else 1
-            
-            # Get best score
-            best_attempt = attempts.order_by('-score').first()
-            best_score = best_attempt.score if best_attempt else None
-            
+        for exam in page:
+            attempted = exam.attempt_count > 0
             exam_data.append({
                 'exam': exam,
-                'attempted': attempts.exists(),
-                'attempt_count': attempts.count(),
-                'latest_attempt': latest_attempt,
-                'best_score': best_score,
-                'next_attempt': next_attempt
+                'attempted': attempted,
+                'attempt_count': exam.attempt_count,
+                'latest_attempt': {'id': exam.latest_attempt_id, 'date_taken': exam.latest_attempt_date} if attempted else None,
+                'best_score': exam.best_score,
+                'next_attempt': (exam.last_attempt_number or 0) + 1
             })
         
+        context['page_obj'] = page
         context['exam_data'] = exam_data
         return context
 
 
-class ResultsView(TemplateView):
+class ResultsView(LoginRequiredMixin, TemplateView):
     template_name = 'results.html'
     
-    def dispatch(self, request, *args, **kwargs):
-        jwt_auth = JWTAuthentication()
-        try:
-            validated_token = jwt_auth.get_validated_token(request.COOKIES.get('jwt', ''))
-            request.user = jwt_auth.get_user(validated_token)
-        except Exception:
-            pass
-            
-        if not request.user.is_authenticated:
-            return redirect('/login/')
-        return super().dispatch(request, *args, **kwargs)
-    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        student = self.request.user.studentprofile
-        
-        # Get all attempts ordered by date
-        all_attempts = ExamAttempt.objects.filter(
-            student=student
-        ).select_related('exam').order_by('-date_taken')
-        
-        # Group by exam
-        exams_dict = {}
-        for attempt in all_attempts:
-            exam_id = attempt.exam.id
-            if exam_id not in exams_dict:
-                exams_dict[exam_id] = {
-                    'exam': attempt.exam,
-                    'attempts': [],
-                    'best_score': 0,
-                    'best_attempt': None
-                }
-            
-            exams_dict[exam_id]['attempts'].append(attempt)
-            
-            # Track best score
-            if attempt.score > exams_dict[exam_id]['best_score']:
-                exams_dict[exam_id]['best_score'] = attempt.score
-                exams_dict[exam_id]['best_attempt'] = attempt
+        user = self.request.user
         
-        # Convert to list and sort by most recent attempt
-        exam_results = []
-        for exam_data in exams_dict.values():
-            exam_data['attempt_count'] = len(exam_data['attempts'])
-            exam_data['latest_attempt'] = exam_data['attempts'][0] if exam_data['attempts'] else None
-            exam_results.append(exam_data)
-        
-        # Sort by latest attempt date
-        exam_results.sort(key=lambda x: x['latest_attempt'].date_taken if x['latest_attempt'] else None, reverse=True)
+        # First page of exam groups; results.html fetches the rest from results_api
+        exam_results, next_cursor = results_page(user.student_profile_id)
+        totals = StudentExamStats.objects.filter(student_id=user.student_profile_id).aggregate(
+            total_attempts=Sum('attempt_count'),
+            total_exams=Count('id'),
+        )
         
         context['exam_results'] = exam_results
-        context['total_attempts'] = all_attempts.count()
-
-        # Ads config: show only for non-premium students
-        is_premium = bool(getattr(student, 'is_premium', False))
-        context['show_ads'] = (not is_premium)
-        context['adsense_client'] = getattr(settings, 'ADSENSE_CLIENT', '')
-        context['adsense_slot_results'] = getattr(settings, 'ADSENSE_SLOT_RESULTS', '')
+        context['next_cursor'] = next_cursor
+        context['total_attempts'] = totals['total_attempts'] or 0
+        context['total_exams'] = totals['total_exams']
         
         return context
 
 
-class SettingsView(TemplateView):
-    template_name = 'settings.html'
+def results_api(request):
+    """Next page of the results history as rendered exam groups"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    user = request.user
+    
+    if user.student_profile_id is None:
+        return JsonResponse({'success': False, 'error': 'Student profile not found'}, status=404)
+    try:
+        exam_results, next_cursor = results_page(user.student_profile_id, cursor=request.GET.get('cursor'))
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
+    
+    # Ads settings come from the ads context processor
+    html = render_to_string('results_groups.html', {'exam_results': exam_results}, request=request)
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(exam_results),
+        'next_cursor': next_cursor,
+    })
+
+
+def results_attempts_api(request):
+    """Older attempts of one exam group of the results history, rendered"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'success': False, 'error': 'Authentication required'}, status=401)
+    user = request.user
+    
+    if user.student_profile_id is None:
+        return JsonResponse({'success': False, 'error': 'Student profile not found'}, status=404)
+    try:
+        attempts, next_cursor = exam_attempts_page(
+            user.student_profile_id, int(request.GET.get('exam', '')), request.GET.get('cursor', '')
+        )
+    except ValueError as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=400)
     
-    def dispatch(self, request, *args, **kwargs):
-        jwt_auth = JWTAuthentication()
-        try:
-            validated_token = jwt_auth.get_validated_token(request.COOKIES.get('jwt', ''))
-            request.user = jwt_auth.get_user(validated_token)
-        except Exception:
-            pass
-            
-        if not request.user.is_authenticated:
-            return redirect('/login/')
-        return super().dispatch(request, *args, **kwargs)
+    html = render_to_string('results_attempts.html', {'attempts': attempts}, request=request)
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'count': len(attempts),
+        'next_cursor': next_cursor,
+    })
+
+
+class SettingsView(LoginRequiredMixin, TemplateView):
+    template_name = 'settings.html'
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -244,14 +213,9 @@ class SettingsView(TemplateView):
 @require_http_methods(["POST"])
 def update_profile(request):
     """Update student profile"""
-    jwt_auth = JWTAuthentication()
-    try:
-        validated_token = jwt_auth.get_validated_token(request.COOKIES.get('jwt', ''))
-        user = jwt_auth.get_user(validated_token)
-    except Exception:
-        if not request.user.is_authenticated:
-            return JsonResponse({'error': 'Authentication required'}, status=401)
-        user = request.user
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    user = request.user
     
     try:
         import json
@@ -276,7 +240,7 @@ def update_profile(request):
             profile.address = data['address']
         
         profile.save()
-        user.save()
+        user.save(update_fields=['email'])  # the only user column edited here
         
         return JsonResponse({'success': True, 'message': 'Profile updated successfully'})
     except Exception as e:
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TeacherProfile
+from .models import TeacherProfile, ImportJob
 
 @admin.register(TeacherProfile)
 class TeacherProfileAdmin(admin.ModelAdmin):
@@ -7,3 +7,11 @@ class TeacherProfileAdmin(admin.ModelAdmin):
     list_filter = ('is_admin', 'department', 'created_at')
     search_fields = ('user__username', 'first_name', 'last_name', 'email')
     readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'exam', 'original_filename', 'status', 'rows_processed', 'rows_total', 'created_count', 'created_at', 'finished_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('original_filename', 'exam__name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
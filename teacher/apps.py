@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TeacherConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'teacher'
+
+    def ready(self):
+        from teacher import signals  # noqa: F401
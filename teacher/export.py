@@ -0,0 +1,189 @@
+"""
+Bulk export of an exam's attempts and answers for offline analysis.
+
+Rows are read with ``values_list(...).iterator(chunk_size=...)`` (a
+server-side cursor on PostgreSQL) and written out one chunk at a time, so
+memory stays flat however many rows an exam has. Both writers are generators
+of encoded byte chunks: the management command writes them to a file and the
+teacher API hands them to a StreamingHttpResponse.
+
+CSV needs nothing beyond the standard library. Parquet needs pyarrow (the
+optional ``parquet`` extra); each chunk becomes one row group, written to an
+in-memory sink that is drained after every group, so Parquet streams too.
+"""
+import csv
+import io
+from itertools import islice
+
+from student.models import ExamAttempt, QuestionAnswer
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+PYARROW_MISSING = "pyarrow is required for Parquet exports. Please install the 'parquet' extra."
+
+EXPORT_CHUNK_SIZE = 5000
+
+FORMATS = ('csv', 'parquet')
+
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+class Dataset:
+    """One exportable table: the queryset columns and their Parquet types"""
+
+    def __init__(self, name, columns, queryset, convert=None):
+        self.name = name
+        self.columns = columns  # (output name, values_list field, pyarrow type name)
+        self.queryset = queryset
+        self.convert = convert
+
+    def rows(self, exam_id, chunk_size):
+        """Chunks (lists) of row tuples in id order"""
+        rows = (
+            self.queryset(exam_id)
+            .order_by('id')
+            .values_list(*(field for _, field, _ in self.columns))
+            .iterator(chunk_size=chunk_size)
+        )
+        if self.convert is not None:
+            rows = map(self.convert, rows)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def schema(self):
+        types = {
+            'int64': pa.int64(),
+            'float64': pa.float64(),
+            'bool': pa.bool_(),
+            'string': pa.string(),
+            'timestamp': pa.timestamp('us', tz='UTC'),
+        }
+        return pa.schema([(name, types[type_name]) for name, _, type_name in self.columns])
+
+
+def _attempt_row(row):
+    # time_taken is a timedelta; analysis tools want plain seconds
+    *head, time_taken, score, total_marks, percentage = row
+    return (*head, time_taken.total_seconds(), score, total_marks, percentage)
+
+
+DATASETS = {
+    'attempts': Dataset(
+        'attempts',
+        [
+            ('attempt_id', 'id', 'int64'),
+            ('student_id', 'student_id', 'int64'),
+            ('attempt_number', 'attempt_number', 'int64'),
+            ('date_taken', 'date_taken', 'timestamp'),
+            ('time_taken_seconds', 'time_taken', 'float64'),
+            ('score', 'score', 'float64'),
+            ('total_marks', 'total_marks', 'float64'),
+            ('percentage', 'percentage', 'float64'),
+        ],
+        lambda exam_id: ExamAttempt.objects.filter(exam_id=exam_id),
+        convert=_attempt_row,
+    ),
+    'answers': Dataset(
+        'answers',
+        [
+            ('attempt_id', 'attempt_id', 'int64'),
+            ('student_id', 'attempt__student_id', 'int64'),
+            ('question_type', 'question_type', 'string'),
+            ('question_id', 'question_id', 'int64'),
+            ('topic', 'topic', 'string'),
+            ('user_answer', 'user_answer', 'string'),
+            ('is_correct', 'is_correct', 'bool'),
+            ('marks_obtained', 'marks_obtained', 'float64'),
+            ('time_spent_seconds', 'time_spent_seconds', 'int64'),
+        ],
+        lambda exam_id: QuestionAnswer.objects.filter(attempt__exam_id=exam_id),
+    ),
+}
+
+
+def iter_csv(dataset, exam_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """The dataset as UTF-8 CSV, one encoded chunk per block of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _, _ in dataset.columns])
+    for chunk in dataset.rows(exam_id, chunk_size):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Header of an empty export
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _DrainableSink(io.RawIOBase):
+    """Write-only file that hands over whatever has been written since the last drain"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def iter_parquet(dataset, exam_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """The dataset as a Parquet file, one row group per block of rows"""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError(PYARROW_MISSING)
+    schema = dataset.schema()
+    sink = _DrainableSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in dataset.rows(exam_id, chunk_size):
+            columns = zip(*chunk)
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                schema=schema,
+            ))
+            data = sink.drain()
+            if data:
+                yield data
+    # Footer
+    yield sink.drain()
+
+
+def export_chunks(dataset_name, exam_id, export_format, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Byte chunks of one dataset of an exam in ``export_format``. Raises
+    ValueError for an unknown dataset or format and RuntimeError for Parquet
+    without pyarrow, before any row is read.
+    """
+    if dataset_name not in DATASETS:
+        raise ValueError(f"Unknown dataset '{dataset_name}'. Choose from: {', '.join(DATASETS)}")
+    if export_format not in FORMATS:
+        raise ValueError(f"Unknown format '{export_format}'. Choose from: {', '.join(FORMATS)}")
+    if export_format == 'parquet' and not PYARROW_AVAILABLE:
+        raise RuntimeError(PYARROW_MISSING)
+    dataset = DATASETS[dataset_name]
+    if export_format == 'csv':
+        return iter_csv(dataset, exam_id, chunk_size)
+    return iter_parquet(dataset, exam_id, chunk_size)
@@ -0,0 +1,321 @@
+"""
+Bulk question import for teacher paper uploads.
+
+Workbooks are streamed with openpyxl in read-only mode, one sheet at a time
+and in fixed-size row chunks, so memory stays flat however large the file is.
+Each chunk is validated column-wise with pandas, split by question type and
+written with ``bulk_create`` in a short transaction of its own, under an
+inactive staging TestPaper. Once the whole sheet is in, its questions move
+to the real paper in one transaction. Row-level problems are reported back
+and skipped; a failure discards the staging paper, so a half-imported paper
+is never visible and no write transaction stays open for a whole sheet
+(which on SQLite would block every other writer, job progress included).
+"""
+import uuid
+from itertools import islice
+
+import openpyxl
+import pandas as pd
+from django.db import transaction
+
+from exam import revisions
+from exam.models import TestPaper, Question_type_mcq, Question_type_msq, Question_type_numerical
+from teacher import metrics
+
+EXAM_INFO_SHEET = 'Exam_Info'
+REQUIRED_COLUMNS = ['Question Type', 'Question Number', 'Question Text']
+OPTION_COLUMNS = ['Option A', 'Option B', 'Option C', 'Option D']
+MCQ_COLUMNS = OPTION_COLUMNS + ['Correct Option']
+MSQ_COLUMNS = OPTION_COLUMNS + ['Correct Options']
+NUMERICAL_COLUMNS = ['Correct Answer']
+
+QUESTION_TYPES = ('MCQ', 'MSQ', 'Numerical')
+
+# Rows per INSERT statement; keeps parameter counts well below SQLite limits
+BULK_BATCH_SIZE = 500
+
+# Spreadsheet rows held in memory at once while streaming a sheet
+CHUNK_SIZE = 1000
+
+# Paper code prefix of the staging papers sheets are imported under
+STAGING_PREFIX = '~import-'
+
+QUESTION_MODELS = (Question_type_mcq, Question_type_msq, Question_type_numerical)
+
+# Mirrors the max_length of the question model fields
+OPTION_MAX_LENGTH = 255
+TOPIC_MAX_LENGTH = 100
+
+
+def _text(column):
+    """Column as stripped strings, with blanks for missing cells"""
+    return column.where(column.notna(), '').astype(str).str.strip()
+
+
+def _optional_text(df, name):
+    if name not in df.columns:
+        return pd.Series(None, index=df.index, dtype=object)
+    values = _text(df[name])
+    return values.where(values != '', None)
+
+
+def _number(df, name, default):
+    """Numeric column plus a mask of cells that were filled but not numeric"""
+    if name not in df.columns:
+        return pd.Series(default, index=df.index, dtype=float), pd.Series(False, index=df.index)
+    raw = df[name]
+    values = pd.to_numeric(raw, errors='coerce')
+    invalid = raw.notna() & values.isna()
+    return values.fillna(default).astype(float), invalid
+
+
+def validate_sheet(sheet_name, df):
+    """
+    Validate a sheet and return ``(frames, errors)``.
+
+    ``frames`` maps each question type to a DataFrame of clean rows, ready to
+    become model instances. ``errors`` lists one message per rejected row,
+    using spreadsheet row numbers: the frame index is the 0-based data row, so
+    row ``i`` sits on spreadsheet row ``i + 2`` (the header is row 1).
+    """
+    rows = pd.Series(df.index + 2, index=df.index)
+    problems = pd.Series('', index=df.index, dtype=object)
+
+    def reject(mask, message):
+        # Only the first problem of a row is reported
+        mask = mask & (problems == '')
+        problems[mask] = message
+
+    question_type = _text(df['Question Type'])
+    question_number = pd.to_numeric(df['Question Number'], errors='coerce')
+    question_text = _text(df['Question Text'])
+    marks, bad_marks = _number(df, 'Marks', 1.0)
+    negative_marks, bad_negative_marks = _number(df, 'Negative Marks', 0.0)
+    topic = _optional_text(df, 'Topic')
+
+    is_mcq = question_type == 'MCQ'
+    is_msq = question_type == 'MSQ'
+    is_numerical = question_type == 'Numerical'
+
+    reject(question_number.isna() | (question_number % 1 != 0), 'Invalid Question Number')
+    reject(question_text == '', 'Empty question text')
+    reject(~question_type.isin(QUESTION_TYPES), "Unknown question type '" + question_type + "'")
+    reject(bad_marks, 'Invalid Marks value')
+    reject(bad_negative_marks, 'Invalid Negative Marks value')
+    reject(topic.str.len() > TOPIC_MAX_LENGTH, f'Topic longer than {TOPIC_MAX_LENGTH} characters')
+
+    clean = pd.DataFrame({
+        'question_number': question_number,
+        'question_text': question_text,
+        'question_image': _optional_text(df, 'Question Image'),
+        'marks': marks,
+        'negative_marks': negative_marks,
+        'topic': topic,
+    }, index=df.index)
+
+    if all(col in df.columns for col in OPTION_COLUMNS):
+        for col in OPTION_COLUMNS:
+            field = col.lower().replace(' ', '_')
+            clean[field] = _text(df[col])
+            reject((is_mcq | is_msq) & (clean[field].str.len() > OPTION_MAX_LENGTH),
+                   f'{col} longer than {OPTION_MAX_LENGTH} characters')
+
+    if all(col in df.columns for col in MCQ_COLUMNS):
+        clean['correct_option'] = _text(df['Correct Option']).str.upper()
+        reject(is_mcq & ~clean['correct_option'].isin(['A', 'B', 'C', 'D']), 'Invalid Correct Option (expected A, B, C or D)')
+    else:
+        reject(is_mcq, 'MCQ missing required columns')
+
+    if all(col in df.columns for col in MSQ_COLUMNS):
+        clean['correct_options'] = _text(df['Correct Options']).str.upper()
+        reject(is_msq & ~clean['correct_options'].str.fullmatch(r'[ABCD]{1,4}'), 'Invalid Correct Options (expected letters A-D, e.g. "AC")')
+    else:
+        reject(is_msq, 'MSQ missing required columns')
+
+    if 'Correct Answer' in df.columns:
+        clean['correct_answer'] = pd.to_numeric(df['Correct Answer'], errors='coerce')
+        reject(is_numerical & clean['correct_answer'].isna(), 'Invalid Correct Answer value')
+    else:
+        reject(is_numerical, 'Numerical question missing Correct Answer')
+
+    ok = problems == ''
+    clean['question_number'] = clean['question_number'].where(ok, 0).astype(int)
+
+    frames = {
+        'MCQ': clean[ok & is_mcq],
+        'MSQ': clean[ok & is_msq],
+        'Numerical': clean[ok & is_numerical],
+    }
+    errors = [
+        f"Sheet '{sheet_name}', Row {row}: {message}"
+        for row, message in zip(rows[~ok], problems[~ok])
+    ]
+    return frames, errors
+
+
+def _build_questions(test_paper, frames):
+    """Turn validated frames into unsaved model instances, grouped by model"""
+    common = ['question_number', 'question_text', 'question_image', 'marks', 'negative_marks', 'topic']
+    options = ['option_a', 'option_b', 'option_c', 'option_d']
+    layout = [
+        (Question_type_mcq, frames['MCQ'], common + options + ['correct_option']),
+        (Question_type_msq, frames['MSQ'], common + options + ['correct_options']),
+        (Question_type_numerical, frames['Numerical'], common + ['correct_answer']),
+    ]
+    grouped = []
+    for model, frame, fields in layout:
+        if frame.empty:
+            continue
+        records = frame[fields].astype(object).where(frame[fields].notna(), None).to_dict('records')
+        grouped.append((model, [model(test_paper=test_paper, **record) for record in records]))
+    return grouped
+
+
+def read_sheet(worksheet, chunk_size=CHUNK_SIZE):
+    """
+    Stream a worksheet as ``(columns, chunks)``.
+
+    ``chunks`` lazily yields DataFrames of at most ``chunk_size`` rows, indexed
+    by 0-based data row so error messages keep their spreadsheet row numbers.
+    Fully blank rows are skipped.
+    """
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    columns = [str(value).strip() if value is not None else f'Unnamed: {i}' for i, value in enumerate(header)]
+
+    width = len(columns)
+    padding = (None,) * width
+
+    def chunks():
+        numbered = enumerate(rows)
+        while True:
+            batch = list(islice(numbered, chunk_size))
+            if not batch:
+                return
+            index = []
+            records = []
+            for i, values in batch:
+                if any(value is not None for value in values):
+                    index.append(i)
+                    records.append((tuple(values) + padding)[:width])
+            if records:
+                yield pd.DataFrame.from_records(records, columns=columns, index=index)
+
+    return columns, chunks()
+
+
+def import_sheet(exam, sheet_name, columns, chunks, batch_size=BULK_BATCH_SIZE, progress=None):
+    """
+    Import one test paper sheet. Returns ``(created_count, errors)``.
+
+    The sheet name is the paper code. An existing paper with that code has
+    its questions replaced. Chunks are validated and inserted one after
+    another under a staging paper; the questions move to the real paper,
+    replacing its old ones, in a single transaction at the end.
+
+    ``progress``, when given, is told about every chunk (``advanced``) and
+    about the finished sheet (``sheet_finished``), each after a commit.
+    """
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        failure = f"Sheet '{sheet_name}': Missing required columns: {', '.join(missing_columns)}"
+        if progress is not None:
+            progress.sheet_finished(0, [failure])
+        return 0, [failure]
+
+    created_count = 0
+    errors = []
+    staging = None
+
+    try:
+        staging = TestPaper.objects.create(
+            exam=exam,
+            paper_code=f'{STAGING_PREFIX}{uuid.uuid4().hex[:12]}',
+            is_active=False,
+        )
+        for chunk in chunks:
+            frames, chunk_errors = validate_sheet(sheet_name, chunk)
+            errors.extend(chunk_errors)
+            with transaction.atomic():
+                for model, questions in _build_questions(staging, frames):
+                    model.objects.bulk_create(questions, batch_size=batch_size)
+                    # bulk_create sends no signals: count the new questions here
+                    metrics.adjust(metrics.QUESTION_COUNTERS[model], len(questions))
+                    created_count += len(questions)
+            if progress is not None:
+                progress.advanced(len(chunk), chunk_errors)
+
+        # Question deletes fire one signal each; the batched() blocks fold them
+        # into single counter and revision updates, committed or rolled back
+        # with the swap
+        with transaction.atomic(), metrics.batched(), revisions.batched():
+            test_paper, created = TestPaper.objects.get_or_create(
+                exam=exam,
+                paper_code=sheet_name,
+            )
+            if not created:
+                # Replace the existing questions for this paper
+                for model in QUESTION_MODELS:
+                    model.objects.filter(test_paper=test_paper).delete()
+            for model in QUESTION_MODELS:
+                model.objects.filter(test_paper=staging).update(test_paper=test_paper)
+            test_paper.total_questions = created_count
+            test_paper.save(update_fields=['total_questions'])
+            # Updates send no signals: move the paper's cached bundle and answer key on here
+            revisions.questions_changed(test_paper.id)
+            staging.delete()
+    except Exception as e:
+        if staging is not None:
+            discard_staging_papers(staging.id)
+        failure = f"Sheet '{sheet_name}': Import failed, no questions were saved: {str(e)}"
+        if progress is not None:
+            progress.sheet_finished(0, [failure])
+        return 0, errors + [failure]
+
+    if progress is not None:
+        progress.sheet_finished(created_count, [])
+    return created_count, errors
+
+
+def discard_staging_papers(test_paper_id=None):
+    """
+    Delete a staging paper and the questions imported under it, or with no
+    id every staging paper (those left behind by a crashed worker).
+    """
+    papers = TestPaper.objects.filter(paper_code__startswith=STAGING_PREFIX, is_active=False)
+    if test_paper_id is not None:
+        papers = papers.filter(id=test_paper_id)
+    try:
+        with transaction.atomic(), metrics.batched(), revisions.batched():
+            return papers.delete()[1].get(TestPaper._meta.label, 0)
+    except Exception:
+        # Left for the next `run_import_worker --requeue-running`
+        return 0
+
+
+def import_excel(exam, file_obj, chunk_size=CHUNK_SIZE, batch_size=BULK_BATCH_SIZE, progress=None):
+    """
+    Stream every test paper sheet of an .xlsx file object into ``exam``.
+    Returns ``(created_count, errors)``.
+
+    The file is read in place (uploaded files do not need a temporary copy);
+    embedded images are never loaded in read-only mode. ``progress`` receives
+    ``started(rows_total)`` first, estimated from the sheet dimensions.
+    """
+    workbook = openpyxl.load_workbook(file_obj, read_only=True, data_only=True)
+    worksheets = [ws for ws in workbook.worksheets if ws.title != EXAM_INFO_SHEET]
+    created_count = 0
+    errors = []
+    try:
+        if progress is not None:
+            progress.started(sum(max((ws.max_row or 1) - 1, 0) for ws in worksheets))
+        for worksheet in worksheets:
+            columns, chunks = read_sheet(worksheet, chunk_size=chunk_size)
+            sheet_created, sheet_errors = import_sheet(
+                exam, worksheet.title, columns, chunks, batch_size=batch_size, progress=progress
+            )
+            created_count += sheet_created
+            errors.extend(sheet_errors)
+    finally:
+        workbook.close()
+    return created_count, errors
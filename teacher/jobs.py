@@ -0,0 +1,121 @@
+"""
+Background processing of teacher paper uploads.
+
+An upload is stored on an ImportJob row, which doubles as the queue entry,
+and is processed later by ``manage.py run_import_worker``. The importer
+commits every chunk it writes, so progress is recorded on the job row after
+each chunk and status polling from any process just reads the row.
+"""
+from django.utils import timezone
+
+from teacher.models import ImportJob
+
+
+def enqueue_import(exam, uploaded_file, user=None):
+    """Store the uploaded workbook and queue it for the import worker"""
+    job = ImportJob(exam=exam, uploaded_by=user, original_filename=uploaded_file.name)
+    job.file.save(uploaded_file.name, uploaded_file, save=False)
+    job.save()
+    return job
+
+
+class JobProgress:
+    """Receives importer callbacks and records them on the job row for status polling"""
+
+    def __init__(self, job):
+        self.job = job
+        self.rows_total = 0
+        self.rows_processed = 0
+        self.created_count = 0
+        self.errors = []
+
+    def started(self, rows_total):
+        self.rows_total = rows_total
+        self.save('rows_total')
+
+    def advanced(self, rows, errors):
+        self.rows_processed += rows
+        self.errors.extend(errors)
+        self.save('rows_processed', 'errors')
+
+    def sheet_finished(self, created_count, errors):
+        self.created_count += created_count
+        self.errors.extend(errors)
+        self.save('rows_processed', 'created_count', 'errors')
+
+    def save(self, *fields):
+        ImportJob.objects.filter(id=self.job.id).update(**{field: getattr(self, field) for field in fields})
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest pending job to running and return it, or
+    ``None`` when the queue is empty. Safe with several workers polling.
+    """
+    pending = ImportJob.objects.filter(status=ImportJob.STATUS_PENDING).values_list('id', flat=True)
+    for job_id in pending[:10]:
+        claimed = ImportJob.objects.filter(id=job_id, status=ImportJob.STATUS_PENDING).update(
+            status=ImportJob.STATUS_RUNNING,
+            started_at=timezone.now(),
+        )
+        if claimed:
+            return ImportJob.objects.select_related('exam').get(id=job_id)
+    return None
+
+
+def run_import_job(job):
+    """Import a claimed job's workbook and record the outcome on the job"""
+    # pandas/openpyxl are only needed where imports actually run
+    from teacher.importer import import_excel
+
+    progress = JobProgress(job)
+    try:
+        with job.file.open('rb') as excel_file:
+            created_count, errors = import_excel(job.exam, excel_file, progress=progress)
+        job.status = ImportJob.STATUS_COMPLETED
+        job.created_count = created_count
+        job.errors = errors
+    except Exception as e:
+        job.status = ImportJob.STATUS_FAILED
+        job.created_count = progress.created_count
+        job.errors = progress.errors
+        job.failure_reason = f'Error reading Excel file: {str(e)}'
+
+    job.rows_total = max(progress.rows_total, progress.rows_processed)
+    job.rows_processed = progress.rows_processed
+    job.finished_at = timezone.now()
+    job.save()
+
+    # The workbook is not needed once its questions are in the database
+    try:
+        job.file.delete(save=False)
+    except Exception:
+        pass
+    return job
+
+
+def job_status(job):
+    """Status payload for polling: progress so far, errors and an ETA in seconds"""
+    eta_seconds = None
+    if job.status == ImportJob.STATUS_RUNNING and job.started_at and job.rows_processed:
+        elapsed = (timezone.now() - job.started_at).total_seconds()
+        remaining = max(job.rows_total - job.rows_processed, 0)
+        eta_seconds = round(remaining * elapsed / job.rows_processed, 1)
+    elif job.is_finished:
+        eta_seconds = 0
+
+    return {
+        'job_id': job.id,
+        'status': job.status,
+        'filename': job.original_filename,
+        'rows_total': job.rows_total,
+        'rows_processed': job.rows_processed,
+        'created_count': job.created_count,
+        'errors': job.errors,
+        'error_count': len(job.errors),
+        'eta_seconds': eta_seconds,
+        'failure_reason': job.failure_reason,
+        'created_at': job.created_at.isoformat(),
+        'started_at': job.started_at.isoformat() if job.started_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+    }
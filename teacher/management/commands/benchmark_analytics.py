@@ -0,0 +1,129 @@
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exam.models import Exam, TestPaper, Question_type_mcq, Question_type_msq, Question_type_numerical
+from student.models import ExamAttempt, QuestionAnswer, StudentProfile
+from teacher.analytics import analyze, answer_frame, question_frame
+
+INSERT_BATCH_SIZE = 5000
+
+OPTION_FIELDS = {'option_a': 'Alpha', 'option_b': 'Beta', 'option_c': 'Gamma', 'option_d': 'Delta'}
+
+
+def seed(exam, test_paper, students, questions, attempts, rng):
+    """Synthetic questions, attempts and one answer row per question per attempt"""
+    created = []
+    for n in range(1, questions + 1):
+        question_type = ('mcq', 'msq', 'numerical')[n % 3]
+        fields = {
+            'test_paper': test_paper,
+            'question_number': n,
+            'question_text': f'Benchmark question {n}?',
+            'marks': 4,
+            'negative_marks': 1,
+            'topic': f'Topic {n % 12}',
+        }
+        if question_type == 'mcq':
+            question = Question_type_mcq.objects.create(correct_option='B', **OPTION_FIELDS, **fields)
+        elif question_type == 'msq':
+            question = Question_type_msq.objects.create(correct_options='AC', **OPTION_FIELDS, **fields)
+        else:
+            question = Question_type_numerical.objects.create(correct_answer=n * 0.5, **fields)
+        created.append((question_type, question))
+
+    attempt_rows = ExamAttempt.objects.bulk_create(
+        [
+            ExamAttempt(
+                student=students[i % len(students)],
+                exam=exam,
+                attempt_number=i // len(students) + 1,
+                score=0,
+                total_marks=questions * 4,
+                time_taken=timedelta(minutes=60),
+            )
+            for i in range(attempts)
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+
+    ability = rng.random(attempts)
+    difficulty = rng.random(questions)
+    batch = []
+    for a, attempt in enumerate(attempt_rows):
+        correct = rng.random(questions) < (ability[a] + 1 - difficulty) / 2
+        answered = rng.random(questions) < 0.9
+        for q, (question_type, question) in enumerate(created):
+            if not answered[q]:
+                answer = None
+            elif question_type == 'numerical':
+                answer = str(question.correct_answer if correct[q] else 0)
+            elif question_type == 'mcq':
+                answer = 'B' if correct[q] else 'ACD'[q % 3]
+            else:
+                answer = 'A,C' if correct[q] else 'B'
+            batch.append(QuestionAnswer(
+                attempt=attempt,
+                question_id=question.id,
+                question_type=question_type,
+                user_answer=answer,
+                is_correct=bool(answered[q] and correct[q]),
+                marks_obtained=4 if answered[q] and correct[q] else (-1 if answered[q] else 0),
+                time_spent_seconds=int(rng.integers(5, 120)),
+                topic=question.topic,
+            ))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                QuestionAnswer.objects.bulk_create(batch)
+                batch = []
+    if batch:
+        QuestionAnswer.objects.bulk_create(batch)
+
+
+class Command(BaseCommand):
+    help = 'Measure teacher analytics over a synthetic paper with many answer rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--answers', type=int, default=1_000_000, help='Total QuestionAnswer rows')
+        parser.add_argument('--questions', type=int, default=100, help='Questions in the paper')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        questions = options['questions']
+        attempts = max(options['answers'] // questions, 1)
+        rng = np.random.default_rng(options['seed'])
+
+        # Everything is created in one transaction and rolled back at the end
+        with transaction.atomic():
+            users = User.objects.bulk_create([
+                User(username=f'analytics-benchmark-{i}', password='!') for i in range(50)
+            ])
+            students = StudentProfile.objects.bulk_create([
+                StudentProfile(user=user, first_name='Bench', last_name=str(i), email=f'analytics-benchmark-{i}@example.com')
+                for i, user in enumerate(users)
+            ])
+            exam = Exam.objects.create(name='Analytics benchmark', total_marks=questions * 4, duration=timedelta(minutes=60))
+            test_paper = TestPaper.objects.create(exam=exam, paper_code=f'BENCH-{exam.id}')
+
+            self.stdout.write(f'Seeding {attempts} attempts x {questions} questions...')
+            started = time.perf_counter()
+            seed(exam, test_paper, students, questions, attempts, rng)
+            self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+            started = time.perf_counter()
+            frame = answer_frame(QuestionAnswer.objects.filter(attempt__exam=exam))
+            exported = time.perf_counter() - started
+
+            started = time.perf_counter()
+            result = analyze(question_frame([test_paper.id]), frame)
+            computed = time.perf_counter() - started
+
+            transaction.set_rollback(True)
+
+        rows = result['answer_count']
+        self.stdout.write(f'Export: {exported:.2f}s ({rows / exported:,.0f} rows/s)')
+        self.stdout.write(f'Compute: {computed:.2f}s ({rows / computed:,.0f} rows/s)')
+        self.stdout.write(self.style.SUCCESS(f'Analytics over {rows:,} answers: {exported + computed:.2f}s'))
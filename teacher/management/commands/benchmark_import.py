@@ -0,0 +1,71 @@
+import io
+import time
+from datetime import timedelta
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from exam.models import Exam
+from teacher.importer import BULK_BATCH_SIZE, CHUNK_SIZE, import_excel
+
+
+def build_workbook(rows, sheets):
+    """Synthetic workbook with an even MCQ/MSQ/Numerical mix, as xlsx bytes"""
+    per_sheet = max(rows // sheets, 1)
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        pd.DataFrame([{'Exam Name': 'Benchmark', 'Duration (minutes)': 60}]).to_excel(writer, sheet_name='Exam_Info', index=False)
+        for sheet in range(sheets):
+            records = []
+            for n in range(1, per_sheet + 1):
+                question_type = ('MCQ', 'MSQ', 'Numerical')[n % 3]
+                records.append({
+                    'Question Type': question_type,
+                    'Question Number': n,
+                    'Question Text': f'Benchmark question {n} on sheet {sheet}?',
+                    'Option A': 'Alpha' if question_type != 'Numerical' else None,
+                    'Option B': 'Beta' if question_type != 'Numerical' else None,
+                    'Option C': 'Gamma' if question_type != 'Numerical' else None,
+                    'Option D': 'Delta' if question_type != 'Numerical' else None,
+                    'Correct Option': 'B' if question_type == 'MCQ' else None,
+                    'Correct Options': 'AC' if question_type == 'MSQ' else None,
+                    'Correct Answer': n * 0.5 if question_type == 'Numerical' else None,
+                    'Marks': 4,
+                    'Negative Marks': 1,
+                    'Topic': f'Topic {n % 12}',
+                })
+            pd.DataFrame(records).to_excel(writer, sheet_name=f'BENCH{sheet + 1:03d}', index=False)
+    return buffer.getvalue()
+
+
+class Command(BaseCommand):
+    help = 'Measure question import throughput (rows/second) on a synthetic workbook'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Total questions in the workbook')
+        parser.add_argument('--sheets', type=int, default=4, help='Number of test paper sheets')
+        parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE)
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark exam instead of deleting it')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        self.stdout.write(f"Building workbook: {rows} questions over {options['sheets']} sheets...")
+        content = build_workbook(rows, options['sheets'])
+
+        exam = Exam.objects.create(name='Import benchmark', total_marks=0, duration=timedelta(minutes=60))
+        try:
+            started = time.perf_counter()
+            created_count, errors = import_excel(
+                exam,
+                io.BytesIO(content),
+                chunk_size=options['chunk_size'],
+                batch_size=options['batch_size'],
+            )
+            elapsed = time.perf_counter() - started
+        finally:
+            if not options['keep']:
+                exam.delete()
+
+        self.stdout.write(f'Created {created_count} questions, {len(errors)} errors')
+        self.stdout.write(self.style.SUCCESS(f'Streamed import: {elapsed:.2f}s ({created_count / elapsed:,.0f} rows/s)'))
@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exam.models import Exam
+from teacher.export import DATASETS, EXPORT_CHUNK_SIZE, FORMATS, export_chunks
+
+
+class Command(BaseCommand):
+    help = "Export an exam's attempts or answers to CSV or Parquet, streaming in chunks"
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_id', type=int)
+        parser.add_argument('--dataset', choices=list(DATASETS), default='answers')
+        parser.add_argument('--format', choices=FORMATS, default=None,
+                            help='Defaults to the output file extension, else csv')
+        parser.add_argument('--output', default='-', help="File to write; '-' writes CSV to stdout")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE, help='Rows fetched and written at a time')
+
+    def handle(self, *args, **options):
+        if not Exam.objects.filter(id=options['exam_id']).exists():
+            raise CommandError(f"Exam {options['exam_id']} does not exist")
+
+        output = options['output']
+        export_format = options['format'] or ('parquet' if output.endswith('.parquet') else 'csv')
+        if output == '-' and export_format != 'csv':
+            raise CommandError('Parquet exports need --output')
+
+        try:
+            chunks = export_chunks(options['dataset'], options['exam_id'], export_format, options['chunk_size'])
+        except (ValueError, RuntimeError) as e:
+            raise CommandError(str(e))
+
+        started = time.perf_counter()
+        written = 0
+        stream = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in chunks:
+                stream.write(chunk)
+                written += len(chunk)
+        finally:
+            if output != '-':
+                stream.close()
+
+        if output != '-':
+            elapsed = time.perf_counter() - started
+            self.stdout.write(self.style.SUCCESS(
+                f"Exported {options['dataset']} of exam {options['exam_id']} to {output} "
+                f"({written / 1024 / 1024:.1f} MB in {elapsed:.2f}s)"
+            ))
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from teacher.metrics import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Recount the teacher dashboard counters from the source tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=float, default=None,
+                            help='Keep running and reconcile every this many seconds')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                started = time.perf_counter()
+                values = reconcile()
+                elapsed = time.perf_counter() - started
+                summary = ', '.join(f'{name}={value:g}' for name, value in values.items())
+                self.stdout.write(f'Reconciled in {elapsed:.2f}s: {summary}')
+                if options['every'] is None:
+                    break
+                close_old_connections()
+                time.sleep(options['every'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping reconciliation')
@@ -0,0 +1,64 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from teacher.importer import discard_staging_papers
+from teacher.jobs import claim_next_job, run_import_job
+from teacher.models import ImportJob
+
+
+class Command(BaseCommand):
+    help = 'Process queued teacher paper uploads (ImportJob rows) with a local thread pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Concurrent imports; keep at 1 on SQLite, which has a single writer')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds between queue checks')
+        parser.add_argument('--once', action='store_true', help='Drain the queue and exit')
+        parser.add_argument('--requeue-running', action='store_true',
+                            help='Put jobs left running by a crashed worker back in the queue first')
+
+    def handle(self, *args, **options):
+        if options['requeue_running']:
+            requeued = ImportJob.objects.filter(status=ImportJob.STATUS_RUNNING).update(
+                status=ImportJob.STATUS_PENDING, started_at=None
+            )
+            self.stdout.write(f'Requeued {requeued} running job(s)')
+            discarded = discard_staging_papers()
+            self.stdout.write(f'Discarded {discarded} half-imported sheet(s)')
+
+        workers = max(options['workers'], 1)
+        active = set()
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            try:
+                while True:
+                    while len(active) < workers:
+                        job = claim_next_job()
+                        if job is None:
+                            break
+                        self.stdout.write(f'Starting {job}')
+                        active.add(pool.submit(self.process, job))
+
+                    if not active:
+                        if options['once']:
+                            break
+                        close_old_connections()
+                        time.sleep(options['poll_interval'])
+                        continue
+
+                    done, active = wait(active, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                    for future in done:
+                        job = future.result()
+                        style = self.style.SUCCESS if job.status == ImportJob.STATUS_COMPLETED else self.style.ERROR
+                        self.stdout.write(style(f'Finished {job}: {job.created_count} questions, {len(job.errors)} errors'))
+            except KeyboardInterrupt:
+                self.stdout.write('Stopping; waiting for running imports to finish...')
+
+    def process(self, job):
+        try:
+            return run_import_job(job)
+        finally:
+            # Each pool thread owns its own database connection
+            connection.close()
@@ -0,0 +1,186 @@
+"""
+Teacher dashboard metrics.
+
+The dashboard's site-wide totals live in DashboardCounter rows and per-exam
+attempt totals in ExamAttemptTotals. Signals (teacher/signals.py) adjust
+them as rows are created and deleted, so rendering the dashboard reads a
+handful of rows instead of counting every table. Code paths that write in
+bulk, and so bypass signals or fire thousands of them, wrap their work in
+``batched()`` and report their changes explicitly; ``reconcile()`` (run
+periodically by ``manage.py reconcile_dashboard_metrics``) recounts
+everything from scratch to correct any drift.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from exam.models import Exam, TestPaper, Question_type_mcq, Question_type_msq, Question_type_numerical
+from student.models import ExamAttempt, StudentProfile
+from teacher.models import DashboardCounter, ExamAttemptTotals
+
+EXAMS = 'exams'
+TEST_PAPERS = 'test_papers'
+MCQ_QUESTIONS = 'mcq_questions'
+MSQ_QUESTIONS = 'msq_questions'
+NUMERICAL_QUESTIONS = 'numerical_questions'
+STUDENTS = 'students'
+ATTEMPTS = 'attempts'
+ATTEMPT_PERCENTAGE_SUM = 'attempt_percentage_sum'
+
+QUESTION_COUNTERS = {
+    Question_type_mcq: MCQ_QUESTIONS,
+    Question_type_msq: MSQ_QUESTIONS,
+    Question_type_numerical: NUMERICAL_QUESTIONS,
+}
+
+# Exams listed under "top exams by attempts"
+TOP_EXAMS = 5
+
+_pending = threading.local()
+
+
+def _apply_counter(name, delta):
+    counter = DashboardCounter.objects.filter(name=name)
+    if counter.update(value=F('value') + delta):
+        return
+    try:
+        with transaction.atomic():
+            DashboardCounter.objects.create(name=name, value=delta)
+    except IntegrityError:
+        # Created concurrently
+        counter.update(value=F('value') + delta)
+
+
+def _apply_exam(exam_id, attempts, percentage_sum):
+    totals = ExamAttemptTotals.objects.filter(exam_id=exam_id)
+    if totals.update(attempt_count=F('attempt_count') + attempts, percentage_sum=F('percentage_sum') + percentage_sum):
+        return
+    if attempts <= 0:
+        # Nothing to take away from, e.g. the exam itself is being deleted
+        return
+    try:
+        with transaction.atomic():
+            ExamAttemptTotals.objects.create(exam_id=exam_id, attempt_count=attempts, percentage_sum=percentage_sum)
+    except IntegrityError:
+        totals.update(attempt_count=F('attempt_count') + attempts, percentage_sum=F('percentage_sum') + percentage_sum)
+
+
+def adjust(name, delta):
+    """
+    Add ``delta`` to a counter once the current transaction commits (so the
+    hot counter rows are never locked for the length of, say, a grading
+    batch, and a rollback leaves them alone), or when the enclosing
+    ``batched()`` block ends.
+    """
+    if not delta:
+        return
+    pending = getattr(_pending, 'batch', None)
+    if pending is not None:
+        pending['counters'][name] = pending['counters'].get(name, 0) + delta
+    else:
+        transaction.on_commit(lambda: _apply_counter(name, delta))
+
+
+def adjust_exam_attempts(exam_id, attempts, percentage_sum):
+    pending = getattr(_pending, 'batch', None)
+    if pending is not None:
+        current = pending['exams'].get(exam_id, (0, 0.0))
+        pending['exams'][exam_id] = (current[0] + attempts, current[1] + percentage_sum)
+    else:
+        transaction.on_commit(lambda: _apply_exam(exam_id, attempts, percentage_sum))
+
+
+def record_attempt(attempt, sign=1):
+    adjust(ATTEMPTS, sign)
+    adjust(ATTEMPT_PERCENTAGE_SUM, sign * attempt.percentage)
+    adjust_exam_attempts(attempt.exam_id, sign, sign * attempt.percentage)
+
+
+@contextmanager
+def batched():
+    """
+    Collect counter changes in memory and write each counter once on exit.
+    Wrap bulk imports and cascading deletes in this so thousands of signals
+    cost a few UPDATEs. Nested blocks merge into the outermost one.
+    """
+    if getattr(_pending, 'batch', None) is not None:
+        yield
+        return
+    _pending.batch = {'counters': {}, 'exams': {}}
+    try:
+        yield
+        batch = _pending.batch
+    finally:
+        _pending.batch = None
+    with transaction.atomic():
+        for name, delta in batch['counters'].items():
+            if delta:
+                _apply_counter(name, delta)
+        for exam_id, (attempts, percentage_sum) in batch['exams'].items():
+            if attempts or percentage_sum:
+                _apply_exam(exam_id, attempts, percentage_sum)
+
+
+def reconcile():
+    """Recount every counter and per-exam total from the source tables"""
+    attempts = ExamAttempt.objects.aggregate(count=Count('id'), percentage_sum=Sum('percentage'))
+    values = {
+        EXAMS: Exam.objects.count(),
+        TEST_PAPERS: TestPaper.objects.count(),
+        MCQ_QUESTIONS: Question_type_mcq.objects.count(),
+        MSQ_QUESTIONS: Question_type_msq.objects.count(),
+        NUMERICAL_QUESTIONS: Question_type_numerical.objects.count(),
+        STUDENTS: StudentProfile.objects.count(),
+        ATTEMPTS: attempts['count'],
+        ATTEMPT_PERCENTAGE_SUM: attempts['percentage_sum'] or 0,
+    }
+    per_exam = ExamAttempt.objects.values('exam_id').annotate(count=Count('id'), percentage_sum=Sum('percentage'))
+    with transaction.atomic():
+        for name, value in values.items():
+            DashboardCounter.objects.update_or_create(name=name, defaults={'value': value})
+        ExamAttemptTotals.objects.all().delete()
+        ExamAttemptTotals.objects.bulk_create(
+            [
+                ExamAttemptTotals(exam_id=row['exam_id'], attempt_count=row['count'], percentage_sum=row['percentage_sum'] or 0)
+                for row in per_exam.iterator()
+            ],
+            batch_size=500,
+        )
+    return values
+
+
+def dashboard_metrics():
+    """Counters and top exams for the dashboard; the first call on a new database reconciles"""
+    values = dict(DashboardCounter.objects.values_list('name', 'value'))
+    if not values:
+        values = reconcile()
+    count = {name: int(values.get(name, 0)) for name in (
+        EXAMS, TEST_PAPERS, MCQ_QUESTIONS, MSQ_QUESTIONS, NUMERICAL_QUESTIONS, STUDENTS, ATTEMPTS,
+    )}
+    attempts = count[ATTEMPTS]
+    top_exams = (
+        ExamAttemptTotals.objects.filter(attempt_count__gt=0)
+        .select_related('exam')
+        .order_by('-attempt_count')[:TOP_EXAMS]
+    )
+    return {
+        'total_exams': count[EXAMS],
+        'total_test_papers': count[TEST_PAPERS],
+        'total_questions': count[MCQ_QUESTIONS] + count[MSQ_QUESTIONS] + count[NUMERICAL_QUESTIONS],
+        'mcq_count': count[MCQ_QUESTIONS],
+        'msq_count': count[MSQ_QUESTIONS],
+        'numerical_count': count[NUMERICAL_QUESTIONS],
+        'total_students': count[STUDENTS],
+        'total_attempts': attempts,
+        'average_score': round(values.get(ATTEMPT_PERCENTAGE_SUM, 0) / attempts, 2) if attempts else 0,
+        'exam_stats': [
+            {
+                'exam__name': totals.exam.name,
+                'attempt_count': totals.attempt_count,
+                'avg_score': totals.average_percentage,
+            }
+            for totals in top_exams
+        ],
+    }
@@ -24,3 +24,65 @@ class TeacherProfile(models.Model):
     class Meta:
         verbose_name = "Teacher Profile"
         verbose_name_plural = "Teacher Profiles"
+
+
+class ImportJob(models.Model):
+    """Queued Excel paper upload, processed by the run_import_worker command"""
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    exam = models.ForeignKey('exam.Exam', on_delete=models.CASCADE, related_name='import_jobs')
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    file = models.FileField(upload_to='imports/')
+    original_filename = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    rows_total = models.IntegerField(default=0)
+    rows_processed = models.IntegerField(default=0)
+    created_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+    failure_reason = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['created_at']
+
+    def __str__(self):
+        return f"Import #{self.id} ({self.original_filename}) - {self.status}"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+
+class DashboardCounter(models.Model):
+    """A named site-wide total shown on the teacher dashboard, kept current by signals"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.FloatField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
+
+
+class ExamAttemptTotals(models.Model):
+    """Attempt count and percentage sum of one exam, for the dashboard's top exams"""
+    exam = models.OneToOneField('exam.Exam', on_delete=models.CASCADE, primary_key=True, related_name='attempt_totals')
+    attempt_count = models.PositiveIntegerField(default=0, db_index=True)
+    percentage_sum = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.exam} - {self.attempt_count} attempt(s)"
+
+    @property
+    def average_percentage(self):
+        return self.percentage_sum / self.attempt_count if self.attempt_count else 0
@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from exam.models import Exam, TestPaper
+from student.models import ExamAttempt, StudentProfile
+from teacher import metrics
+
+SIMPLE_COUNTERS = {
+    Exam: metrics.EXAMS,
+    TestPaper: metrics.TEST_PAPERS,
+    StudentProfile: metrics.STUDENTS,
+    **metrics.QUESTION_COUNTERS,
+}
+
+
+def count_created(sender, instance, created, **kwargs):
+    if created:
+        metrics.adjust(SIMPLE_COUNTERS[sender], 1)
+
+
+def count_deleted(sender, instance, **kwargs):
+    metrics.adjust(SIMPLE_COUNTERS[sender], -1)
+
+
+for model in SIMPLE_COUNTERS:
+    post_save.connect(count_created, sender=model, dispatch_uid=f'dashboard_count_created_{model.__name__}')
+    post_delete.connect(count_deleted, sender=model, dispatch_uid=f'dashboard_count_deleted_{model.__name__}')
+
+
+@receiver(post_save, sender=ExamAttempt)
+def count_attempt_created(sender, instance, created, **kwargs):
+    if created:
+        metrics.record_attempt(instance)
+
+
+@receiver(post_delete, sender=ExamAttempt)
+def count_attempt_deleted(sender, instance, **kwargs):
+    metrics.record_attempt(instance, sign=-1)
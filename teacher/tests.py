@@ -1,3 +1,397 @@
+import csv
+import io
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+import openpyxl
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from exam.models import Exam, Question_type_mcq, Question_type_msq, Question_type_numerical, TestPaper
+from exam.tests import make_paper
+from student.models import ExamAttempt, QuestionAnswer, StudentProfile
+from teacher.export import DATASETS, PYARROW_AVAILABLE, export_chunks, iter_csv
+from teacher.importer import STAGING_PREFIX, import_excel
+from teacher.jobs import JobProgress, job_status
+from teacher.management.commands.benchmark_import import build_workbook
+from teacher import metrics
+from teacher.analytics import exam_analytics, test_paper_analytics
+from teacher.models import DashboardCounter, ImportJob, TeacherProfile
+
+
+HEADER = [
+    'Question Type', 'Question Number', 'Question Text', 'Option A', 'Option B', 'Option C', 'Option D',
+    'Correct Option', 'Correct Options', 'Correct Answer', 'Marks', 'Negative Marks', 'Topic',
+]
+
+
+def mcq(number, correct='A', text=None):
+    return ['MCQ', number, text if text is not None else f'Question {number}', 'a', 'b', 'c', 'd',
+            correct, None, None, 4, 1, 'Optics']
+
+
+def msq(number, correct='AC'):
+    return ['MSQ', number, f'Question {number}', 'a', 'b', 'c', 'd', None, correct, None, 4, 2, 'Optics']
+
+
+def numerical(number, correct=2.5):
+    return ['Numerical', number, f'Question {number}', None, None, None, None, None, None, correct, 4, 0, 'Waves']
+
+
+def workbook(sheets):
+    """xlsx file of ``{sheet name: rows}``; the first row is the header"""
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+    for name, rows in sheets.items():
+        sheet = book.create_sheet(name)
+        for row in rows:
+            sheet.append(row)
+    content = io.BytesIO()
+    book.save(content)
+    content.seek(0)
+    return content
+
+
+class ImportValidationTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+
+    def test_invalid_rows_are_rejected_with_their_spreadsheet_row(self):
+        rows = [
+            HEADER,
+            mcq(1),                      # row 2
+            mcq(2, correct='E'),         # row 3
+            msq(3, correct='AX'),        # row 4
+            [None] * len(HEADER),        # row 5, blank: skipped
+            numerical(4, correct='n/a'), # row 6
+            ['Essay', 5, 'Why?'],        # row 7
+            mcq(6, text=''),             # row 8
+            numerical(7),                # row 9
+            msq(8),                      # row 10
+        ]
+
+        created_count, errors = import_excel(self.exam, workbook({'P1': rows}), chunk_size=3)
+
+        self.assertEqual(created_count, 3)
+        self.assertEqual(errors, [
+            "Sheet 'P1', Row 3: Invalid Correct Option (expected A, B, C or D)",
+            "Sheet 'P1', Row 4: Invalid Correct Options (expected letters A-D, e.g. \"AC\")",
+            "Sheet 'P1', Row 6: Invalid Correct Answer value",
+            "Sheet 'P1', Row 7: Unknown question type 'Essay'",
+            "Sheet 'P1', Row 8: Empty question text",
+        ])
+        test_paper = TestPaper.objects.get(paper_code='P1')
+        self.assertEqual(test_paper.total_questions, 3)
+        self.assertEqual(list(Question_type_mcq.objects.filter(test_paper=test_paper).values_list('question_number', flat=True)), [1])
+        self.assertEqual(Question_type_msq.objects.get(test_paper=test_paper).correct_options, 'AC')
+        self.assertEqual(Question_type_numerical.objects.get(test_paper=test_paper).correct_answer, 2.5)
+
+    def test_sheet_missing_required_columns_is_skipped(self):
+        content = workbook({
+            'P1': [['Question Type', 'Question Text'], ['MCQ', 'No number']],
+            'P2': [HEADER, mcq(1)],
+        })
+
+        created_count, errors = import_excel(self.exam, content)
+
+        self.assertEqual(created_count, 1)
+        self.assertEqual(errors, ["Sheet 'P1': Missing required columns: Question Number"])
+        self.assertFalse(TestPaper.objects.filter(paper_code='P1').exists())
+
+    def test_rows_missing_their_type_columns_are_rejected(self):
+        header = ['Question Type', 'Question Number', 'Question Text', 'Correct Answer']
+        content = workbook({'P1': [header, ['MCQ', 1, 'Pick one', None], ['Numerical', 2, 'How many?', 3]]})
+
+        created_count, errors = import_excel(self.exam, content)
+
+        self.assertEqual(created_count, 1)
+        self.assertEqual(errors, ["Sheet 'P1', Row 2: MCQ missing required columns"])
+
+
+class ImportTransactionTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+
+    def import_sheet(self, *rows, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return import_excel(self.exam, workbook({'P1': [HEADER, *rows]}), **kwargs)
+
+    def question_numbers(self, test_paper):
+        return sorted(
+            number
+            for model in (Question_type_mcq, Question_type_msq, Question_type_numerical)
+            for number in model.objects.filter(test_paper=test_paper).values_list('question_number', flat=True)
+        )
+
+    def assertCountersMatchTables(self):
+        counters = dict(DashboardCounter.objects.values_list('name', 'value'))
+        self.assertEqual(
+            {name: counters.get(name, 0) for name in (
+                metrics.TEST_PAPERS, metrics.MCQ_QUESTIONS, metrics.MSQ_QUESTIONS, metrics.NUMERICAL_QUESTIONS,
+            )},
+            {
+                metrics.TEST_PAPERS: TestPaper.objects.count(),
+                metrics.MCQ_QUESTIONS: Question_type_mcq.objects.count(),
+                metrics.MSQ_QUESTIONS: Question_type_msq.objects.count(),
+                metrics.NUMERICAL_QUESTIONS: Question_type_numerical.objects.count(),
+            },
+        )
+
+    def test_reimport_replaces_the_papers_questions(self):
+        self.import_sheet(mcq(1), msq(2), numerical(3))
+        test_paper = TestPaper.objects.get(paper_code='P1')
+
+        with CaptureQueriesContext(connection) as queries:
+            created_count, errors = self.import_sheet(mcq(1, correct='B'), numerical(2))
+
+        self.assertEqual((created_count, errors), (2, []))
+        replaced = TestPaper.objects.get(paper_code='P1')
+        self.assertEqual(replaced.id, test_paper.id)
+        self.assertEqual(replaced.total_questions, 2)
+        # One bump for the whole swap, not one per deleted question
+        self.assertEqual(replaced.revision, test_paper.revision + 1)
+        bumps = [query for query in queries if query['sql'].startswith('UPDATE "exam_testpaper" SET "revision"')]
+        self.assertEqual(len(bumps), 1)
+        self.assertEqual(self.question_numbers(replaced), [1, 2])
+        self.assertEqual(Question_type_mcq.objects.get(test_paper=replaced).correct_option, 'B')
+        self.assertFalse(Question_type_msq.objects.exists())
+        self.assertFalse(TestPaper.objects.filter(paper_code__startswith=STAGING_PREFIX).exists())
+        self.assertCountersMatchTables()
+
+    def test_failing_swap_leaves_the_old_paper_intact(self):
+        self.import_sheet(mcq(1), msq(2), numerical(3))
+        test_paper = TestPaper.objects.get(paper_code='P1')
+
+        with mock.patch.object(TestPaper, 'save', side_effect=RuntimeError('disk full')):
+            created_count, errors = self.import_sheet(mcq(1, correct='B'))
+
+        self.assertEqual(created_count, 0)
+        self.assertEqual(errors, ["Sheet 'P1': Import failed, no questions were saved: disk full"])
+        unchanged = TestPaper.objects.get(paper_code='P1')
+        self.assertEqual((unchanged.total_questions, unchanged.revision), (3, test_paper.revision))
+        self.assertEqual(self.question_numbers(unchanged), [1, 2, 3])
+        self.assertEqual(Question_type_mcq.objects.get(test_paper=unchanged).correct_option, 'A')
+        self.assertFalse(TestPaper.objects.filter(paper_code__startswith=STAGING_PREFIX).exists())
+        self.assertCountersMatchTables()
+
+    def test_failing_chunk_discards_the_chunks_already_staged(self):
+        calls = []
+
+        def fail_on_second_chunk(bulk_create, *args, **kwargs):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError('connection lost')
+            return bulk_create(*args, **kwargs)
+
+        bulk_create = Question_type_mcq.objects.bulk_create
+        with mock.patch.object(
+            Question_type_mcq.objects, 'bulk_create',
+            side_effect=lambda *args, **kwargs: fail_on_second_chunk(bulk_create, *args, **kwargs),
+        ):
+            created_count, errors = self.import_sheet(mcq(1), mcq(2), mcq(3), chunk_size=2)
+
+        self.assertEqual(created_count, 0)
+        self.assertEqual(errors, ["Sheet 'P1': Import failed, no questions were saved: connection lost"])
+        self.assertFalse(TestPaper.objects.exists())
+        self.assertFalse(Question_type_mcq.objects.exists())
+        self.assertCountersMatchTables()
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        self.job = ImportJob.objects.create(exam=self.exam, original_filename='paper.xlsx')
+
+    def test_progress_is_recorded_on_the_job_row_after_every_chunk(self):
+        job_id = self.job.id
+        recorded = []
+
+        class RecordingProgress(JobProgress):
+            def advanced(self, rows, errors):
+                super().advanced(rows, errors)
+                recorded.append(ImportJob.objects.get(id=job_id).rows_processed)
+
+        created_count, errors = import_excel(
+            self.exam, io.BytesIO(build_workbook(30, 1)), chunk_size=10, progress=RecordingProgress(self.job)
+        )
+
+        self.assertEqual((created_count, errors), (30, []))
+        self.assertEqual(recorded, [10, 20, 30])
+        self.job.refresh_from_db()
+        status = job_status(self.job)
+        self.assertEqual((status['rows_total'], status['rows_processed'], status['created_count']), (30, 30, 30))
+        self.assertEqual(TestPaper.objects.get(paper_code='BENCH001').total_questions, 30)
+        self.assertFalse(TestPaper.objects.filter(paper_code__startswith=STAGING_PREFIX).exists())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.exam = Exam.objects.create(name='Physics', total_marks=40, duration=timedelta(minutes=60))
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.attempts = []
+        for number in range(1, 6):
+            attempt = ExamAttempt.objects.create(
+                student=profile, exam=self.exam, attempt_number=number, score=number * 4,
+                total_marks=40, percentage=number * 10, time_taken=timedelta(minutes=number),
+            )
+            QuestionAnswer.objects.create(
+                attempt=attempt, question_id=1, question_type='mcq', topic='Optics, waves',
+                user_answer='A', is_correct=True, marks_obtained=4, time_spent_seconds=30,
+            )
+            self.attempts.append(attempt)
+
+    def read_csv(self, chunks):
+        return list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+
+    def test_csv_is_streamed_one_chunk_per_block_of_rows(self):
+        chunks = list(iter_csv(DATASETS['attempts'], self.exam.id, chunk_size=2))
+
+        self.assertEqual(len(chunks), 3)
+        rows = self.read_csv(chunks)
+        self.assertEqual(rows[0], [name for name, _, _ in DATASETS['attempts'].columns])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [attempt.id for attempt in self.attempts])
+        # time_taken is written in seconds
+        self.assertEqual([float(row[4]) for row in rows[1:]], [60.0, 120.0, 180.0, 240.0, 300.0])
+
+    def test_empty_csv_export_is_just_the_header(self):
+        other = Exam.objects.create(name='Chemistry', total_marks=40, duration=timedelta(minutes=60))
+
+        rows = self.read_csv(iter_csv(DATASETS['answers'], other.id))
+
+        self.assertEqual(rows, [[name for name, _, _ in DATASETS['answers'].columns]])
+
+    def test_unknown_dataset_or_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            export_chunks('sessions', self.exam.id, 'csv')
+        with self.assertRaises(ValueError):
+            export_chunks('answers', self.exam.id, 'xlsx')
+
+    def test_teachers_download_a_streamed_csv(self):
+        url = f'/teacher/api/export/{self.exam.id}/'
+        teacher = User.objects.create_user('teacher', 'teacher@example.com', 'password')
+        self.client.force_login(teacher)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        TeacherProfile.objects.create(user=teacher, first_name='Test', last_name='Teacher', email='teacher@example.com')
+        response = self.client.get(url, {'dataset': 'answers', 'format': 'csv'})
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn(f'exam-{self.exam.id}-answers.csv', response['Content-Disposition'])
+        rows = self.read_csv(response.streaming_content)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][4], 'Optics, waves')
+        self.assertEqual(self.client.get(url, {'dataset': 'sessions'}).status_code, 400)
+
+    @skipUnless(PYARROW_AVAILABLE, 'needs the parquet extra')
+    def test_parquet_round_trip(self):
+        import pyarrow.parquet as pq
+
+        content = b''.join(export_chunks('attempts', self.exam.id, 'parquet', chunk_size=2))
+
+        table = pq.read_table(io.BytesIO(content))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column('attempt_number').to_pylist(), [1, 2, 3, 4, 5])
+
+
+class AnalyticsTests(TestCase):
+    # (MCQ, MSQ, numerical) answers of each attempt and the marks they earned
+    ATTEMPTS = [
+        [('A', True, 4), ('A,C', True, 4), ('2.5', True, 4)],    # 12: upper group
+        [('A', True, 4), ('A', False, 0), ('', False, 0)],       # 4
+        [('B', False, -1), ('A,C', True, 4), ('3', False, 0)],   # 3
+        [('A', True, 4), ('B', False, -2), ('', False, 0)],      # 2: lower group
+    ]
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user('student', 'student@example.com', 'password')
+        self.profile = StudentProfile.objects.create(
+            user=user, first_name='Test', last_name='Student', email='student@example.com'
+        )
+        self.exam = Exam.objects.create(name='Physics', total_marks=12, duration=timedelta(minutes=60))
+        self.test_paper, *self.questions = make_paper(self.exam)
+        self.attempts = [self.make_attempt(number, answers) for number, answers in enumerate(self.ATTEMPTS, start=1)]
+
+    def make_attempt(self, number, answers):
+        score = sum(marks for _, _, marks in answers)
+        attempt = ExamAttempt.objects.create(
+            student=self.profile, exam=self.exam, attempt_number=number, score=score,
+            total_marks=12, percentage=score / 12 * 100, time_taken=timedelta(minutes=30),
+        )
+        QuestionAnswer.objects.bulk_create([
+            QuestionAnswer(
+                attempt=attempt, question_id=question.id, question_type=question_type,
+                user_answer=user_answer, is_correct=is_correct, marks_obtained=marks,
+                time_spent_seconds=30, topic=question.topic,
+            )
+            for question_type, question, (user_answer, is_correct, marks)
+            in zip(('mcq', 'msq', 'numerical'), self.questions, answers)
+        ])
+        return attempt
+
+    def question_stats(self, analytics):
+        return {question['question_type']: question for question in analytics['questions']}
+
+    def test_item_statistics(self):
+        questions = self.question_stats(exam_analytics(self.exam))
+
+        self.assertEqual(
+            {kind: question['difficulty'] for kind, question in questions.items()},
+            {'mcq': 0.75, 'msq': 0.5, 'numerical': 0.25},
+        )
+        # Upper group: attempt 1, lower group: attempt 4
+        self.assertEqual(
+            {kind: question['discrimination'] for kind, question in questions.items()},
+            {'mcq': 0.0, 'msq': 1.0, 'numerical': 1.0},
+        )
+        self.assertEqual(questions['mcq']['options'], {'A': 3, 'B': 1, 'C': 0, 'D': 0})
+        self.assertEqual(questions['msq']['options'], {'A': 3, 'B': 1, 'C': 2, 'D': 0})
+        self.assertIsNone(questions['numerical']['options'])
+        self.assertEqual(questions['numerical']['answered'], 2)
+
+    def test_paper_scope_only_counts_its_questions(self):
+        other_paper, *other_questions = make_paper(self.exam, paper_code='P2')
+        QuestionAnswer.objects.create(
+            attempt=self.attempts[0], question_id=other_questions[0].id, question_type='mcq',
+            user_answer='D', is_correct=False, marks_obtained=-1,
+        )
+
+        analytics = test_paper_analytics(self.test_paper)
+
+        self.assertEqual(analytics['answer_count'], 12)
+        self.assertEqual(self.question_stats(analytics)['mcq']['options'], {'A': 3, 'B': 1, 'C': 0, 'D': 0})
+        self.assertEqual(test_paper_analytics(other_paper)['answer_count'], 1)
+
+    def test_cached_results_refresh_when_attempts_change(self):
+        first = exam_analytics(self.exam)
+        self.assertEqual(exam_analytics(self.exam)['generated_at'], first['generated_at'])
+
+        self.make_attempt(5, [('C', False, -1), ('', False, 0), ('', False, 0)])
+        added = exam_analytics(self.exam)
+        self.assertEqual(added['score']['attempts'], 5)
+        self.assertEqual(self.question_stats(added)['mcq']['difficulty'], 0.6)
+
+        self.attempts[0].delete()
+        deleted = exam_analytics(self.exam)
+        self.assertEqual(deleted['score']['attempts'], 4)
+        self.assertEqual(self.question_stats(deleted)['numerical']['difficulty'], 0.0)
+
+    def test_cached_results_refresh_when_questions_change(self):
+        first = exam_analytics(self.exam)
+        self.assertEqual(self.question_stats(first)['mcq']['topic'], 'Optics')
+
+        mcq = self.questions[0]
+        mcq.topic = 'Mechanics'
+        mcq.save()
 
-# Create your tests here.
+        edited = exam_analytics(self.exam)
+        self.assertEqual(self.question_stats(edited)['mcq']['topic'], 'Mechanics')
+        self.assertIn('Mechanics', [topic['topic'] for topic in edited['topics']])
+        self.assertEqual(self.question_stats(test_paper_analytics(self.test_paper))['mcq']['topic'], 'Mechanics')
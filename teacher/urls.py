@@ -9,8 +9,12 @@ urlpatterns = [
     path('api/create-exam/', views.create_exam_api, name='teacher-create-exam-api'),
     path('upload-paper/', views.UploadPaperView.as_view(), name='teacher-upload-paper'),
     path('api/upload-paper/', views.upload_paper_api, name='teacher-upload-paper-api'),
+    path('api/import-status/<int:job_id>/', views.import_status_api, name='teacher-import-status-api'),
     path('manage-exams/', views.ManageExamsView.as_view(), name='teacher-manage-exams'),
     path('api/delete-exam/<int:exam_id>/', views.delete_exam_api, name='teacher-delete-exam-api'),
     path('api/delete-test-paper/<int:test_paper_id>/', views.delete_test_paper_api, name='teacher-delete-test-paper-api'),
+    path('api/analytics/exam/<int:exam_id>/', views.exam_analytics_api, name='teacher-exam-analytics-api'),
+    path('api/analytics/test-paper/<int:test_paper_id>/', views.test_paper_analytics_api, name='teacher-test-paper-analytics-api'),
+    path('api/export/<int:exam_id>/', views.export_exam_api, name='teacher-export-exam-api'),
 ]
 
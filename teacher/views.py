@@ -3,16 +3,16 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
-from django.db.models import Count, Avg, Sum, Q
+from django.db import transaction
+from django.db.models import Sum, Q
 from django.utils import timezone
 from datetime import timedelta
 import json
 import os
-from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
 
 try:
     import pandas as pd
@@ -20,9 +20,13 @@ try:
 except ImportError:
     PANDAS_AVAILABLE = False
 
-from teacher.models import TeacherProfile
-from exam.models import Exam, TestPaper, Question_type_mcq, Question_type_msq, Question_type_numerical
-from student.models import ExamAttempt, StudentProfile
+from teacher.models import TeacherProfile, ImportJob
+from teacher.jobs import enqueue_import, job_status
+from teacher.metrics import batched, dashboard_metrics
+from teacher.export import CONTENT_TYPES, export_chunks
+from exam import revisions
+from exam.models import Exam, TestPaper
+from student.models import ExamAttempt
 
 
 class TeacherLoginView(TemplateView):
@@ -86,46 +90,13 @@ class TeacherDashboardView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Total exams created
-        total_exams = Exam.objects.count()
-        context['total_exams'] = total_exams
-        
-        # Total test papers
-        total_test_papers = TestPaper.objects.count()
-        context['total_test_papers'] = total_test_papers
-        
-        # Total questions
-        total_mcq = Question_type_mcq.objects.count()
-        total_msq = Question_type_msq.objects.count()
-        total_numerical = Question_type_numerical.objects.count()
-        context['total_questions'] = total_mcq + total_msq + total_numerical
-        context['mcq_count'] = total_mcq
-        context['msq_count'] = total_msq
-        context['numerical_count'] = total_numerical
-        
-        # Total students
-        total_students = StudentProfile.objects.count()
-        context['total_students'] = total_students
-        
-        # Total exam attempts
-        total_attempts = ExamAttempt.objects.count()
-        context['total_attempts'] = total_attempts
-        
-        # Average score across all attempts
-        avg_score = ExamAttempt.objects.aggregate(Avg('percentage'))['percentage__avg'] or 0
-        context['average_score'] = round(avg_score, 2)
+        # Site-wide totals and top exams come from counters kept by signals
+        context.update(dashboard_metrics())
         
         # Recent exam attempts (last 10)
         recent_attempts = ExamAttempt.objects.select_related('exam', 'student').order_by('-id')[:10]
         context['recent_attempts'] = recent_attempts
         
-        # Exam performance data (top 5 exams by attempts)
-        exam_stats = ExamAttempt.objects.values('exam__name').annotate(
-            attempt_count=Count('id'),
-            avg_score=Avg('percentage')
-        ).order_by('-attempt_count')[:5]
-        context['exam_stats'] = exam_stats
-        
         # Recent exams created
         recent_exams = Exam.objects.order_by('-id')[:5]
         context['recent_exams'] = recent_exams
@@ -225,159 +196,44 @@ def upload_paper_api(request):
         
         exam = get_object_or_404(Exam, id=exam_id)
         
-        # Save file temporarily
-        file_path = default_storage.save(f'temp/{excel_file.name}', ContentFile(excel_file.read()))
-        full_path = default_storage.path(file_path)
-        
         if not PANDAS_AVAILABLE:
             return JsonResponse({'success': False, 'error': 'pandas library is required. Please install it: pip install pandas openpyxl'}, status=500)
         
-        errors = []
-        created_count = 0
-        
-        try:
-            # Read the Excel file
-            df = pd.read_excel(full_path, sheet_name=None)
-            
-            # Extract exam details if Exam_Info sheet exists (optional - exam is already selected)
-            exam_info = None
-            if 'Exam_Info' in df:
-                exam_info = df['Exam_Info'].iloc[0]
-            
-            # Process each test paper sheet
-            for sheet_name, sheet_data in df.items():
-                if sheet_name == 'Exam_Info':
-                    continue
-                
-                # Validate required columns
-                required_columns = ['Question Type', 'Question Number', 'Question Text']
-                missing_columns = [col for col in required_columns if col not in sheet_data.columns]
-                if missing_columns:
-                    errors.append(f"Sheet '{sheet_name}': Missing required columns: {', '.join(missing_columns)}")
-                    continue
-                
-                # Check if test paper already exists
-                paper_code = sheet_name
-                test_paper, created = TestPaper.objects.get_or_create(
-                    exam=exam,
-                    paper_code=paper_code,
-                    defaults={'total_questions': len(sheet_data)}
-                )
-                
-                if not created:
-                    # Delete existing questions for this paper
-                    Question_type_mcq.objects.filter(test_paper=test_paper).delete()
-                    Question_type_msq.objects.filter(test_paper=test_paper).delete()
-                    Question_type_numerical.objects.filter(test_paper=test_paper).delete()
-                    test_paper.total_questions = len(sheet_data)
-                    test_paper.save()
-                
-                # Process questions
-                for index, row in sheet_data.iterrows():
-                    try:
-                        question_type = str(row['Question Type']).strip()
-                        question_number = int(row['Question Number'])
-                        question_text = str(row['Question Text']).strip()
-                        
-                        if not question_text:
-                            errors.append(f"Sheet '{sheet_name}', Row {index + 2}: Empty question text")
-                            continue
-                        
-                        question_image = None
-                        if 'Question Image' in row and pd.notna(row['Question Image']):
-                            question_image = str(row['Question Image']).strip()
-                        
-                        marks = float(row.get('Marks', 1.0)) if pd.notna(row.get('Marks')) else 1.0
-                        negative_marks = float(row.get('Negative Marks', 0.0)) if pd.notna(row.get('Negative Marks')) else 0.0
-                        topic = str(row.get('Topic', '')).strip() if pd.notna(row.get('Topic')) else None
-                        
-                        if question_type == 'MCQ':
-                            if not all(col in row for col in ['Option A', 'Option B', 'Option C', 'Option D', 'Correct Option']):
-                                errors.append(f"Sheet '{sheet_name}', Row {index + 2}: MCQ missing required columns")
-                                continue
-                            
-                            Question_type_mcq.objects.create(
-                                test_paper=test_paper,
-                                question_number=question_number,
-                                question_text=question_text,
-                                question_image=question_image if question_image else None,
-                                option_a=str(row['Option A']).strip(),
-                                option_b=str(row['Option B']).strip(),
-                                option_c=str(row['Option C']).strip(),
-                                option_d=str(row['Option D']).strip(),
-                                correct_option=str(row['Correct Option']).strip().upper(),
-                                marks=marks,
-                                negative_marks=negative_marks,
-                                topic=topic or None
-                            )
-                            created_count += 1
-                        
-                        elif question_type == 'MSQ':
-                            if not all(col in row for col in ['Option A', 'Option B', 'Option C', 'Option D', 'Correct Options']):
-                                errors.append(f"Sheet '{sheet_name}', Row {index + 2}: MSQ missing required columns")
-                                continue
-                            
-                            Question_type_msq.objects.create(
-                                test_paper=test_paper,
-                                question_number=question_number,
-                                question_text=question_text,
-                                question_image=question_image if question_image else None,
-                                option_a=str(row['Option A']).strip(),
-                                option_b=str(row['Option B']).strip(),
-                                option_c=str(row['Option C']).strip(),
-                                option_d=str(row['Option D']).strip(),
-                                correct_options=str(row['Correct Options']).strip().upper(),
-                                marks=marks,
-                                negative_marks=negative_marks,
-                                topic=topic or None
-                            )
-                            created_count += 1
-                        
-                        elif question_type == 'Numerical':
-                            if 'Correct Answer' not in row:
-                                errors.append(f"Sheet '{sheet_name}', Row {index + 2}: Numerical question missing Correct Answer")
-                                continue
-                            
-                            try:
-                                correct_answer = float(row['Correct Answer'])
-                            except (ValueError, TypeError):
-                                errors.append(f"Sheet '{sheet_name}', Row {index + 2}: Invalid Correct Answer value")
-                                continue
-                            
-                            Question_type_numerical.objects.create(
-                                test_paper=test_paper,
-                                question_number=question_number,
-                                question_text=question_text,
-                                question_image=question_image if question_image else None,
-                                correct_answer=correct_answer,
-                                marks=marks,
-                                negative_marks=negative_marks,
-                                topic=topic or None
-                            )
-                            created_count += 1
-                        
-                        else:
-                            errors.append(f"Sheet '{sheet_name}', Row {index + 2}: Unknown question type '{question_type}'")
-                    
-                    except Exception as e:
-                        errors.append(f"Sheet '{sheet_name}', Row {index + 2}: {str(e)}")
-        
-        except Exception as e:
-            return JsonResponse({'success': False, 'error': f'Error reading Excel file: {str(e)}'}, status=500)
-        
-        finally:
-            # Clean up temporary file
-            try:
-                default_storage.delete(file_path)
-            except:
-                pass
+        # Large workbooks take minutes to import, so hand them to the import worker
+        job = enqueue_import(exam, excel_file, request.user)
         
         return JsonResponse({
             'success': True,
-            'created_count': created_count,
-            'errors': errors,
-            'message': f'Successfully created {created_count} questions. {len(errors)} errors found.' if errors else f'Successfully created {created_count} questions.'
-        })
+            'job_id': job.id,
+            'status_url': reverse('teacher-import-status-api', args=[job.id]),
+            'message': 'Upload received. Importing questions in the background...'
+        }, status=202)
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@login_required
+def import_status_api(request, job_id):
+    """API endpoint to poll the progress of a queued paper upload"""
+    try:
+        # Check if user is a teacher
+        try:
+            request.user.teacherprofile
+        except:
+            return JsonResponse({'success': False, 'error': 'Access denied. Teacher account required.'}, status=403)
+        
+        job = get_object_or_404(ImportJob, id=job_id)
+        status = job_status(job)
+        
+        if job.status == ImportJob.STATUS_COMPLETED:
+            created_count = status['created_count']
+            status['message'] = f'Successfully created {created_count} questions. {status["error_count"]} errors found.' if status['errors'] else f'Successfully created {created_count} questions.'
+        elif job.status == ImportJob.STATUS_FAILED:
+            status['message'] = job.failure_reason
+        
+        return JsonResponse({'success': True, **status})
     
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
@@ -416,7 +272,8 @@ def delete_exam_api(request, exam_id):
         
         # Delete the exam (cascade will delete test papers, questions, and attempts)
         exam_name = exam.name
-        exam.delete()
+        with transaction.atomic(), batched(), revisions.batched():
+            exam.delete()
         
         return JsonResponse({
             'success': True,
@@ -444,7 +301,8 @@ def delete_test_paper_api(request, test_paper_id):
         # Delete the test paper (cascade will delete all questions)
         paper_code = test_paper.paper_code
         exam_name = test_paper.exam.name
-        test_paper.delete()
+        with transaction.atomic(), batched(), revisions.batched():
+            test_paper.delete()
         
         return JsonResponse({
             'success': True,
@@ -453,3 +311,80 @@ def delete_test_paper_api(request, test_paper_id):
     
     except Exception as e:
         return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@login_required
+def exam_analytics_api(request, exam_id):
+    """API endpoint with score distribution, item and topic analytics for an exam"""
+    try:
+        # Check if user is a teacher
+        try:
+            request.user.teacherprofile
+        except:
+            return JsonResponse({'success': False, 'error': 'Access denied. Teacher account required.'}, status=403)
+        
+        exam = get_object_or_404(Exam, id=exam_id)
+        
+        if not PANDAS_AVAILABLE:
+            return JsonResponse({'success': False, 'error': 'pandas library is required. Please install it: pip install pandas'}, status=500)
+        
+        from teacher.analytics import exam_analytics
+        return JsonResponse({'success': True, 'analytics': exam_analytics(exam)})
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@login_required
+def test_paper_analytics_api(request, test_paper_id):
+    """API endpoint with score distribution, item and topic analytics for one test paper"""
+    try:
+        # Check if user is a teacher
+        try:
+            request.user.teacherprofile
+        except:
+            return JsonResponse({'success': False, 'error': 'Access denied. Teacher account required.'}, status=403)
+        
+        test_paper = get_object_or_404(TestPaper, id=test_paper_id)
+        
+        if not PANDAS_AVAILABLE:
+            return JsonResponse({'success': False, 'error': 'pandas library is required. Please install it: pip install pandas'}, status=500)
+        
+        from teacher.analytics import test_paper_analytics
+        return JsonResponse({'success': True, 'analytics': test_paper_analytics(test_paper)})
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@login_required
+def export_exam_api(request, exam_id):
+    """API endpoint streaming an exam's attempts or answers as CSV or Parquet"""
+    try:
+        # Check if user is a teacher
+        try:
+            request.user.teacherprofile
+        except:
+            return JsonResponse({'success': False, 'error': 'Access denied. Teacher account required.'}, status=403)
+        
+        exam = get_object_or_404(Exam, id=exam_id)
+        dataset = request.GET.get('dataset', 'answers')
+        export_format = request.GET.get('format', 'csv')
+        
+        try:
+            chunks = export_chunks(dataset, exam.id, export_format)
+        except ValueError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=400)
+        except RuntimeError as e:
+            return JsonResponse({'success': False, 'error': str(e)}, status=500)
+        
+        # Rows are fetched and sent chunk by chunk while the response streams
+        response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = f'attachment; filename="exam-{exam.id}-{dataset}.{export_format}"'
+        return response
+    
+    except Exception as e:
+        return JsonResponse({'success': False, 'error': str(e)}, status=500)